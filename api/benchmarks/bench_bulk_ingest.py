@@ -0,0 +1,75 @@
+"""Ingest throughput: one process_document call per file vs the bulk pipeline.
+
+Generates --files synthetic markdown files and ingests them into fresh
+temporary databases, first file by file (the single-upload path) and then
+through services.bulk.ingest_files with --workers processes. The bulk figure
+includes spawning the pool (about a second), so small runs favour per-file.
+
+Run from api/: python benchmarks/bench_bulk_ingest.py [--files 2000] [--workers 4]
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+API_ROOT = Path(__file__).resolve().parents[1]
+sys.path.append(str(API_ROOT))
+
+_WORDS = "alpha beta gamma delta kubernetes rollout sourdough bread tax filing hiking trail cluster".split()
+
+
+def make_files(count: int, words: int = 1200) -> list[tuple[str, bytes]]:
+    rng = random.Random(7)
+    files = []
+    for i in range(count):
+        sentences = [" ".join(rng.choices(_WORDS, k=12)) + "." for _ in range(words // 12)]
+        body = f"# Document {i}\n\n" + "\n\n".join(" ".join(sentences[j : j + 5]) for j in range(0, len(sentences), 5))
+        files.append((f"docs/doc-{i}.md", body.encode("utf-8")))
+    return files
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--files", type=int, default=2000)
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+    os.environ.pop("GEMINI_API_KEY", None)
+    os.environ["KNOWLEDGE_COPILOT_BULK_WORKERS"] = str(args.workers)
+
+    from src import db
+    from src.services import bulk, ingest
+
+    files = make_files(args.files)
+
+    async def one_by_one() -> None:
+        for name, raw in files:
+            document = db.create_document("bench", name, ingest.source_type_for(name))
+            await ingest.process_document(document.id, "bench", raw.decode("utf-8"), ingest.source_type_for(name))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["KNOWLEDGE_COPILOT_DATABASE_PATH"] = str(Path(tmp) / "single.db")
+        db.init_db()
+        started = time.perf_counter()
+        asyncio.run(one_by_one())
+        single = time.perf_counter() - started
+        print(f"  {'per-file ingest:':<26}{single:7.2f} s  ({args.files / single:8.1f} files/s)")
+
+        os.environ["KNOWLEDGE_COPILOT_DATABASE_PATH"] = str(Path(tmp) / "bulk.db")
+        db.init_db()
+        report = asyncio.run(bulk.ingest_files("bench", files))
+        bulk.shutdown_bulk_pool()
+        elapsed = report["elapsed_ms"] / 1000
+        print(
+            f"  {f'bulk ingest ({args.workers} workers):':<26}{elapsed:7.2f} s  "
+            f"({report['files_per_second']:8.1f} files/s, {report['chunks']} chunks)"
+        )
+
+
+if __name__ == "__main__":
+    main()
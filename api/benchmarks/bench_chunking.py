@@ -0,0 +1,68 @@
+"""Chunking throughput: legacy chunk_text vs iter_chunk_spans.
+
+Run from api/: python benchmarks/bench_chunking.py [--words 200000] [--repeat 5]
+"""
+from __future__ import annotations
+
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+API_ROOT = Path(__file__).resolve().parents[1]
+sys.path.append(str(API_ROOT))
+
+from src.services.rag import chunk_text, iter_chunk_spans
+
+
+def build_document(words: int, seed: int = 7) -> str:
+    rng = random.Random(seed)
+    vocabulary = [f"term{i}" for i in range(2000)]
+    parts: list[str] = []
+    written = 0
+    section = 0
+    while written < words:
+        if written >= section * 800:
+            section += 1
+            parts.append(f"\n## Section {section}\n")
+        length = rng.randint(6, 24)
+        parts.append(" ".join(rng.choice(vocabulary) for _ in range(length)) + ".")
+        written += length
+        if rng.random() < 0.15:
+            parts.append("\n\n")
+    return " ".join(parts)
+
+
+def _best_of(repeat: int, func) -> tuple[float, int]:
+    best = float("inf")
+    produced = 0
+    for _ in range(repeat):
+        started = time.perf_counter()
+        produced = func()
+        best = min(best, time.perf_counter() - started)
+    return best, produced
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--words", type=int, default=200_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    for scale in (1, 4):
+        text = build_document(args.words * scale)
+        megabytes = len(text.encode("utf-8")) / 1_000_000
+        cases = {
+            "chunk_text": lambda: len(chunk_text(text)),
+            "iter_chunk_spans": lambda: sum(1 for _ in iter_chunk_spans(text)),
+            "iter_chunk_spans[markdown]": lambda: sum(1 for _ in iter_chunk_spans(text, source_type="markdown")),
+        }
+        print(f"document: {args.words * scale} words, {megabytes:.1f} MB")
+        for name, func in cases.items():
+            elapsed, chunks = _best_of(args.repeat, func)
+            print(f"  {name:<28} {elapsed * 1000:8.1f} ms  {megabytes / elapsed:6.1f} MB/s  {chunks} chunks")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""Time to first query after a restart: full chunk scan vs rebuilt index vs snapshot.
+
+Seeds one project with --chunks rows of 256-dim embeddings in a temporary
+database, then times the first answer_query call from each starting state.
+
+Run from api/: python benchmarks/bench_cold_start.py [--chunks 50000]
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+import uuid
+from pathlib import Path
+
+import numpy as np
+
+API_ROOT = Path(__file__).resolve().parents[1]
+sys.path.append(str(API_ROOT))
+
+
+def seed(db, project_id: str, chunks: int, per_document: int = 50, batch: int = 20_000) -> None:
+    rng = np.random.default_rng(7)
+    now = "2025-01-01T00:00:00+00:00"
+    with db.db_transaction() as conn:
+        document_ids = []
+        for start in range(0, chunks, per_document):
+            document_id = str(uuid.uuid4())
+            document_ids.append(document_id)
+            conn.execute(
+                """INSERT INTO documents (id, project_id, filename, source_type, status, chunk_count, created_at, updated_at)
+                   VALUES (?, ?, ?, 'text', 'ready', ?, ?, ?)""",
+                (document_id, project_id, f"doc-{start}.txt", per_document, now, now),
+            )
+        for start in range(0, chunks, batch):
+            rows = []
+            for i in range(start, min(start + batch, chunks)):
+                vector = rng.standard_normal(256).astype(np.float32).round(6).tolist()
+                rows.append(
+                    (
+                        str(uuid.uuid4()),
+                        project_id,
+                        document_ids[i // per_document],
+                        i % per_document,
+                        f"chunk {i} body text",
+                        json.dumps(vector),
+                        "{}",
+                        now,
+                        "local-hash-256",
+                        256,
+                    )
+                )
+            conn.executemany(
+                """INSERT INTO chunks (id, project_id, document_id, chunk_index, text, embedding, metadata, created_at,
+                                       embedding_model, embedding_dim)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+                rows,
+            )
+        conn.execute(
+            "INSERT OR REPLACE INTO project_stats (project_id, document_count, index_version) VALUES (?, ?, ?)",
+            (project_id, len(document_ids), uuid.uuid4().hex),
+        )
+
+
+def _timed(func) -> tuple[float, object]:
+    started = time.perf_counter()
+    result = func()
+    return (time.perf_counter() - started) * 1000, result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--chunks", type=int, default=50_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["KNOWLEDGE_COPILOT_DATABASE_PATH"] = str(Path(tmp) / "bench.db")
+        os.environ.pop("GEMINI_API_KEY", None)
+        from src import db
+        from src.services import index
+        from src.services.query import answer_query
+        from src.services.rag import _local_embed, similarity
+
+        db.init_db()
+        elapsed, _ = _timed(lambda: seed(db, "bench", args.chunks))
+        print(f"seeded {args.chunks} chunks in {elapsed / 1000:.1f} s")
+
+        def first_query() -> None:
+            asyncio.run(answer_query("bench", "chunk body text", top_k=5))
+
+        def full_scan() -> None:
+            query = _local_embed("chunk body text")
+            chunks = db.get_chunks_by_project("bench", embedding_model="local-hash-256", embedding_dim=256)
+            sorted((similarity(query, chunk["embedding"]) for chunk in chunks), reverse=True)
+
+        scan_ms, _ = _timed(full_scan)
+        print(f"  full chunk scan (previous query path): {scan_ms:9.1f} ms")
+
+        shutil.rmtree(index.snapshot_dir(), ignore_errors=True)
+        index.clear_indexes()
+        rebuild_ms, _ = _timed(first_query)
+        print(f"  first query, index rebuilt from db:    {rebuild_ms:9.1f} ms")
+
+        index.save_snapshots()
+        index.clear_indexes()
+        snapshot_ms, _ = _timed(first_query)
+        print(f"  first query, index from snapshot:      {snapshot_ms:9.1f} ms")
+
+        warm_ms, _ = _timed(first_query)
+        print(f"  query on a warm index:                 {warm_ms:9.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
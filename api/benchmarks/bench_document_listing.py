@@ -0,0 +1,77 @@
+"""Document listing: OFFSET pagination vs (created_at, id) keyset cursor.
+
+Seeds one project with --documents rows (default 1M) in a temporary
+database, then times deep pages and the total-count lookup.
+
+Run from api/: python benchmarks/bench_document_listing.py [--documents 1000000]
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+API_ROOT = Path(__file__).resolve().parents[1]
+sys.path.append(str(API_ROOT))
+
+
+def seed(db, project_id: str, documents: int, batch: int = 50_000) -> None:
+    base = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    with db.db_transaction() as conn:
+        for start in range(0, documents, batch):
+            rows = []
+            for i in range(start, min(start + batch, documents)):
+                created = (base + timedelta(seconds=i)).isoformat()
+                rows.append((str(uuid.uuid4()), project_id, f"doc-{i}.md", "markdown", "ready", 3, created, created))
+            conn.executemany(
+                """INSERT INTO documents (id, project_id, filename, source_type, status, chunk_count, created_at, updated_at)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?)""",
+                rows,
+            )
+        conn.execute(
+            "INSERT OR REPLACE INTO project_stats (project_id, document_count) VALUES (?, ?)",
+            (project_id, documents),
+        )
+
+
+def _timed(func) -> tuple[float, object]:
+    started = time.perf_counter()
+    result = func()
+    return (time.perf_counter() - started) * 1000, result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--documents", type=int, default=1_000_000)
+    parser.add_argument("--page-size", type=int, default=100)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["KNOWLEDGE_COPILOT_DATABASE_PATH"] = str(Path(tmp) / "bench.db")
+        from src import db
+
+        db.init_db()
+        elapsed, _ = _timed(lambda: seed(db, "bench", args.documents))
+        print(f"seeded {args.documents} documents in {elapsed / 1000:.1f} s")
+
+        for depth in (0.01, 0.5, 0.99):
+            offset = int(args.documents * depth)
+            offset_ms, page = _timed(lambda: db.list_documents("bench", limit=args.page_size, offset=offset))
+            cursor = db.decode_document_cursor(db.encode_document_cursor(page[0]))
+            # the keyset page starting right after page[0] covers the same rows
+            keyset_ms, _ = _timed(lambda: db.list_documents("bench", limit=args.page_size, after=cursor))
+            print(f"  page at {depth:>5.0%}: offset {offset_ms:8.2f} ms   keyset {keyset_ms:8.2f} ms")
+
+        with db.db_transaction() as conn:
+            scan_ms, _ = _timed(lambda: conn.execute("SELECT COUNT(*) FROM documents WHERE project_id = ?", ("bench",)).fetchone())
+        stats_ms, total = _timed(lambda: db.count_documents("bench"))
+        print(f"  total count: COUNT(*) {scan_ms:8.2f} ms   project_stats {stats_ms:8.2f} ms ({total})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""Recall, latency and memory of projected embeddings versus full dimension.
+
+Seeds a temporary project with --chunks synthetic --dim-dimensional vectors
+whose energy decays across dimensions (like real embedding models, and
+like Matryoshka-trained ones for truncation), then fits each projection
+and reports recall@10 against exact full-dimension search, per-query
+search latency over the in-memory matrix and its size in bytes.
+
+Run from api/: python benchmarks/bench_projection.py [--chunks 20000] [--dim 768]
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+import numpy as np
+
+API_ROOT = Path(__file__).resolve().parents[1]
+sys.path.append(str(API_ROOT))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--chunks", type=int, default=20000)
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--queries", type=int, default=200)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["KNOWLEDGE_COPILOT_DATABASE_PATH"] = str(Path(tmp) / "bench.db")
+        from src import db
+        from src.services import projection
+
+        db.init_db()
+        rng = np.random.default_rng(11)
+        spectrum = 1.0 / (1.0 + np.arange(args.dim)) ** 0.9
+        vectors = (rng.standard_normal((args.chunks, args.dim)) * spectrum).astype(np.float32).round(6)
+        document_id = db.create_document("bench", "bench.txt", "text").id
+        for start in range(0, args.chunks, 1000):
+            db.create_chunks(
+                "bench",
+                [
+                    {
+                        "document_id": document_id,
+                        "chunk_index": start + i,
+                        "text": "",
+                        "span": (0, 0),
+                        "embedding": vector,
+                        "embedding_model": "bench-model",
+                    }
+                    for i, vector in enumerate(vectors[start : start + 1000].tolist())
+                ],
+            )
+
+        print(f"  {'projection':<16}{'recall@10':>10}{'full ms':>10}{'reduced ms':>12}{'full MiB':>10}{'reduced MiB':>13}")
+        for method, target in [("pca", 256), ("pca", 128), ("pca", 64), ("truncate", 256), ("truncate", 128)]:
+            if target >= args.dim:
+                continue
+            fitted = projection.fit_projection("bench", method, target, "bench-model")
+            report = projection.evaluate_projection(fitted, queries=args.queries, k=10)
+            print(
+                f"  {method + ' ' + str(target):<16}{report['recall_at_k']:>10.3f}"
+                f"{report['full_latency_ms']:>10.2f}{report['reduced_latency_ms']:>12.2f}"
+                f"{report['full_bytes'] / 2**20:>10.1f}{report['reduced_bytes'] / 2**20:>13.1f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
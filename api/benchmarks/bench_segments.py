@@ -0,0 +1,81 @@
+"""Query latency during continuous ingest: monolithic memory index vs segments.
+
+Seeds a temporary project with --chunks 256-dim vectors, then alternates
+--batches small writes of --batch-size chunks through the vector store with
+a query after each one. The memory backend rebuilds its whole index after
+every write; the segmented backend folds the new rows into its head and
+merges sealed segments in the background. Reports per-query latency after
+a write and the segment layout at the end.
+
+Run from api/: python benchmarks/bench_segments.py [--chunks 50000] [--batches 100]
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+API_ROOT = Path(__file__).resolve().parents[1]
+sys.path.append(str(API_ROOT))
+
+
+def _records(VectorRecord, document_id: str, vectors: np.ndarray) -> list:
+    return [
+        VectorRecord(document_id=document_id, chunk_index=i, text="", embedding=vector, embedding_model="bench-model")
+        for i, vector in enumerate(vectors.round(6).tolist())
+    ]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--chunks", type=int, default=50000)
+    parser.add_argument("--batches", type=int, default=100)
+    parser.add_argument("--batch-size", type=int, default=32)
+    args = parser.parse_args()
+
+    print(f"  {'backend':<12}{'first query ms':>16}{'p95 ms':>10}{'write ms':>10}  layout")
+    for backend in ("memory", "segmented"):
+        with tempfile.TemporaryDirectory() as tmp:
+            os.environ["KNOWLEDGE_COPILOT_DATABASE_PATH"] = str(Path(tmp) / "bench.db")
+            os.environ["KNOWLEDGE_COPILOT_VECTOR_STORE"] = backend
+            os.environ["KNOWLEDGE_COPILOT_INDEX_SNAPSHOTS"] = "false"
+            from src import db
+            from src.services import index, segments
+            from src.services.vectorstore import VectorRecord, get_vector_store
+
+            db.init_db()
+            index.clear_indexes()
+            segments.clear_segments()
+            store = get_vector_store()
+            rng = np.random.default_rng(13)
+            document_id = db.create_document("bench", "bench.txt", "text").id
+            for start in range(0, args.chunks, 5000):
+                store.add("bench", _records(VectorRecord, document_id, rng.standard_normal((min(5000, args.chunks - start), 256))))
+            queries = rng.standard_normal((args.batches, 256)).tolist()
+            store.search("bench", queries[0], 10, "bench-model")
+
+            query_seconds, write_seconds = [], []
+            for query in queries:
+                started = time.perf_counter()
+                store.add("bench", _records(VectorRecord, document_id, rng.standard_normal((args.batch_size, 256))))
+                write_seconds.append(time.perf_counter() - started)
+                started = time.perf_counter()
+                store.search("bench", query, 10, "bench-model")
+                query_seconds.append(time.perf_counter() - started)
+            segments.wait_for_merges()
+
+            stats = store.stats("bench")
+            layout = f"{stats['segments']} segments + {stats['head_rows']} head rows" if backend == "segmented" else "1 index"
+            print(
+                f"  {backend:<12}{np.mean(query_seconds) * 1000:>16.2f}"
+                f"{np.percentile(query_seconds, 95) * 1000:>10.2f}{np.mean(write_seconds) * 1000:>10.2f}  {layout}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""JSON cost on the read paths: DB payload codec and the hot GET endpoints.
+
+Seeds a temporary database with --documents documents (one of them with
+--chunks chunks carrying 256-dim embeddings) and one logged query, then
+times the db JSON helpers and in-process requests against
+GET /api/v1/queries/{id}, GET /api/v1/documents and
+GET /api/v1/documents/{id}.
+
+Run from api/: python benchmarks/bench_serialization.py [--documents 200] [--chunks 500]
+"""
+from __future__ import annotations
+
+import argparse
+import importlib
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+
+API_ROOT = Path(__file__).resolve().parents[1]
+sys.path.append(str(API_ROOT))
+
+
+def _per_call_ms(func, repeat: int) -> float:
+    func()
+    started = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - started) * 1000 / repeat
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--documents", type=int, default=200)
+    parser.add_argument("--chunks", type=int, default=500)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["KNOWLEDGE_COPILOT_DATABASE_PATH"] = str(Path(tmp) / "bench.db")
+        os.environ["KNOWLEDGE_COPILOT_WRITE_BEHIND_LOGGING"] = "false"
+        os.environ.pop("GEMINI_API_KEY", None)
+        from fastapi.testclient import TestClient
+
+        from src import db
+
+        import src.main as main_module
+
+        main_module = importlib.reload(main_module)
+        db.init_db()
+        rng = np.random.default_rng(7)
+        documents = [db.create_document("bench", f"doc-{i}.txt", "text") for i in range(args.documents)]
+        big = documents[0].id
+        db.set_document_content(big, " ".join(f"word{i}" for i in range(args.chunks * 20)))
+        db.create_chunks(
+            "bench",
+            [
+                {
+                    "document_id": big,
+                    "chunk_index": i,
+                    "text": "",
+                    "span": (i * 20 * 7, (i + 1) * 20 * 7),
+                    "embedding": rng.standard_normal(256).astype(np.float32).round(6).tolist(),
+                    "metadata": {"length": 140, "index": i},
+                    "embedding_model": "local-hash-256",
+                }
+                for i in range(args.chunks)
+            ],
+        )
+        citations = [
+            {"chunk_id": f"c{i}", "document_id": big, "text": "근거 문장 " * 40, "score": 0.8123} for i in range(10)
+        ]
+        db.create_query(
+            db.QueryRecord(
+                id="q-bench",
+                project_id="bench",
+                question="질문",
+                answer="답변 " * 200,
+                citations=citations,
+                latency_ms=120,
+                tokens_used=300,
+                model="local-fallback",
+                related_documents=[big],
+                created_at=datetime.now(timezone.utc).isoformat(),
+            )
+        )
+
+        vector = rng.standard_normal(256).astype(np.float32).round(6).tolist()
+        encoded = db._serialize_json(vector)
+        print(f"  db encode 256-dim embedding:          {_per_call_ms(lambda: db._serialize_json(vector), 2000) * 1000:8.1f} us")
+        print(f"  db decode 256-dim embedding:          {_per_call_ms(lambda: db._deserialize_json(encoded), 2000) * 1000:8.1f} us")
+
+        with TestClient(main_module.app) as client:
+            cases = [
+                ("GET /queries/{id}", "/api/v1/queries/q-bench", 500),
+                ("GET /documents?limit=200", "/api/v1/documents?project_id=bench&limit=200", 100),
+                (f"GET /documents/{{id}} ({args.chunks} chunks)", f"/api/v1/documents/{big}?limit=500", 20),
+                (
+                    "  ... with embeddings",
+                    f"/api/v1/documents/{big}?limit=500&fields=id,text,embedding",
+                    10,
+                ),
+            ]
+            for label, url, repeat in cases:
+                assert client.get(url).status_code == 200, url
+                print(f"  {label:<37}{_per_call_ms(lambda: client.get(url), repeat):8.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -10,6 +10,63 @@ class Settings:
     api_timeout: int
     cors_origins: list[str]
     db_path: str
+    summary_batch_tokens: int
+    summary_concurrency: int
+    precompute_summaries: bool
+    summary_precompute_concurrency: int
+    summary_retry_seconds: float
+    summary_max_attempts: int
+    centroid_prefilter_min_documents: int
+    centroid_prefilter_top_documents: int
+    context_token_budget: int
+    mmr_lambda: float
+    llm_max_concurrency: int
+    llm_max_queue: int
+    breaker_failure_threshold: int
+    breaker_reset_seconds: float
+    reembed_batch_size: int
+    reembed_batch_delay_seconds: float
+    write_behind_logging: bool
+    log_flush_batch_size: int
+    log_flush_interval_seconds: float
+    log_buffer_size: int
+    log_enqueue_timeout_seconds: float
+    query_retention_days: int
+    summary_cache_days: int
+    retention_interval_seconds: float
+    retention_batch_size: int
+    index_warmup: bool
+    warmup_projects: int
+    index_snapshots: bool
+    index_snapshot_dir: str
+    index_cache_bytes: int
+    shard_by_project: bool
+    shard_dir: str
+    shard_max_open: int
+    vector_store: str
+    bulk_workers: int
+    bulk_max_files: int
+    bulk_max_archive_bytes: int
+    bulk_embed_batch_size: int
+    bulk_write_batch_size: int
+    dedup_policy: str
+    dedup_threshold: float
+    dedup_collapse: bool
+    ingest_batch_size: int
+    ingest_queue_depth: int
+    admin_token: str
+    profile_slow_requests: bool
+    profile_slow_ms: int
+    profile_sample_interval_ms: int
+    profile_max_seconds: int
+    projection_fit_sample: int
+    projection_eval_queries: int
+    projection_eval_k: int
+    segment_dir: str
+    segment_head_rows: int
+    segment_max_count: int
+    segment_merge_factor: int
+    segment_search_workers: int
 
 
 def _parse_cors(origins: str) -> list[str]:
@@ -18,6 +75,10 @@ def _parse_cors(origins: str) -> list[str]:
     return [origin.strip() for origin in origins.split(",") if origin.strip()]
 
 
+def _parse_bool(value: str) -> bool:
+    return value.strip().lower() in {"1", "true", "yes", "on"}
+
+
 def load_settings() -> Settings:
     return Settings(
         gemini_api_key=os.getenv("GEMINI_API_KEY"),
@@ -29,4 +90,61 @@ def load_settings() -> Settings:
             "KNOWLEDGE_COPILOT_DATABASE_PATH",
             os.path.join(os.path.dirname(__file__), "..", "data", "knowledge_copilot.db"),
         ),
+        summary_batch_tokens=int(os.getenv("KNOWLEDGE_COPILOT_SUMMARY_BATCH_TOKENS", "1800")),
+        summary_concurrency=int(os.getenv("KNOWLEDGE_COPILOT_SUMMARY_CONCURRENCY", "4")),
+        precompute_summaries=_parse_bool(os.getenv("KNOWLEDGE_COPILOT_PRECOMPUTE_SUMMARIES", "false")),
+        summary_precompute_concurrency=int(os.getenv("KNOWLEDGE_COPILOT_SUMMARY_PRECOMPUTE_CONCURRENCY", "1")),
+        summary_retry_seconds=float(os.getenv("KNOWLEDGE_COPILOT_SUMMARY_RETRY_SECONDS", "30")),
+        summary_max_attempts=int(os.getenv("KNOWLEDGE_COPILOT_SUMMARY_MAX_ATTEMPTS", "5")),
+        centroid_prefilter_min_documents=int(os.getenv("KNOWLEDGE_COPILOT_CENTROID_PREFILTER_MIN_DOCUMENTS", "50")),
+        centroid_prefilter_top_documents=int(os.getenv("KNOWLEDGE_COPILOT_CENTROID_PREFILTER_TOP_DOCUMENTS", "20")),
+        context_token_budget=int(os.getenv("KNOWLEDGE_COPILOT_CONTEXT_TOKEN_BUDGET", "1500")),
+        mmr_lambda=float(os.getenv("KNOWLEDGE_COPILOT_MMR_LAMBDA", "0.7")),
+        llm_max_concurrency=int(os.getenv("KNOWLEDGE_COPILOT_LLM_MAX_CONCURRENCY", "8")),
+        llm_max_queue=int(os.getenv("KNOWLEDGE_COPILOT_LLM_MAX_QUEUE", "32")),
+        breaker_failure_threshold=int(os.getenv("KNOWLEDGE_COPILOT_BREAKER_FAILURE_THRESHOLD", "5")),
+        breaker_reset_seconds=float(os.getenv("KNOWLEDGE_COPILOT_BREAKER_RESET_SECONDS", "30")),
+        reembed_batch_size=int(os.getenv("KNOWLEDGE_COPILOT_REEMBED_BATCH_SIZE", "32")),
+        reembed_batch_delay_seconds=float(os.getenv("KNOWLEDGE_COPILOT_REEMBED_BATCH_DELAY_SECONDS", "0.5")),
+        write_behind_logging=_parse_bool(os.getenv("KNOWLEDGE_COPILOT_WRITE_BEHIND_LOGGING", "true")),
+        log_flush_batch_size=int(os.getenv("KNOWLEDGE_COPILOT_LOG_FLUSH_BATCH_SIZE", "100")),
+        log_flush_interval_seconds=float(os.getenv("KNOWLEDGE_COPILOT_LOG_FLUSH_INTERVAL_SECONDS", "0.5")),
+        log_buffer_size=int(os.getenv("KNOWLEDGE_COPILOT_LOG_BUFFER_SIZE", "5000")),
+        log_enqueue_timeout_seconds=float(os.getenv("KNOWLEDGE_COPILOT_LOG_ENQUEUE_TIMEOUT_SECONDS", "1.0")),
+        query_retention_days=int(os.getenv("KNOWLEDGE_COPILOT_QUERY_RETENTION_DAYS", "30")),
+        summary_cache_days=int(os.getenv("KNOWLEDGE_COPILOT_SUMMARY_CACHE_DAYS", "30")),
+        retention_interval_seconds=float(os.getenv("KNOWLEDGE_COPILOT_RETENTION_INTERVAL_SECONDS", "3600")),
+        retention_batch_size=int(os.getenv("KNOWLEDGE_COPILOT_RETENTION_BATCH_SIZE", "5000")),
+        index_warmup=_parse_bool(os.getenv("KNOWLEDGE_COPILOT_INDEX_WARMUP", "true")),
+        warmup_projects=int(os.getenv("KNOWLEDGE_COPILOT_WARMUP_PROJECTS", "10")),
+        index_snapshots=_parse_bool(os.getenv("KNOWLEDGE_COPILOT_INDEX_SNAPSHOTS", "true")),
+        index_snapshot_dir=os.getenv("KNOWLEDGE_COPILOT_INDEX_SNAPSHOT_DIR", ""),
+        index_cache_bytes=int(os.getenv("KNOWLEDGE_COPILOT_INDEX_CACHE_BYTES", str(512 * 1024 * 1024))),
+        shard_by_project=_parse_bool(os.getenv("KNOWLEDGE_COPILOT_SHARD_BY_PROJECT", "false")),
+        shard_dir=os.getenv("KNOWLEDGE_COPILOT_SHARD_DIR", ""),
+        shard_max_open=int(os.getenv("KNOWLEDGE_COPILOT_SHARD_MAX_OPEN", "64")),
+        vector_store=os.getenv("KNOWLEDGE_COPILOT_VECTOR_STORE", "memory").strip().lower(),
+        bulk_workers=int(os.getenv("KNOWLEDGE_COPILOT_BULK_WORKERS", "4")),
+        bulk_max_files=int(os.getenv("KNOWLEDGE_COPILOT_BULK_MAX_FILES", "10000")),
+        bulk_max_archive_bytes=int(os.getenv("KNOWLEDGE_COPILOT_BULK_MAX_ARCHIVE_BYTES", str(512 * 1024 * 1024))),
+        bulk_embed_batch_size=int(os.getenv("KNOWLEDGE_COPILOT_BULK_EMBED_BATCH_SIZE", "100")),
+        bulk_write_batch_size=int(os.getenv("KNOWLEDGE_COPILOT_BULK_WRITE_BATCH_SIZE", "200")),
+        dedup_policy=os.getenv("KNOWLEDGE_COPILOT_DEDUP_POLICY", "off").strip().lower(),
+        dedup_threshold=float(os.getenv("KNOWLEDGE_COPILOT_DEDUP_THRESHOLD", "0.9")),
+        dedup_collapse=_parse_bool(os.getenv("KNOWLEDGE_COPILOT_DEDUP_COLLAPSE", "false")),
+        ingest_batch_size=int(os.getenv("KNOWLEDGE_COPILOT_INGEST_BATCH_SIZE", "32")),
+        ingest_queue_depth=int(os.getenv("KNOWLEDGE_COPILOT_INGEST_QUEUE_DEPTH", "4")),
+        admin_token=os.getenv("KNOWLEDGE_COPILOT_ADMIN_TOKEN", ""),
+        profile_slow_requests=_parse_bool(os.getenv("KNOWLEDGE_COPILOT_PROFILE_SLOW_REQUESTS", "false")),
+        profile_slow_ms=int(os.getenv("KNOWLEDGE_COPILOT_PROFILE_SLOW_MS", "1000")),
+        profile_sample_interval_ms=int(os.getenv("KNOWLEDGE_COPILOT_PROFILE_SAMPLE_INTERVAL_MS", "5")),
+        profile_max_seconds=int(os.getenv("KNOWLEDGE_COPILOT_PROFILE_MAX_SECONDS", "60")),
+        projection_fit_sample=int(os.getenv("KNOWLEDGE_COPILOT_PROJECTION_FIT_SAMPLE", "20000")),
+        projection_eval_queries=int(os.getenv("KNOWLEDGE_COPILOT_PROJECTION_EVAL_QUERIES", "100")),
+        projection_eval_k=int(os.getenv("KNOWLEDGE_COPILOT_PROJECTION_EVAL_K", "10")),
+        segment_dir=os.getenv("KNOWLEDGE_COPILOT_SEGMENT_DIR", ""),
+        segment_head_rows=int(os.getenv("KNOWLEDGE_COPILOT_SEGMENT_HEAD_ROWS", "2000")),
+        segment_max_count=int(os.getenv("KNOWLEDGE_COPILOT_SEGMENT_MAX_COUNT", "8")),
+        segment_merge_factor=int(os.getenv("KNOWLEDGE_COPILOT_SEGMENT_MERGE_FACTOR", "4")),
+        segment_search_workers=int(os.getenv("KNOWLEDGE_COPILOT_SEGMENT_SEARCH_WORKERS", "4")),
     )
@@ -1,14 +1,21 @@
 from __future__ import annotations
 
-import json
+import base64
+import hashlib
+import re
 import sqlite3
+import threading
 import uuid
+import zlib
+from collections import OrderedDict
 from contextlib import contextmanager
 from dataclasses import asdict, dataclass
 from datetime import datetime, timezone
 from pathlib import Path
 from typing import Any, Iterable, Optional
 
+import orjson
+
 from .config import load_settings
 
 
@@ -22,6 +29,12 @@ class DocumentRecord:
     chunk_count: int
     created_at: str
     updated_at: str
+    summary: str | None = None
+    duplicate_of: str | None = None
+
+
+_DOCUMENT_LIST_COLUMNS = "id, project_id, filename, source_type, status, chunk_count, created_at, updated_at"
+_DOCUMENT_COLUMNS = f"{_DOCUMENT_LIST_COLUMNS}, summary, duplicate_of"
 
 
 @dataclass
@@ -36,6 +49,17 @@ class QueryRecord:
     model: str
     related_documents: list[str]
     created_at: str
+    context_tokens_saved: int = 0
+    profile: list[dict[str, Any]] | None = None
+
+
+@dataclass
+class FeedbackRecord:
+    id: str
+    query_id: str
+    rating: int | None
+    note: str | None
+    created_at: str
 
 
 def _current_timestamp() -> str:
@@ -59,20 +83,172 @@ def get_connection() -> sqlite3.Connection:
     return conn
 
 
+_JSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+
+
 def _serialize_json(value: Any) -> str:
-    return json.dumps(value, ensure_ascii=False)
+    # stored as TEXT so SQLite's json_* functions keep working on these columns
+    return orjson.dumps(value, option=_JSON_OPTIONS).decode("utf-8")
 
 
 def _deserialize_json(value: str | bytes | None) -> Any:
     if value is None:
         return None
-    if isinstance(value, bytes):
-        value = value.decode("utf-8")
-    return json.loads(value)
+    return orjson.loads(value)
+
+
+def _compress_text(text: str) -> bytes:
+    return zlib.compress(text.encode("utf-8"), 6)
+
+
+def _decompress_text(value: bytes) -> str:
+    return zlib.decompress(value).decode("utf-8")
+
+
+class _ShardHandle:
+    def __init__(self, conn: sqlite3.Connection):
+        self.conn = conn
+        self.lock = threading.RLock()
+        self.closed = False
+        self.retired = False
+
+    def close(self) -> None:
+        if not self.closed:
+            self.conn.close()
+            self.closed = True
+
+
+def _shard_tag(project_id: str) -> str:
+    return hashlib.sha256(project_id.encode("utf-8")).hexdigest()[:12]
+
+
+def new_record_id(project_id: str) -> str:
+    # a uuid4 whose last group is the project's shard tag, so a document or
+    # query id alone routes to its shard without touching the main file
+    return f"{str(uuid.uuid4())[:24]}{_shard_tag(project_id)}"
+
+
+def _is_tagged(record_id: str, project_id: str) -> bool:
+    return len(record_id) == 36 and record_id[-12:] == _shard_tag(project_id)
+
+
+class ShardRouter:
+    def __init__(self, directory: Path, max_open: int):
+        self.directory = directory
+        self.max_open = max(1, max_open)
+        self.stats = {"opened": 0, "closed": 0}
+        self._handles: OrderedDict[str, _ShardHandle] = OrderedDict()
+        self._initialized: set[Path] = set()
+        self._tags: dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    def path_for(self, project_id: str) -> Path:
+        # readable prefix for operators, hash suffix so distinct ids never collide
+        readable = re.sub(r"[^A-Za-z0-9_-]", "_", project_id)[:40]
+        return self.directory / f"{readable}-{_shard_tag(project_id)}.db"
+
+    def project_for(self, record_id: str) -> str | None:
+        if len(record_id) != 36:
+            return None
+        tag = record_id[-12:]
+        project_id = self._tags.get(tag)
+        if project_id is None:
+            # another process may have opened the shard since the last read
+            with db_transaction() as conn:
+                tags = {_shard_tag(row[0]): row[0] for row in conn.execute("SELECT project_id FROM shards")}
+            with self._lock:
+                self._tags.update(tags)
+            project_id = tags.get(tag)
+        return project_id
+
+    def acquire(self, project_id: str, create: bool) -> _ShardHandle | None:
+        with self._lock:
+            handle = self._handles.get(project_id)
+            if handle is not None:
+                self._handles.move_to_end(project_id)
+                return handle
+            path = self.path_for(project_id)
+            if not create and not path.exists():
+                return None
+            self.directory.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(path, check_same_thread=False)
+            conn.execute("PRAGMA foreign_keys = ON")
+            conn.row_factory = sqlite3.Row
+            if path not in self._initialized:
+                _initialize_schema(conn)
+                conn.commit()
+                self._initialized.add(path)
+            handle = _ShardHandle(conn)
+            self._handles[project_id] = handle
+            self._tags[_shard_tag(project_id)] = project_id
+            self.stats["opened"] += 1
+            while len(self._handles) > self.max_open:
+                _, oldest = self._handles.popitem(last=False)
+                self._retire(oldest)
+        _register_shard(project_id, path.name)
+        return handle
+
+    def _retire(self, handle: _ShardHandle) -> None:
+        # a handle in use is closed by its current holder on release
+        if handle.lock.acquire(blocking=False):
+            try:
+                handle.close()
+            finally:
+                handle.lock.release()
+        else:
+            handle.retired = True
+        self.stats["closed"] += 1
+
+    def open_count(self) -> int:
+        return len(self._handles)
+
+    def close_all(self) -> None:
+        with self._lock:
+            while self._handles:
+                _, handle = self._handles.popitem(last=False)
+                self._retire(handle)
+
+
+_router: ShardRouter | None = None
+_router_lock = threading.Lock()
+
+
+def shard_router() -> ShardRouter | None:
+    global _router
+    settings = load_settings()
+    if not settings.shard_by_project:
+        return None
+    directory = Path(settings.shard_dir).expanduser() if settings.shard_dir else Path(get_db_path()).parent / "shards"
+    with _router_lock:
+        if _router is None or _router.directory != directory or _router.max_open != max(1, settings.shard_max_open):
+            if _router is not None:
+                _router.close_all()
+            _router = ShardRouter(directory, settings.shard_max_open)
+        return _router
 
 
 @contextmanager
-def db_transaction():
+def db_transaction(project_id: str | None = None, create: bool = False):
+    # project_id routes to that project's shard when sharding is enabled;
+    # everything else, and projects without a shard yet, use the main file
+    router = shard_router() if project_id is not None else None
+    while router is not None:
+        handle = router.acquire(project_id, create)
+        if handle is None:
+            break
+        with handle.lock:
+            if handle.closed:
+                continue
+            try:
+                yield handle.conn
+                handle.conn.commit()
+            except BaseException:
+                handle.conn.rollback()
+                raise
+            finally:
+                if handle.retired:
+                    handle.close()
+            return
     conn = get_connection()
     try:
         yield conn
@@ -81,77 +257,366 @@ def db_transaction():
         conn.close()
 
 
+def _register_shard(project_id: str, filename: str) -> None:
+    with db_transaction() as conn:
+        conn.execute(
+            "INSERT OR IGNORE INTO shards (project_id, filename, created_at) VALUES (?, ?, ?)",
+            (project_id, filename, _current_timestamp()),
+        )
+
+
+def partitions() -> list[str | None]:
+    # the main file first: it keeps rows written before sharding was enabled
+    if shard_router() is None:
+        return [None]
+    with db_transaction() as conn:
+        rows = conn.execute("SELECT project_id FROM shards ORDER BY project_id").fetchall()
+    return [None, *(row["project_id"] for row in rows)]
+
+
+def _route(table: str, key: str, value: str) -> str | None:
+    router = shard_router()
+    if router is None:
+        return None
+    project_id = router.project_for(value)
+    if project_id is not None:
+        return project_id
+    # ids minted elsewhere (caller-supplied, or migrated from the main file) keep a route row
+    with db_transaction() as conn:
+        row = conn.execute(f"SELECT project_id FROM {table} WHERE {key} = ?", (value,)).fetchone()
+    return None if row is None else row["project_id"]
+
+
+def _document_shard(document_id: str) -> str | None:
+    return _route("document_routes", "document_id", document_id)
+
+
+def _query_shard(query_id: str) -> str | None:
+    return _route("query_routes", "query_id", query_id)
+
+
+def _group_documents(document_ids: list[str]) -> dict[str | None, list[str]]:
+    if shard_router() is None:
+        return {None: list(document_ids)}
+    groups: dict[str | None, list[str]] = {}
+    for document_id in document_ids:
+        groups.setdefault(_document_shard(document_id), []).append(document_id)
+    return groups
+
+
 def init_db() -> None:
     with db_transaction() as conn:
-        conn.executescript(
-            """
-            CREATE TABLE IF NOT EXISTS documents (
-                id TEXT PRIMARY KEY,
-                project_id TEXT NOT NULL,
-                filename TEXT,
-                source_type TEXT NOT NULL,
-                status TEXT NOT NULL,
-                chunk_count INTEGER NOT NULL DEFAULT 0,
-                created_at TEXT NOT NULL,
-                updated_at TEXT NOT NULL
-            );
-
-            CREATE TABLE IF NOT EXISTS chunks (
-                id TEXT PRIMARY KEY,
-                project_id TEXT NOT NULL,
-                document_id TEXT NOT NULL,
-                chunk_index INTEGER NOT NULL,
-                text TEXT NOT NULL,
-                embedding TEXT NOT NULL,
-                metadata TEXT,
-                created_at TEXT NOT NULL,
-                FOREIGN KEY (document_id) REFERENCES documents(id) ON DELETE CASCADE
-            );
-
-            CREATE TABLE IF NOT EXISTS queries (
-                id TEXT PRIMARY KEY,
-                project_id TEXT NOT NULL,
-                question TEXT NOT NULL,
-                answer TEXT NOT NULL,
-                citations TEXT NOT NULL,
-                latency_ms INTEGER NOT NULL,
-                tokens_used INTEGER NOT NULL,
-                model TEXT NOT NULL,
-                related_documents TEXT NOT NULL,
-                created_at TEXT NOT NULL
-            );
-
-            CREATE TABLE IF NOT EXISTS feedback (
-                id TEXT PRIMARY KEY,
-                query_id TEXT NOT NULL,
-                rating INTEGER,
-                note TEXT,
-                created_at TEXT NOT NULL,
-                FOREIGN KEY (query_id) REFERENCES queries(id) ON DELETE CASCADE
-            );
-
-            CREATE TABLE IF NOT EXISTS actions (
-                id TEXT PRIMARY KEY,
-                project_id TEXT NOT NULL,
-                type TEXT NOT NULL,
-                payload TEXT NOT NULL,
-                status TEXT NOT NULL,
-                result TEXT,
-                created_at TEXT NOT NULL,
-                completed_at TEXT
-            );
-
-            CREATE INDEX IF NOT EXISTS idx_documents_project ON documents(project_id);
-            CREATE INDEX IF NOT EXISTS idx_chunks_project ON chunks(project_id);
-            CREATE INDEX IF NOT EXISTS idx_chunks_doc ON chunks(document_id);
-            CREATE INDEX IF NOT EXISTS idx_queries_project ON queries(project_id);
-            CREATE INDEX IF NOT EXISTS idx_feedback_query ON feedback(query_id);
-            """
+        _initialize_schema(conn)
+    migrate_to_shards()
+
+
+# tables that live in a project's shard, in copy order (parents first)
+_SHARDED_TABLES = (
+    ("documents", "project_id = ?"),
+    ("chunks", "project_id = ?"),
+    ("minhash_signatures", "project_id = ?"),
+    ("minhash_buckets", "project_id = ?"),
+    ("queries", "project_id = ?"),
+    ("feedback", "query_id IN (SELECT id FROM main.queries WHERE project_id = ?)"),
+    ("projections", "project_id = ?"),
+)
+
+
+def migrate_to_shards() -> int:
+    # rows written before sharding was enabled move into their project's shard,
+    # otherwise the first shard write for a project would hide them
+    router = shard_router()
+    if router is None:
+        return 0
+    with db_transaction() as conn:
+        projects = [
+            row[0]
+            for row in conn.execute(
+                """SELECT project_id FROM documents UNION SELECT project_id FROM queries
+                   UNION SELECT project_id FROM query_rollups UNION SELECT project_id FROM projections"""
+            )
+        ]
+    for project_id in projects:
+        _migrate_project(router, project_id)
+    return len(projects)
+
+
+def _migrate_project(router: ShardRouter, project_id: str) -> None:
+    with db_transaction(project_id, create=True):
+        pass
+    conn = get_connection()
+    try:
+        conn.execute("ATTACH DATABASE ? AS shard", (str(router.path_for(project_id)),))
+        for table, where in _SHARDED_TABLES:
+            columns = ", ".join(row["name"] for row in conn.execute(f"PRAGMA main.table_info({table})"))
+            conn.execute(
+                f"INSERT OR IGNORE INTO shard.{table} ({columns}) SELECT {columns} FROM main.{table} WHERE {where}",
+                (project_id,),
+            )
+        for table, key in (("documents", "document"), ("queries", "query")):
+            conn.executemany(
+                f"INSERT OR IGNORE INTO main.{key}_routes ({key}_id, project_id) VALUES (?, ?)",
+                [
+                    (row[0], project_id)
+                    for row in conn.execute(f"SELECT id FROM main.{table} WHERE project_id = ?", (project_id,))
+                    if not _is_tagged(row[0], project_id)
+                ],
+            )
+        for row in conn.execute("SELECT * FROM main.query_rollups WHERE project_id = ?", (project_id,)).fetchall():
+            stats = _rollup_from_row(row)
+            existing = conn.execute(
+                """SELECT * FROM shard.query_rollups
+                   WHERE granularity = ? AND project_id = ? AND bucket_start = ? AND model = ?""",
+                (row["granularity"], project_id, row["bucket_start"], row["model"]),
+            ).fetchone()
+            if existing is not None:
+                _merge_rollup(stats, _rollup_from_row(existing))
+            conn.execute(
+                f"""INSERT OR REPLACE INTO shard.query_rollups
+                    (granularity, project_id, bucket_start, model, latency_histogram, {", ".join(_ROLLUP_COUNTERS)})
+                    VALUES (?, ?, ?, ?, ?, {", ".join("?" for _ in _ROLLUP_COUNTERS)})""",
+                (
+                    row["granularity"],
+                    project_id,
+                    row["bucket_start"],
+                    row["model"],
+                    _serialize_json(stats["latency_histogram"]),
+                    *(stats[name] for name in _ROLLUP_COUNTERS),
+                ),
+            )
+        # counts are recomputed from the merged rows and the version bumped,
+        # so no index built from either file looks current
+        conn.execute(
+            """INSERT INTO shard.project_stats (project_id, document_count, index_version)
+               VALUES (?, (SELECT COUNT(*) FROM shard.documents WHERE project_id = ?), lower(hex(randomblob(16))))
+               ON CONFLICT(project_id) DO UPDATE SET document_count = excluded.document_count,
+                                                     index_version = excluded.index_version""",
+            (project_id, project_id),
+        )
+        for table, where in (*reversed(_SHARDED_TABLES), ("query_rollups", "project_id = ?"), ("project_stats", "project_id = ?")):
+            conn.execute(f"DELETE FROM main.{table} WHERE {where}", (project_id,))
+        conn.commit()
+        conn.execute("DETACH DATABASE shard")
+    finally:
+        conn.close()
+
+
+def _initialize_schema(conn: sqlite3.Connection) -> None:
+    backfill_stats = not _table_exists(conn, "project_stats")
+    conn.executescript(
+        """
+        CREATE TABLE IF NOT EXISTS documents (
+            id TEXT PRIMARY KEY,
+            project_id TEXT NOT NULL,
+            filename TEXT,
+            source_type TEXT NOT NULL,
+            status TEXT NOT NULL,
+            chunk_count INTEGER NOT NULL DEFAULT 0,
+            created_at TEXT NOT NULL,
+            updated_at TEXT NOT NULL,
+            summary TEXT,
+            centroid TEXT,
+            content BLOB,
+            duplicate_of TEXT
+        );
+
+        CREATE TABLE IF NOT EXISTS chunks (
+            id TEXT PRIMARY KEY,
+            project_id TEXT NOT NULL,
+            document_id TEXT NOT NULL,
+            chunk_index INTEGER NOT NULL,
+            text TEXT NOT NULL DEFAULT '',
+            embedding TEXT NOT NULL,
+            metadata TEXT,
+            created_at TEXT NOT NULL,
+            start_offset INTEGER,
+            end_offset INTEGER,
+            embedding_model TEXT,
+            embedding_dim INTEGER,
+            shadow_embedding TEXT,
+            shadow_embedding_model TEXT,
+            duplicate_of TEXT,
+            reduced_embedding BLOB,
+            reduced_version TEXT,
+            FOREIGN KEY (document_id) REFERENCES documents(id) ON DELETE CASCADE
+        );
+
+        CREATE TABLE IF NOT EXISTS queries (
+            id TEXT PRIMARY KEY,
+            project_id TEXT NOT NULL,
+            question TEXT NOT NULL,
+            answer TEXT NOT NULL,
+            citations TEXT NOT NULL,
+            latency_ms INTEGER NOT NULL,
+            tokens_used INTEGER NOT NULL,
+            model TEXT NOT NULL,
+            related_documents TEXT NOT NULL,
+            created_at TEXT NOT NULL
+        );
+
+        CREATE TABLE IF NOT EXISTS feedback (
+            id TEXT PRIMARY KEY,
+            query_id TEXT NOT NULL,
+            rating INTEGER,
+            note TEXT,
+            created_at TEXT NOT NULL,
+            FOREIGN KEY (query_id) REFERENCES queries(id) ON DELETE CASCADE
+        );
+
+        CREATE TABLE IF NOT EXISTS actions (
+            id TEXT PRIMARY KEY,
+            project_id TEXT NOT NULL,
+            type TEXT NOT NULL,
+            payload TEXT NOT NULL,
+            status TEXT NOT NULL,
+            result TEXT,
+            created_at TEXT NOT NULL,
+            completed_at TEXT
+        );
+
+        CREATE TABLE IF NOT EXISTS project_stats (
+            project_id TEXT PRIMARY KEY,
+            document_count INTEGER NOT NULL DEFAULT 0
+        );
+
+        CREATE TABLE IF NOT EXISTS projections (
+            project_id TEXT PRIMARY KEY,
+            embedding_model TEXT,
+            method TEXT NOT NULL,
+            source_dim INTEGER NOT NULL,
+            target_dim INTEGER NOT NULL,
+            components BLOB NOT NULL,
+            version TEXT NOT NULL,
+            sample_size INTEGER NOT NULL,
+            explained_variance REAL,
+            fitted_at TEXT NOT NULL
+        );
+
+        CREATE TABLE IF NOT EXISTS reembed_jobs (
+            project_id TEXT PRIMARY KEY,
+            target_model TEXT NOT NULL,
+            status TEXT NOT NULL,
+            total INTEGER NOT NULL DEFAULT 0,
+            processed INTEGER NOT NULL DEFAULT 0,
+            last_chunk_id TEXT NOT NULL DEFAULT '',
+            error TEXT,
+            started_at TEXT NOT NULL,
+            updated_at TEXT NOT NULL
+        );
+
+        CREATE TABLE IF NOT EXISTS shards (
+            project_id TEXT PRIMARY KEY,
+            filename TEXT NOT NULL,
+            created_at TEXT NOT NULL
+        );
+
+        CREATE TABLE IF NOT EXISTS document_routes (
+            document_id TEXT PRIMARY KEY,
+            project_id TEXT NOT NULL
+        );
+
+        CREATE TABLE IF NOT EXISTS query_routes (
+            query_id TEXT PRIMARY KEY,
+            project_id TEXT NOT NULL
+        );
+
+        CREATE TABLE IF NOT EXISTS summary_cache (
+            content_hash TEXT PRIMARY KEY,
+            summary TEXT NOT NULL,
+            model TEXT NOT NULL,
+            created_at TEXT NOT NULL
+        );
+
+        CREATE INDEX IF NOT EXISTS idx_summary_cache_created ON summary_cache(created_at);
+
+        DROP INDEX IF EXISTS idx_documents_project;
+        CREATE INDEX IF NOT EXISTS idx_documents_project_created ON documents(
+            project_id, created_at, id, filename, source_type, status, chunk_count, updated_at
+        );
+        CREATE INDEX IF NOT EXISTS idx_chunks_project ON chunks(project_id);
+        DROP INDEX IF EXISTS idx_chunks_doc;
+        CREATE INDEX IF NOT EXISTS idx_chunks_doc_index ON chunks(document_id, chunk_index);
+        CREATE TABLE IF NOT EXISTS query_rollups (
+            granularity TEXT NOT NULL,
+            project_id TEXT NOT NULL,
+            bucket_start TEXT NOT NULL,
+            model TEXT NOT NULL,
+            query_count INTEGER NOT NULL DEFAULT 0,
+            latency_total INTEGER NOT NULL DEFAULT 0,
+            latency_histogram TEXT NOT NULL,
+            tokens_used INTEGER NOT NULL DEFAULT 0,
+            context_tokens_saved INTEGER NOT NULL DEFAULT 0,
+            feedback_count INTEGER NOT NULL DEFAULT 0,
+            rating_count INTEGER NOT NULL DEFAULT 0,
+            rating_total INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (granularity, project_id, bucket_start, model)
+        );
+
+        DROP INDEX IF EXISTS idx_queries_project;
+        CREATE INDEX IF NOT EXISTS idx_queries_project_created ON queries(project_id, created_at);
+        CREATE INDEX IF NOT EXISTS idx_queries_created ON queries(created_at);
+        CREATE INDEX IF NOT EXISTS idx_query_rollups_bucket ON query_rollups(granularity, bucket_start);
+        CREATE INDEX IF NOT EXISTS idx_feedback_query ON feedback(query_id);
+
+        CREATE TABLE IF NOT EXISTS minhash_signatures (
+            kind TEXT NOT NULL,
+            item_id TEXT NOT NULL,
+            project_id TEXT NOT NULL,
+            signature BLOB NOT NULL,
+            PRIMARY KEY (kind, item_id)
+        );
+        CREATE TABLE IF NOT EXISTS minhash_buckets (
+            project_id TEXT NOT NULL,
+            kind TEXT NOT NULL,
+            band INTEGER NOT NULL,
+            bucket INTEGER NOT NULL,
+            item_id TEXT NOT NULL,
+            PRIMARY KEY (project_id, kind, band, bucket, item_id)
+        ) WITHOUT ROWID;
+        CREATE INDEX IF NOT EXISTS idx_minhash_buckets_item ON minhash_buckets(kind, item_id);
+        """
+    )
+    _ensure_columns(conn, "documents", {"summary": "TEXT", "centroid": "TEXT", "content": "BLOB", "duplicate_of": "TEXT"})
+    _ensure_columns(
+        conn,
+        "chunks",
+        {
+            "start_offset": "INTEGER",
+            "end_offset": "INTEGER",
+            "embedding_model": "TEXT",
+            "embedding_dim": "INTEGER",
+            "shadow_embedding": "TEXT",
+            "shadow_embedding_model": "TEXT",
+            "duplicate_of": "TEXT",
+            "reduced_embedding": "BLOB",
+            "reduced_version": "TEXT",
+        },
+    )
+    conn.execute("UPDATE chunks SET embedding_dim = json_array_length(embedding) WHERE embedding_dim IS NULL")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_chunks_project_embedding ON chunks(project_id, embedding_model, embedding_dim)")
+    _ensure_columns(conn, "queries", {"context_tokens_saved": "INTEGER NOT NULL DEFAULT 0", "profile": "TEXT"})
+    _ensure_columns(conn, "project_stats", {"index_version": "TEXT"})
+    conn.execute("UPDATE project_stats SET index_version = lower(hex(randomblob(16))) WHERE index_version IS NULL")
+    if backfill_stats:
+        conn.execute(
+            "INSERT INTO project_stats (project_id, document_count) SELECT project_id, COUNT(*) FROM documents GROUP BY project_id"
         )
 
 
+def _table_exists(conn: sqlite3.Connection, table: str) -> bool:
+    row = conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table,)).fetchone()
+    return row is not None
+
+
+def _ensure_columns(conn: sqlite3.Connection, table: str, columns: dict[str, str]) -> None:
+    existing = {row["name"] for row in conn.execute(f"PRAGMA table_info({table})").fetchall()}
+    for name, ddl in columns.items():
+        if name not in existing:
+            conn.execute(f"ALTER TABLE {table} ADD COLUMN {name} {ddl}")
+
+
 def create_document(project_id: str, filename: str | None, source_type: str) -> DocumentRecord:
-    document_id = str(uuid.uuid4())
+    document_id = new_record_id(project_id)
     now = _current_timestamp()
     record = DocumentRecord(
         id=document_id,
@@ -163,7 +628,7 @@ def create_document(project_id: str, filename: str | None, source_type: str) ->
         created_at=now,
         updated_at=now,
     )
-    with db_transaction() as conn:
+    with db_transaction(project_id, create=True) as conn:
         conn.execute(
             """INSERT INTO documents (id, project_id, filename, source_type, status, chunk_count, created_at, updated_at)
                VALUES (?, ?, ?, ?, ?, ?, ?, ?)""",
@@ -178,12 +643,75 @@ def create_document(project_id: str, filename: str | None, source_type: str) ->
                 record.updated_at,
             ),
         )
+        conn.execute(
+            """INSERT INTO project_stats (project_id, document_count) VALUES (?, 1)
+               ON CONFLICT(project_id) DO UPDATE SET document_count = document_count + 1""",
+            (project_id,),
+        )
     return record
 
 
+def create_documents_bulk(project_id: str, documents: list[dict[str, Any]]) -> list[DocumentRecord]:
+    now = _current_timestamp()
+    records, document_rows, chunk_rows = [], [], []
+    for item in documents:
+        chunks = item["chunks"]
+        record = DocumentRecord(
+            id=item.get("id") or new_record_id(project_id),
+            project_id=project_id,
+            filename=item["filename"],
+            source_type=item["source_type"],
+            status=item.get("status") or ("ready" if chunks else "empty"),
+            chunk_count=len(chunks),
+            created_at=now,
+            updated_at=now,
+            duplicate_of=item.get("duplicate_of"),
+        )
+        records.append(record)
+        document_rows.append(
+            (
+                record.id,
+                project_id,
+                record.filename,
+                record.source_type,
+                record.status,
+                record.chunk_count,
+                now,
+                now,
+                _compress_text(item["text"]),
+                _serialize_json(item["centroid"]) if item.get("centroid") else None,
+                record.duplicate_of,
+            )
+        )
+        chunk_rows.extend(_chunk_row(project_id, {**chunk, "document_id": record.id}, now) for chunk in chunks)
+    if not records:
+        return records
+    routes = [(record.id, project_id) for record in records if not _is_tagged(record.id, project_id)]
+    if routes and shard_router() is not None:
+        with db_transaction() as conn:
+            conn.executemany("INSERT INTO document_routes (document_id, project_id) VALUES (?, ?)", routes)
+    # one transaction per batch: documents, chunks and the stats row commit together
+    with db_transaction(project_id, create=True) as conn:
+        conn.executemany(
+            """INSERT INTO documents (id, project_id, filename, source_type, status, chunk_count, created_at, updated_at,
+                                      content, centroid, duplicate_of)
+               VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+            document_rows,
+        )
+        conn.executemany(_INSERT_CHUNK, chunk_rows)
+        conn.execute(
+            """INSERT INTO project_stats (project_id, document_count) VALUES (?, ?)
+               ON CONFLICT(project_id) DO UPDATE SET document_count = document_count + excluded.document_count""",
+            (project_id, len(records)),
+        )
+        if chunk_rows:
+            _bump_index_version(conn, project_id)
+    return records
+
+
 def set_document_status(document_id: str, status: str, chunk_count: int | None = None) -> None:
     now = _current_timestamp()
-    with db_transaction() as conn:
+    with db_transaction(_document_shard(document_id)) as conn:
         if chunk_count is None:
             conn.execute(
                 "UPDATE documents SET status = ?, updated_at = ? WHERE id = ?",
@@ -196,10 +724,15 @@ def set_document_status(document_id: str, status: str, chunk_count: int | None =
             )
 
 
+def set_document_duplicate(document_id: str, duplicate_of: str | None) -> None:
+    with db_transaction(_document_shard(document_id)) as conn:
+        conn.execute("UPDATE documents SET duplicate_of = ? WHERE id = ?", (duplicate_of, document_id))
+
+
 def get_document(document_id: str) -> DocumentRecord | None:
-    with db_transaction() as conn:
+    with db_transaction(_document_shard(document_id)) as conn:
         row = conn.execute(
-            "SELECT * FROM documents WHERE id = ?",
+            f"SELECT {_DOCUMENT_COLUMNS} FROM documents WHERE id = ?",
             (document_id,),
         ).fetchone()
     if row is None:
@@ -207,92 +740,916 @@ def get_document(document_id: str) -> DocumentRecord | None:
     return DocumentRecord(**dict(row))
 
 
-def list_documents(project_id: str, limit: int = 20, offset: int = 0) -> list[DocumentRecord]:
-    with db_transaction() as conn:
+def encode_document_cursor(record: DocumentRecord) -> str:
+    raw = _serialize_json([record.created_at, record.id]).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii")
+
+
+def decode_document_cursor(cursor: str) -> tuple[str, str]:
+    try:
+        created_at, document_id = _deserialize_json(base64.urlsafe_b64decode(cursor.encode("ascii")))
+    except (ValueError, TypeError) as err:
+        raise ValueError("invalid cursor") from err
+    return str(created_at), str(document_id)
+
+
+def list_documents(
+    project_id: str,
+    limit: int = 20,
+    offset: int = 0,
+    after: tuple[str, str] | None = None,
+) -> list[DocumentRecord]:
+    # (created_at, id) keyset walks idx_documents_project_created without
+    # sorting or skipping rows; offset is kept for older clients.
+    if after is not None and offset:
+        raise ValueError("offset cannot be combined with a keyset cursor")
+    with db_transaction(project_id) as conn:
+        if after is not None:
+            rows = conn.execute(
+                f"""
+                SELECT {_DOCUMENT_LIST_COLUMNS} FROM documents
+                WHERE project_id = ? AND (created_at, id) < (?, ?)
+                ORDER BY created_at DESC, id DESC
+                LIMIT ?
+                """,
+                (project_id, after[0], after[1], limit),
+            ).fetchall()
+        else:
+            rows = conn.execute(
+                f"""
+                SELECT {_DOCUMENT_LIST_COLUMNS} FROM documents
+                WHERE project_id = ?
+                ORDER BY created_at DESC, id DESC
+                LIMIT ? OFFSET ?
+                """,
+                (project_id, limit, offset),
+            ).fetchall()
+    return [DocumentRecord(**dict(row)) for row in rows]
+
+
+def count_documents(project_id: str) -> int:
+    with db_transaction(project_id) as conn:
+        row = conn.execute(
+            "SELECT document_count FROM project_stats WHERE project_id = ?",
+            (project_id,),
+        ).fetchone()
+    return 0 if row is None else int(row["document_count"])
+
+
+def set_document_content(document_id: str, text: str) -> None:
+    with db_transaction(_document_shard(document_id)) as conn:
+        conn.execute(
+            "UPDATE documents SET content = ? WHERE id = ?",
+            (_compress_text(text), document_id),
+        )
+
+
+def get_document_content(document_id: str) -> str | None:
+    with db_transaction(_document_shard(document_id)) as conn:
+        row = conn.execute("SELECT content FROM documents WHERE id = ?", (document_id,)).fetchone()
+    if row is None or row["content"] is None:
+        return None
+    return _decompress_text(row["content"])
+
+
+def _materialize_chunk_text(
+    conn: sqlite3.Connection, chunks: list[dict[str, Any]], contents: dict[str, str] | None = None
+) -> None:
+    # offset-backed chunks store no text of their own; slice it out of the
+    # document content, decompressing each document at most once per read.
+    # Callers paging through one document pass its content in to skip even that.
+    contents = dict(contents or {})
+    document_ids = {chunk["document_id"] for chunk in chunks if chunk.get("start_offset") is not None} - contents.keys()
+    if document_ids:
+        placeholders = ", ".join("?" for _ in document_ids)
         rows = conn.execute(
-            """
-            SELECT * FROM documents
-            WHERE project_id = ?
-            ORDER BY created_at DESC
-            LIMIT ? OFFSET ?
+            f"SELECT id, content FROM documents WHERE id IN ({placeholders}) AND content IS NOT NULL",
+            tuple(document_ids),
+        ).fetchall()
+        contents.update((row["id"], _decompress_text(row["content"])) for row in rows)
+    for chunk in chunks:
+        content = contents.get(chunk["document_id"])
+        if chunk.get("start_offset") is not None and content is not None:
+            chunk["text"] = content[chunk["start_offset"] : chunk["end_offset"]]
+
+
+def set_document_centroid(document_id: str, centroid: list[float]) -> None:
+    with db_transaction(_document_shard(document_id)) as conn:
+        conn.execute(
+            "UPDATE documents SET centroid = ? WHERE id = ?",
+            (_serialize_json(centroid), document_id),
+        )
+
+
+def set_document_summary(document_id: str, summary: str) -> None:
+    with db_transaction(_document_shard(document_id)) as conn:
+        conn.execute(
+            "UPDATE documents SET summary = ? WHERE id = ?",
+            (summary, document_id),
+        )
+
+
+def list_unsummarized_documents() -> list[str]:
+    document_ids: list[str] = []
+    for shard in partitions():
+        with db_transaction(shard) as conn:
+            rows = conn.execute(
+                "SELECT id FROM documents WHERE status = 'ready' AND summary IS NULL ORDER BY created_at"
+            ).fetchall()
+        document_ids.extend(row["id"] for row in rows)
+    return document_ids
+
+
+def get_document_summaries(document_ids: list[str]) -> dict[str, str]:
+    summaries: dict[str, str] = {}
+    for shard, ids in _group_documents(document_ids).items():
+        if not ids:
+            continue
+        placeholders = ", ".join("?" for _ in ids)
+        with db_transaction(shard) as conn:
+            rows = conn.execute(
+                f"SELECT id, summary FROM documents WHERE id IN ({placeholders}) AND summary IS NOT NULL",
+                tuple(ids),
+            ).fetchall()
+        summaries.update((row["id"], row["summary"]) for row in rows)
+    return summaries
+
+
+def get_document_centroids(project_id: str) -> list[tuple[str, list[float] | None]]:
+    with db_transaction(project_id) as conn:
+        rows = conn.execute(
+            "SELECT id, centroid FROM documents WHERE project_id = ? AND status = 'ready'",
+            (project_id,),
+        ).fetchall()
+    return [(row["id"], _deserialize_json(row["centroid"])) for row in rows]
+
+
+def _bump_index_version(conn: sqlite3.Connection, project_id: str) -> None:
+    # a random token rather than a counter, so an index cached or snapshotted
+    # from another database file can never look current
+    conn.execute(
+        """INSERT INTO project_stats (project_id, document_count, index_version)
+           VALUES (?, 0, lower(hex(randomblob(16))))
+           ON CONFLICT(project_id) DO UPDATE SET index_version = excluded.index_version""",
+        (project_id,),
+    )
+
+
+_deferred_versions: dict[str, list[bool]] = {}
+_deferred_lock = threading.Lock()
+
+
+@contextmanager
+def deferred_index_version(project_id: str):
+    # chunk inserts inside the block share one version bump on exit, so a
+    # document written in many batches invalidates cached indexes only once
+    with _deferred_lock:
+        entry = _deferred_versions.setdefault(project_id, [])
+        entry.append(False)
+    try:
+        yield
+    finally:
+        with _deferred_lock:
+            written = entry.pop()
+            if entry:
+                entry[-1] = entry[-1] or written
+                written = False
+            else:
+                del _deferred_versions[project_id]
+        if written:
+            with db_transaction(project_id) as conn:
+                _bump_index_version(conn, project_id)
+
+
+def _defer_version_bump(project_id: str) -> bool:
+    with _deferred_lock:
+        entry = _deferred_versions.get(project_id)
+        if not entry:
+            return False
+        entry[-1] = True
+        return True
+
+
+def get_index_version(project_id: str) -> str:
+    with db_transaction(project_id) as conn:
+        row = conn.execute("SELECT index_version FROM project_stats WHERE project_id = ?", (project_id,)).fetchone()
+    return row[0] if row and row[0] else ""
+
+
+def create_chunk(
+    document_id: str,
+    project_id: str,
+    chunk_index: int,
+    text: str,
+    embedding: list[float],
+    metadata: dict[str, Any],
+    span: tuple[int, int] | None = None,
+    embedding_model: str | None = None,
+) -> str:
+    return create_chunks(
+        project_id,
+        [
+            {
+                "document_id": document_id,
+                "chunk_index": chunk_index,
+                "text": text,
+                "embedding": embedding,
+                "metadata": metadata,
+                "span": span,
+                "embedding_model": embedding_model,
+            }
+        ],
+    )[0]
+
+
+_INSERT_CHUNK = """INSERT INTO chunks (id, project_id, document_id, chunk_index, text, embedding, metadata, created_at,
+                                       start_offset, end_offset, embedding_model, embedding_dim, duplicate_of,
+                                       reduced_embedding, reduced_version)
+                  VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"""
+
+
+def _chunk_row(project_id: str, chunk: dict[str, Any], now: str) -> tuple[Any, ...]:
+    span = chunk.get("span")
+    start_offset, end_offset = span if span is not None else (None, None)
+    return (
+        chunk.get("id") or str(uuid.uuid4()),
+        project_id,
+        chunk["document_id"],
+        chunk["chunk_index"],
+        "" if span is not None else chunk["text"],
+        _serialize_json(chunk["embedding"]),
+        _serialize_json(chunk.get("metadata") or {}),
+        now,
+        start_offset,
+        end_offset,
+        chunk.get("embedding_model"),
+        len(chunk["embedding"]),
+        chunk.get("duplicate_of"),
+        chunk.get("reduced_embedding"),
+        chunk.get("reduced_version"),
+    )
+
+
+def create_chunks(project_id: str, chunks: list[dict[str, Any]]) -> list[str]:
+    now = _current_timestamp()
+    rows = [_chunk_row(project_id, chunk, now) for chunk in chunks]
+    if not rows:
+        return []
+    with db_transaction(project_id, create=True) as conn:
+        conn.executemany(_INSERT_CHUNK, rows)
+        if not _defer_version_bump(project_id):
+            _bump_index_version(conn, project_id)
+    return [row[0] for row in rows]
+
+
+def delete_chunks(project_id: str, chunk_ids: list[str]) -> int:
+    if not chunk_ids:
+        return 0
+    with db_transaction(project_id) as conn:
+        _delete_minhash(conn, "chunk", chunk_ids)
+        deleted = conn.execute(
+            f"DELETE FROM chunks WHERE project_id = ? AND id IN ({', '.join('?' for _ in chunk_ids)})",
+            (project_id, *chunk_ids),
+        ).rowcount
+        if deleted:
+            _bump_index_version(conn, project_id)
+    return deleted
+
+
+def delete_chunks_for_document(document_id: str) -> int:
+    with db_transaction(_document_shard(document_id)) as conn:
+        row = conn.execute("SELECT project_id FROM documents WHERE id = ?", (document_id,)).fetchone()
+        chunk_ids = [item["id"] for item in conn.execute("SELECT id FROM chunks WHERE document_id = ?", (document_id,))]
+        _delete_minhash(conn, "chunk", chunk_ids)
+        deleted = conn.execute("DELETE FROM chunks WHERE document_id = ?", (document_id,)).rowcount
+        if row is not None:
+            _bump_index_version(conn, row["project_id"])
+    return deleted
+
+
+def get_chunks_by_project(
+    project_id: str,
+    document_ids: list[str] | None = None,
+    embedding_model: str | None = None,
+    embedding_dim: int | None = None,
+) -> list[dict[str, Any]]:
+    query = f"SELECT project_id, {', '.join(CHUNK_FIELDS)} FROM chunks WHERE project_id = ?"
+    params: tuple[Any, ...] = (project_id,)
+    if document_ids is not None:
+        if not document_ids:
+            return []
+        query += f" AND document_id IN ({', '.join('?' for _ in document_ids)})"
+        params += tuple(document_ids)
+    if embedding_dim is not None:
+        clause, extra = _embedding_filter(embedding_model, embedding_dim)
+        query += clause
+        params += extra
+    with db_transaction(project_id) as conn:
+        rows = conn.execute(query, params).fetchall()
+        chunks: list[dict[str, Any]] = []
+        for row in rows:
+            payload = dict(row)
+            payload["embedding"] = _deserialize_json(payload["embedding"])
+            payload["metadata"] = _deserialize_json(payload["metadata"])
+            chunks.append(payload)
+        _materialize_chunk_text(conn, chunks)
+    return chunks
+
+
+CHUNK_FIELDS = (
+    "id",
+    "document_id",
+    "chunk_index",
+    "text",
+    "embedding",
+    "metadata",
+    "start_offset",
+    "end_offset",
+    "embedding_model",
+    "embedding_dim",
+    "duplicate_of",
+    "created_at",
+)
+_TEXT_SOURCE_FIELDS = ("document_id", "start_offset", "end_offset")
+
+
+def _embedding_filter(embedding_model: str | None, embedding_dim: int) -> tuple[str, tuple[Any, ...]]:
+    # rows written before provenance tracking match on dimension alone
+    if embedding_model is None:
+        return " AND embedding_dim = ?", (embedding_dim,)
+    return " AND embedding_dim = ? AND (embedding_model = ? OR embedding_model IS NULL)", (embedding_dim, embedding_model)
+
+
+def get_chunk_vectors(
+    project_id: str,
+    embedding_model: str | None,
+    embedding_dim: int,
+) -> tuple[str, list[tuple[str, str, list[float]]]]:
+    clause, params = _embedding_filter(embedding_model, embedding_dim)
+    with db_transaction(project_id) as conn:
+        # version first: a write racing this read leaves the index looking stale, never fresh
+        version = conn.execute("SELECT index_version FROM project_stats WHERE project_id = ?", (project_id,)).fetchone()
+        rows = conn.execute(
+            f"SELECT id, document_id, embedding FROM chunks WHERE project_id = ?{clause}",
+            (project_id, *params),
+        ).fetchall()
+    return (
+        version[0] if version and version[0] else "",
+        [(row["id"], row["document_id"], _deserialize_json(row["embedding"])) for row in rows],
+    )
+
+
+def get_projected_vectors(
+    project_id: str,
+    embedding_model: str | None,
+    embedding_dim: int,
+    projection_version: str,
+) -> tuple[str, list[tuple[str, str, bytes | None, list[float] | None]]]:
+    clause, params = _embedding_filter(embedding_model, embedding_dim)
+    with db_transaction(project_id) as conn:
+        version = conn.execute("SELECT index_version FROM project_stats WHERE project_id = ?", (project_id,)).fetchone()
+        # the full vector is only decoded for rows written before the current fit
+        rows = conn.execute(
+            f"""SELECT id, document_id,
+                       CASE WHEN reduced_version = ? THEN reduced_embedding END AS reduced,
+                       CASE WHEN reduced_version IS NOT ? THEN embedding END AS embedding
+                FROM chunks WHERE project_id = ?{clause}""",
+            (projection_version, projection_version, project_id, *params),
+        ).fetchall()
+    return (
+        version[0] if version and version[0] else "",
+        [
+            (row["id"], row["document_id"], row["reduced"], _deserialize_json(row["embedding"]))
+            for row in rows
+        ],
+    )
+
+
+def get_vector_rows_since(
+    project_id: str,
+    embedding_model: str | None,
+    embedding_dim: int,
+    after_rowid: int,
+    projection_version: str | None = None,
+) -> tuple[str, int, int, list[tuple[int, str, str, bytes | None, list[float] | None]]]:
+    clause, params = _embedding_filter(embedding_model, embedding_dim)
+    with db_transaction(project_id) as conn:
+        # one read transaction, so the version, the live row totals and the
+        # new rows all describe the same moment
+        version = conn.execute("SELECT index_version FROM project_stats WHERE project_id = ?", (project_id,)).fetchone()
+        count, rowid_sum = conn.execute(
+            f"SELECT COUNT(*), COALESCE(SUM(rowid), 0) FROM chunks WHERE project_id = ?{clause}",
+            (project_id, *params),
+        ).fetchone()
+        if projection_version is None:
+            rows = conn.execute(
+                f"""SELECT rowid, id, document_id, NULL AS reduced, embedding FROM chunks
+                    WHERE project_id = ? AND rowid > ?{clause} ORDER BY rowid""",
+                (project_id, after_rowid, *params),
+            ).fetchall()
+        else:
+            rows = conn.execute(
+                f"""SELECT rowid, id, document_id,
+                           CASE WHEN reduced_version = ? THEN reduced_embedding END AS reduced,
+                           CASE WHEN reduced_version IS NOT ? THEN embedding END AS embedding
+                    FROM chunks WHERE project_id = ? AND rowid > ?{clause} ORDER BY rowid""",
+                (projection_version, projection_version, project_id, after_rowid, *params),
+            ).fetchall()
+    return (
+        version[0] if version and version[0] else "",
+        count,
+        rowid_sum,
+        [
+            (row["rowid"], row["id"], row["document_id"], row["reduced"], _deserialize_json(row["embedding"]))
+            for row in rows
+        ],
+    )
+
+
+def get_chunk_rowids(project_id: str, chunk_ids: list[str], document_id: str | None = None) -> list[int]:
+    rowids: list[int] = []
+    with db_transaction(project_id) as conn:
+        if chunk_ids:
+            rowids += [
+                row[0]
+                for row in conn.execute(
+                    f"SELECT rowid FROM chunks WHERE project_id = ? AND id IN ({', '.join('?' for _ in chunk_ids)})",
+                    (project_id, *chunk_ids),
+                )
+            ]
+        if document_id is not None:
+            rowids += [
+                row[0]
+                for row in conn.execute(
+                    "SELECT rowid FROM chunks WHERE project_id = ? AND document_id = ?", (project_id, document_id)
+                )
+            ]
+    return rowids
+
+
+def get_chunks_to_reproject(
+    project_id: str,
+    embedding_model: str | None,
+    embedding_dim: int,
+    projection_version: str,
+    after_id: str,
+    limit: int,
+) -> list[tuple[str, list[float]]]:
+    clause, params = _embedding_filter(embedding_model, embedding_dim)
+    with db_transaction(project_id) as conn:
+        rows = conn.execute(
+            f"""SELECT id, embedding FROM chunks
+                WHERE project_id = ? AND id > ? AND reduced_version IS NOT ?{clause}
+                ORDER BY id LIMIT ?""",
+            (project_id, after_id, projection_version, *params, limit),
+        ).fetchall()
+    return [(row["id"], _deserialize_json(row["embedding"])) for row in rows]
+
+
+def set_reduced_embeddings(project_id: str, projection_version: str, rows: list[tuple[str, bytes]]) -> None:
+    if not rows:
+        return
+    with db_transaction(project_id) as conn:
+        conn.executemany(
+            "UPDATE chunks SET reduced_embedding = ?, reduced_version = ? WHERE id = ?",
+            [(reduced, projection_version, chunk_id) for chunk_id, reduced in rows],
+        )
+
+
+def get_chunk_embeddings(project_id: str, chunk_ids: list[str]) -> dict[str, tuple[list[float], str | None]]:
+    if not chunk_ids:
+        return {}
+    with db_transaction(project_id) as conn:
+        rows = conn.execute(
+            f"SELECT id, embedding, embedding_model FROM chunks WHERE id IN ({', '.join('?' for _ in chunk_ids)})",
+            tuple(chunk_ids),
+        ).fetchall()
+    return {row["id"]: (_deserialize_json(row["embedding"]), row["embedding_model"]) for row in rows}
+
+
+def add_minhash_signatures(project_id: str, kind: str, items: list[tuple[str, bytes, list[tuple[int, int]]]]) -> None:
+    if not items:
+        return
+    with db_transaction(project_id, create=True) as conn:
+        conn.executemany(
+            "INSERT OR REPLACE INTO minhash_signatures (kind, item_id, project_id, signature) VALUES (?, ?, ?, ?)",
+            [(kind, item_id, project_id, signature) for item_id, signature, _ in items],
+        )
+        conn.executemany(
+            "INSERT OR IGNORE INTO minhash_buckets (project_id, kind, band, bucket, item_id) VALUES (?, ?, ?, ?, ?)",
+            [(project_id, kind, band, bucket, item_id) for item_id, _, bands in items for band, bucket in bands],
+        )
+
+
+def find_minhash_candidates(project_id: str, kind: str, bands: list[tuple[int, int]]) -> list[tuple[str, bytes]]:
+    if not bands:
+        return []
+    with db_transaction(project_id) as conn:
+        rows = conn.execute(
+            f"""
+            SELECT DISTINCT s.item_id, s.signature
+            FROM minhash_buckets AS b
+            JOIN minhash_signatures AS s ON s.kind = b.kind AND s.item_id = b.item_id
+            WHERE b.project_id = ? AND b.kind = ? AND (b.band, b.bucket) IN (VALUES {', '.join('(?, ?)' for _ in bands)})
             """,
-            (project_id, limit, offset),
+            (project_id, kind, *(value for band in bands for value in band)),
         ).fetchall()
-    return [DocumentRecord(**dict(row)) for row in rows]
+    return [(row["item_id"], row["signature"]) for row in rows]
+
+
+def _delete_minhash(conn: sqlite3.Connection, kind: str, item_ids: list[str]) -> None:
+    rows = [(kind, item_id) for item_id in item_ids]
+    conn.executemany("DELETE FROM minhash_buckets WHERE kind = ? AND item_id = ?", rows)
+    conn.executemany("DELETE FROM minhash_signatures WHERE kind = ? AND item_id = ?", rows)
+
+
+def get_chunks_by_ids(project_id: str, chunk_ids: list[str]) -> list[dict[str, Any]]:
+    if not chunk_ids:
+        return []
+    fields = [field for field in CHUNK_FIELDS if field != "embedding"]
+    with db_transaction(project_id) as conn:
+        rows = conn.execute(
+            f"SELECT project_id, {', '.join(fields)} FROM chunks WHERE id IN ({', '.join('?' for _ in chunk_ids)})",
+            tuple(chunk_ids),
+        ).fetchall()
+        chunks = {}
+        for row in rows:
+            payload = dict(row)
+            payload["metadata"] = _deserialize_json(payload["metadata"])
+            chunks[payload["id"]] = payload
+        _materialize_chunk_text(conn, list(chunks.values()))
+    return [chunks[chunk_id] for chunk_id in chunk_ids if chunk_id in chunks]
+
+
+def dominant_embedding_dim(project_id: str, embedding_model: str | None) -> int | None:
+    query = "SELECT embedding_dim FROM chunks WHERE project_id = ? AND embedding_dim IS NOT NULL"
+    params: tuple[Any, ...] = (project_id,)
+    if embedding_model is not None:
+        query += " AND (embedding_model = ? OR embedding_model IS NULL)"
+        params += (embedding_model,)
+    with db_transaction(project_id) as conn:
+        row = conn.execute(
+            f"{query} GROUP BY embedding_dim ORDER BY COUNT(*) DESC LIMIT 1",
+            params,
+        ).fetchone()
+    return row[0] if row else None
+
+
+@dataclass
+class ProjectionRecord:
+    project_id: str
+    embedding_model: str | None
+    method: str
+    source_dim: int
+    target_dim: int
+    components: bytes
+    version: str
+    sample_size: int
+    explained_variance: float | None
+    fitted_at: str
+
+
+def save_projection(record: ProjectionRecord) -> None:
+    with db_transaction(record.project_id, create=True) as conn:
+        conn.execute(
+            """INSERT OR REPLACE INTO projections
+               (project_id, embedding_model, method, source_dim, target_dim, components, version,
+                sample_size, explained_variance, fitted_at)
+               VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+            tuple(asdict(record).values()),
+        )
+        _bump_index_version(conn, record.project_id)
+
+
+def get_projection(project_id: str) -> ProjectionRecord | None:
+    with db_transaction(project_id) as conn:
+        row = conn.execute("SELECT * FROM projections WHERE project_id = ?", (project_id,)).fetchone()
+    return None if row is None else ProjectionRecord(**dict(row))
+
+
+def get_projection_version(project_id: str) -> str | None:
+    with db_transaction(project_id) as conn:
+        row = conn.execute("SELECT version FROM projections WHERE project_id = ?", (project_id,)).fetchone()
+    return row[0] if row else None
+
+
+def delete_projection(project_id: str) -> bool:
+    with db_transaction(project_id) as conn:
+        deleted = conn.execute("DELETE FROM projections WHERE project_id = ?", (project_id,)).rowcount
+        if deleted:
+            conn.execute(
+                "UPDATE chunks SET reduced_embedding = NULL, reduced_version = NULL WHERE project_id = ?",
+                (project_id,),
+            )
+            _bump_index_version(conn, project_id)
+    return bool(deleted)
+
+
+def get_busiest_projects(limit: int) -> list[str]:
+    totals: dict[str, int] = {}
+    for shard in partitions():
+        with db_transaction(shard) as conn:
+            rows = conn.execute(
+                """SELECT project_id, SUM(n) AS total FROM (
+                       SELECT project_id, COUNT(*) AS n FROM queries GROUP BY project_id
+                       UNION ALL
+                       SELECT project_id, SUM(query_count) FROM query_rollups WHERE granularity = 'day' GROUP BY project_id
+                   )
+                   WHERE project_id IN (SELECT DISTINCT project_id FROM chunks)
+                   GROUP BY project_id ORDER BY total DESC LIMIT ?""",
+                (limit,),
+            ).fetchall()
+        for row in rows:
+            totals[row["project_id"]] = totals.get(row["project_id"], 0) + int(row["total"])
+    return sorted(totals, key=lambda project_id: totals[project_id], reverse=True)[:limit]
+
+
+def get_embedding_models(project_id: str) -> dict[str | None, int]:
+    with db_transaction(project_id) as conn:
+        rows = conn.execute(
+            "SELECT embedding_model, COUNT(*) AS count FROM chunks WHERE project_id = ? GROUP BY embedding_model",
+            (project_id,),
+        ).fetchall()
+    return {row["embedding_model"]: int(row["count"]) for row in rows}
+
+
+@dataclass
+class ReembedJob:
+    project_id: str
+    target_model: str
+    status: str
+    total: int
+    processed: int
+    last_chunk_id: str
+    error: str | None
+    started_at: str
+    updated_at: str
 
 
-def create_chunk(document_id: str, project_id: str, chunk_index: int, text: str, embedding: list[float], metadata: dict[str, Any]) -> None:
-    chunk_id = str(uuid.uuid4())
+def count_chunks_to_reembed(project_id: str, target_model: str) -> int:
+    with db_transaction(project_id) as conn:
+        row = conn.execute(
+            """
+            SELECT COUNT(*) FROM chunks
+            WHERE project_id = ? AND embedding_model IS NOT ?
+              AND shadow_embedding_model IS NOT ?
+            """,
+            (project_id, target_model, target_model),
+        ).fetchone()
+    return int(row[0])
+
+
+def start_reembed_job(project_id: str, target_model: str) -> ReembedJob:
     now = _current_timestamp()
+    total = count_chunks_to_reembed(project_id, target_model)
     with db_transaction() as conn:
         conn.execute(
-            """INSERT INTO chunks (id, project_id, document_id, chunk_index, text, embedding, metadata, created_at)
-               VALUES (?, ?, ?, ?, ?, ?, ?, ?)""",
-            (
-                chunk_id,
-                project_id,
-                document_id,
-                chunk_index,
-                text,
-                _serialize_json(embedding),
-                _serialize_json(metadata),
-                now,
-            ),
+            """INSERT OR REPLACE INTO reembed_jobs
+               (project_id, target_model, status, total, processed, last_chunk_id, error, started_at, updated_at)
+               VALUES (?, ?, 'running', ?, 0, '', NULL, ?, ?)""",
+            (project_id, target_model, total, now, now),
         )
+    return get_reembed_job(project_id)
+
+
+def get_reembed_job(project_id: str) -> ReembedJob | None:
+    with db_transaction() as conn:
+        row = conn.execute("SELECT * FROM reembed_jobs WHERE project_id = ?", (project_id,)).fetchone()
+    return None if row is None else ReembedJob(**dict(row))
+
+
+def list_reembed_jobs(status: str) -> list[ReembedJob]:
+    with db_transaction() as conn:
+        rows = conn.execute("SELECT * FROM reembed_jobs WHERE status = ?", (status,)).fetchall()
+    return [ReembedJob(**dict(row)) for row in rows]
 
 
-def get_chunks_by_project(project_id: str) -> list[dict[str, Any]]:
+def update_reembed_job(project_id: str, **fields: Any) -> None:
+    fields["updated_at"] = _current_timestamp()
+    assignments = ", ".join(f"{name} = ?" for name in fields)
     with db_transaction() as conn:
+        conn.execute(
+            f"UPDATE reembed_jobs SET {assignments} WHERE project_id = ?",
+            (*fields.values(), project_id),
+        )
+
+
+def get_chunks_to_reembed(project_id: str, target_model: str, after_id: str, limit: int) -> list[dict[str, Any]]:
+    with db_transaction(project_id) as conn:
         rows = conn.execute(
-            "SELECT * FROM chunks WHERE project_id = ?",
-            (project_id,),
+            """
+            SELECT id, document_id, text, start_offset, end_offset FROM chunks
+            WHERE project_id = ? AND id > ? AND embedding_model IS NOT ?
+              AND shadow_embedding_model IS NOT ?
+            ORDER BY id
+            LIMIT ?
+            """,
+            (project_id, after_id, target_model, target_model, limit),
         ).fetchall()
+        chunks = [dict(row) for row in rows]
+        _materialize_chunk_text(conn, chunks)
+    return chunks
+
+
+def write_shadow_embeddings(project_id: str, rows: list[tuple[str, list[float], str]]) -> None:
+    with db_transaction(project_id) as conn:
+        conn.executemany(
+            "UPDATE chunks SET shadow_embedding = ?, shadow_embedding_model = ? WHERE id = ?",
+            [(_serialize_json(vector), model, chunk_id) for chunk_id, vector, model in rows],
+        )
+
+
+def promote_shadow_embeddings(project_id: str, target_model: str) -> int:
+    # one transaction, so readers see either the old or the new model for
+    # the whole project, never a mix
+    with db_transaction(project_id) as conn:
+        cursor = conn.execute(
+            """
+            UPDATE chunks
+            SET embedding = shadow_embedding,
+                embedding_model = shadow_embedding_model,
+                embedding_dim = json_array_length(shadow_embedding),
+                shadow_embedding = NULL,
+                shadow_embedding_model = NULL
+            WHERE project_id = ? AND shadow_embedding_model = ?
+            """,
+            (project_id, target_model),
+        )
+        if cursor.rowcount:
+            _bump_index_version(conn, project_id)
+        return cursor.rowcount
+
+
+def get_chunks_for_document(
+    document_id: str,
+    fields: Iterable[str] | None = None,
+    after_index: int | None = None,
+    limit: int | None = None,
+    content: str | None = None,
+) -> list[dict[str, Any]]:
+    requested = list(CHUNK_FIELDS if fields is None else dict.fromkeys(fields))
+    unknown = [field for field in requested if field not in CHUNK_FIELDS]
+    if unknown:
+        raise ValueError(f"unknown chunk fields: {', '.join(unknown)}")
+    columns = list(requested)
+    if "text" in requested:
+        columns.extend(field for field in _TEXT_SOURCE_FIELDS if field not in columns)
+
+    query = f"SELECT {', '.join(columns)} FROM chunks WHERE document_id = ?"
+    params: tuple[Any, ...] = (document_id,)
+    if after_index is not None:
+        query += " AND chunk_index > ?"
+        params += (after_index,)
+    query += " ORDER BY chunk_index ASC"
+    if limit is not None:
+        query += " LIMIT ?"
+        params += (limit,)
+
+    with db_transaction(_document_shard(document_id)) as conn:
+        rows = conn.execute(query, params).fetchall()
+        chunks = []
+        for row in rows:
+            payload = dict(row)
+            for field in ("embedding", "metadata"):
+                if field in payload:
+                    payload[field] = _deserialize_json(payload[field])
+            chunks.append(payload)
+        if "text" in requested:
+            _materialize_chunk_text(conn, chunks, {document_id: content} if content is not None else None)
+    extra = [column for column in columns if column not in requested]
+    for chunk in chunks:
+        for column in extra:
+            del chunk[column]
+    return chunks
+
+
+def get_chunk_texts_for_documents(document_ids: list[str]) -> list[dict[str, Any]]:
     chunks: list[dict[str, Any]] = []
-    for row in rows:
-        payload = dict(row)
-        payload["embedding"] = _deserialize_json(payload["embedding"])
-        payload["metadata"] = _deserialize_json(payload["metadata"])
-        chunks.append(payload)
+    for shard, ids in _group_documents(document_ids).items():
+        if not ids:
+            continue
+        placeholders = ", ".join("?" for _ in ids)
+        with db_transaction(shard) as conn:
+            rows = conn.execute(
+                f"""
+                SELECT id, document_id, chunk_index, text, start_offset, end_offset FROM chunks
+                WHERE document_id IN ({placeholders})
+                ORDER BY document_id, chunk_index ASC
+                """,
+                tuple(ids),
+            ).fetchall()
+            shard_chunks = [dict(row) for row in rows]
+            _materialize_chunk_text(conn, shard_chunks)
+        chunks.extend(shard_chunks)
+    chunks.sort(key=lambda chunk: (chunk["document_id"], chunk["chunk_index"]))
     return chunks
 
 
-def get_chunks_for_document(document_id: str) -> list[dict[str, Any]]:
+def get_cached_summary(content_hash: str) -> str | None:
     with db_transaction() as conn:
-        rows = conn.execute(
-            "SELECT id, chunk_index, text, embedding, metadata FROM chunks WHERE document_id = ? ORDER BY chunk_index ASC",
-            (document_id,),
-        ).fetchall()
-    chunks = []
-    for row in rows:
-        payload = dict(row)
-        payload["embedding"] = _deserialize_json(payload["embedding"])
-        payload["metadata"] = _deserialize_json(payload["metadata"])
-        chunks.append(payload)
-    return chunks
+        row = conn.execute(
+            "SELECT summary FROM summary_cache WHERE content_hash = ?",
+            (content_hash,),
+        ).fetchone()
+    return None if row is None else row["summary"]
 
 
-def create_query(record: QueryRecord) -> None:
+def put_cached_summary(content_hash: str, summary: str, model: str) -> None:
+    now = _current_timestamp()
     with db_transaction() as conn:
         conn.execute(
-            """INSERT INTO queries (id, project_id, question, answer, citations, latency_ms, tokens_used, model, related_documents, created_at)
-               VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
-            (
-                record.id,
-                record.project_id,
-                record.question,
-                record.answer,
-                _serialize_json(record.citations),
-                record.latency_ms,
-                record.tokens_used,
-                record.model,
-                _serialize_json(record.related_documents),
-                record.created_at,
-            ),
+            "INSERT OR REPLACE INTO summary_cache (content_hash, summary, model, created_at) VALUES (?, ?, ?, ?)",
+            (content_hash, summary, model, now),
         )
 
 
-def get_query(query_id: str) -> QueryRecord | None:
+def prune_summary_cache(cutoff: str, batch_size: int = 5000) -> int:
     with db_transaction() as conn:
+        return conn.execute(
+            """DELETE FROM summary_cache WHERE content_hash IN
+               (SELECT content_hash FROM summary_cache WHERE created_at < ? LIMIT ?)""",
+            (cutoff, max(1, batch_size)),
+        ).rowcount
+
+
+def _query_row(record: QueryRecord) -> tuple[Any, ...]:
+    return (
+        record.id,
+        record.project_id,
+        record.question,
+        record.answer,
+        _serialize_json(record.citations),
+        record.latency_ms,
+        record.tokens_used,
+        record.model,
+        _serialize_json(record.related_documents),
+        record.created_at,
+        record.context_tokens_saved,
+        _serialize_json(record.profile) if record.profile is not None else None,
+    )
+
+
+_INSERT_QUERY = """INSERT INTO queries (id, project_id, question, answer, citations, latency_ms, tokens_used, model, related_documents, created_at, context_tokens_saved, profile)
+               VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"""
+
+
+def create_query(record: QueryRecord) -> None:
+    write_log_batch([record], [])
+
+
+def new_feedback_record(query_id: str, rating: int | None, note: str | None) -> FeedbackRecord:
+    return FeedbackRecord(
+        id=str(uuid.uuid4()),
+        query_id=query_id,
+        rating=rating,
+        note=note,
+        created_at=_current_timestamp(),
+    )
+
+
+def _write_log_rows(conn: sqlite3.Connection, queries: list[QueryRecord], feedback: list[FeedbackRecord]) -> None:
+    # queries go first so feedback rows can reference them
+    if queries:
+        conn.executemany(_INSERT_QUERY, [_query_row(record) for record in queries])
+    if feedback:
+        # the query may have been rolled up and pruned while the feedback was buffered
+        conn.executemany(
+            """INSERT INTO feedback (id, query_id, rating, note, created_at)
+               SELECT ?, ?, ?, ?, ? WHERE EXISTS (SELECT 1 FROM queries WHERE id = ?)""",
+            [(item.id, item.query_id, item.rating, item.note, item.created_at, item.query_id) for item in feedback],
+        )
+
+
+def write_log_batch(queries: list[QueryRecord], feedback: list[FeedbackRecord]) -> None:
+    if shard_router() is None:
+        with db_transaction() as conn:
+            _write_log_rows(conn, queries, feedback)
+        return
+    # one group commit per shard, so a busy tenant never holds another's lock
+    batch_projects = {record.id: record.project_id for record in queries}
+    groups: dict[str | None, tuple[list[QueryRecord], list[FeedbackRecord]]] = {}
+    for record in queries:
+        groups.setdefault(record.project_id, ([], []))[0].append(record)
+    for item in feedback:
+        project_id = batch_projects.get(item.query_id) or _query_shard(item.query_id)
+        groups.setdefault(project_id, ([], []))[1].append(item)
+    routes = [(query_id, project_id) for query_id, project_id in batch_projects.items() if not _is_tagged(query_id, project_id)]
+    if routes:
+        with db_transaction() as conn:
+            conn.executemany("INSERT OR IGNORE INTO query_routes (query_id, project_id) VALUES (?, ?)", routes)
+    for project_id, (shard_queries, shard_feedback) in groups.items():
+        with db_transaction(project_id, create=bool(shard_queries)) as conn:
+            _write_log_rows(conn, shard_queries, shard_feedback)
+
+
+def query_exists(query_id: str) -> bool:
+    with db_transaction(_query_shard(query_id)) as conn:
+        row = conn.execute("SELECT 1 FROM queries WHERE id = ?", (query_id,)).fetchone()
+    return row is not None
+
+
+def get_query(query_id: str) -> QueryRecord | None:
+    with db_transaction(_query_shard(query_id)) as conn:
         row = conn.execute("SELECT * FROM queries WHERE id = ?", (query_id,)).fetchone()
     if row is None:
         return None
@@ -308,13 +1665,15 @@ def get_query(query_id: str) -> QueryRecord | None:
         model=payload["model"],
         related_documents=_deserialize_json(payload["related_documents"]),
         created_at=payload["created_at"],
+        context_tokens_saved=payload["context_tokens_saved"],
+        profile=_deserialize_json(payload["profile"]),
     )
 
 
 def add_feedback(query_id: str, rating: int | None, note: str | None) -> None:
     feedback_id = str(uuid.uuid4())
     now = _current_timestamp()
-    with db_transaction() as conn:
+    with db_transaction(_query_shard(query_id)) as conn:
         exists = conn.execute("SELECT id FROM queries WHERE id = ?", (query_id,)).fetchone()
         if not exists:
             raise KeyError("query_id does not exist")
@@ -344,39 +1703,258 @@ def complete_action(action_id: str, result: str, status: str = "completed") -> N
         )
 
 
-def metric_snapshot(project_id: str | None = None) -> dict[str, Any]:
+LATENCY_BUCKETS_MS = (100, 250, 500, 1000, 2500, 5000, 10000)
+ROLLUP_GRANULARITIES = ("hour", "day")
+_BUCKET_EXPRESSIONS = {
+    "hour": "substr(q.created_at, 1, 13) || ':00:00+00:00'",
+    "day": "substr(q.created_at, 1, 10) || 'T00:00:00+00:00'",
+}
+_ROLLUP_COUNTERS = (
+    "query_count",
+    "latency_total",
+    "tokens_used",
+    "context_tokens_saved",
+    "feedback_count",
+    "rating_count",
+    "rating_total",
+)
+
+
+def latency_bucket_labels() -> list[str]:
+    return [str(bound) for bound in LATENCY_BUCKETS_MS] + ["inf"]
+
+
+def bucket_start(timestamp: datetime, granularity: str) -> str:
+    value = timestamp.astimezone(timezone.utc).replace(minute=0, second=0, microsecond=0)
+    if granularity == "day":
+        value = value.replace(hour=0)
+    return value.isoformat()
+
+
+def _histogram_sql() -> str:
+    lower = 0
+    parts = []
+    for bound in LATENCY_BUCKETS_MS:
+        parts.append(f"SUM(CASE WHEN q.latency_ms >= {lower} AND q.latency_ms < {bound} THEN 1 ELSE 0 END)")
+        lower = bound
+    parts.append(f"SUM(CASE WHEN q.latency_ms >= {lower} THEN 1 ELSE 0 END)")
+    return ", ".join(parts)
+
+
+def _empty_rollup() -> dict[str, Any]:
+    return {**{name: 0 for name in _ROLLUP_COUNTERS}, "latency_histogram": [0] * (len(LATENCY_BUCKETS_MS) + 1)}
+
+
+def _merge_rollup(target: dict[str, Any], source: dict[str, Any]) -> None:
+    for name in _ROLLUP_COUNTERS:
+        target[name] += source[name] or 0
+    target["latency_histogram"] = [a + b for a, b in zip(target["latency_histogram"], source["latency_histogram"])]
+
+
+def _aggregate_queries(
+    conn: sqlite3.Connection,
+    granularity: str,
+    where: str,
+    params: tuple[Any, ...],
+) -> dict[tuple[str, str, str], dict[str, Any]]:
+    bucket = _BUCKET_EXPRESSIONS[granularity]
+    rows = conn.execute(
+        f"""SELECT {bucket} AS bucket_start, q.project_id, q.model, COUNT(*), SUM(q.latency_ms),
+                   SUM(q.tokens_used), SUM(q.context_tokens_saved), {_histogram_sql()}
+            FROM queries q WHERE {where}
+            GROUP BY 1, 2, 3""",
+        params,
+    ).fetchall()
+    result: dict[tuple[str, str, str], dict[str, Any]] = {}
+    for row in rows:
+        values = tuple(row)
+        stats = _empty_rollup()
+        stats.update(
+            query_count=values[3],
+            latency_total=values[4] or 0,
+            tokens_used=values[5] or 0,
+            context_tokens_saved=values[6] or 0,
+            latency_histogram=list(values[7:]),
+        )
+        result[(values[1], values[0], values[2])] = stats
+    feedback_rows = conn.execute(
+        f"""SELECT {bucket} AS bucket_start, q.project_id, q.model, COUNT(f.id), COUNT(f.rating), SUM(f.rating)
+            FROM feedback f JOIN queries q ON q.id = f.query_id WHERE {where}
+            GROUP BY 1, 2, 3""",
+        params,
+    ).fetchall()
+    for row in feedback_rows:
+        stats = result.setdefault((row[1], row[0], row[2]), _empty_rollup())
+        stats.update(feedback_count=row[3], rating_count=row[4], rating_total=row[5] or 0)
+    return result
+
+
+def _rollup_from_row(row: sqlite3.Row) -> dict[str, Any]:
+    return {
+        **{name: row[name] for name in _ROLLUP_COUNTERS},
+        "latency_histogram": _deserialize_json(row["latency_histogram"]),
+    }
+
+
+def roll_up_queries(cutoff: str, batch_size: int = 5000, partition: str | None = None) -> int:
+    # one transaction per batch: rows are counted into the rollups and deleted
+    # together, so a crash can neither drop nor double count them
+    pruned_ids: list[str] = []
+    with db_transaction(partition) as conn:
+        boundary_row = conn.execute(
+            "SELECT created_at FROM queries WHERE created_at < ? ORDER BY created_at LIMIT 1 OFFSET ?",
+            (cutoff, max(1, batch_size) - 1),
+        ).fetchone()
+        where, params = ("q.created_at <= ?", (boundary_row[0],)) if boundary_row else ("q.created_at < ?", (cutoff,))
+        for granularity in ROLLUP_GRANULARITIES:
+            aggregated = _aggregate_queries(conn, granularity, where, params)
+            for (project_id, start, model), stats in aggregated.items():
+                existing = conn.execute(
+                    """SELECT * FROM query_rollups
+                       WHERE granularity = ? AND project_id = ? AND bucket_start = ? AND model = ?""",
+                    (granularity, project_id, start, model),
+                ).fetchone()
+                if existing is not None:
+                    _merge_rollup(stats, _rollup_from_row(existing))
+                conn.execute(
+                    f"""INSERT OR REPLACE INTO query_rollups
+                        (granularity, project_id, bucket_start, model, latency_histogram, {", ".join(_ROLLUP_COUNTERS)})
+                        VALUES (?, ?, ?, ?, ?, {", ".join("?" for _ in _ROLLUP_COUNTERS)})""",
+                    (
+                        granularity,
+                        project_id,
+                        start,
+                        model,
+                        _serialize_json(stats["latency_histogram"]),
+                        *(stats[name] for name in _ROLLUP_COUNTERS),
+                    ),
+                )
+        if shard_router() is not None:
+            pruned_ids = [
+                row[0]
+                for row in conn.execute(f"SELECT q.id, q.project_id FROM queries AS q WHERE {where}", params)
+                if not _is_tagged(row[0], row[1])
+            ]
+        deleted = conn.execute(f"DELETE FROM queries AS q WHERE {where}", params).rowcount
+    if pruned_ids:
+        with db_transaction() as conn:
+            conn.executemany("DELETE FROM query_routes WHERE query_id = ?", [(query_id,) for query_id in pruned_ids])
+    return deleted
+
+
+def query_timeseries(
+    granularity: str,
+    since: datetime,
+    until: datetime,
+    project_id: str | None = None,
+) -> list[dict[str, Any]]:
+    start, end = bucket_start(since, granularity), until.astimezone(timezone.utc).isoformat()
+    project_filter = " AND project_id = ?" if project_id else ""
+    project_params = (project_id,) if project_id else ()
+    buckets: dict[str, dict[str, Any]] = {}
+
+    def _add(bucket: str, model: str, stats: dict[str, Any]) -> None:
+        entry = buckets.setdefault(bucket, {**_empty_rollup(), "models": {}})
+        _merge_rollup(entry, stats)
+        entry["models"][model] = entry["models"].get(model, 0) + stats["query_count"]
+
+    for partition in [project_id] if project_id else partitions():
+        with db_transaction(partition) as conn:
+            rows = conn.execute(
+                f"""SELECT * FROM query_rollups
+                    WHERE granularity = ? AND bucket_start >= ? AND bucket_start < ?{project_filter}""",
+                (granularity, start, end, *project_params),
+            ).fetchall()
+            for row in rows:
+                _add(row["bucket_start"], row["model"], _rollup_from_row(row))
+            # raw rows that are still inside the retention window
+            live = _aggregate_queries(
+                conn,
+                granularity,
+                f"q.created_at >= ? AND q.created_at < ?{' AND q.project_id = ?' if project_id else ''}",
+                (start, end, *project_params),
+            )
+        for (_, bucket, model), stats in live.items():
+            _add(bucket, model, stats)
+
+    labels = latency_bucket_labels()
+    series = []
+    for bucket in sorted(buckets):
+        entry = buckets[bucket]
+        count = entry["query_count"]
+        series.append(
+            {
+                "bucket_start": bucket,
+                "queries": count,
+                "avg_query_latency_ms": round(entry["latency_total"] / count, 2) if count else 0.0,
+                "latency_histogram": dict(zip(labels, entry["latency_histogram"])),
+                "tokens_used": entry["tokens_used"],
+                "context_tokens_saved": entry["context_tokens_saved"],
+                "feedback_count": entry["rating_count"],
+                "avg_feedback_rating": round(entry["rating_total"] / entry["rating_count"], 2)
+                if entry["rating_count"]
+                else None,
+                "models": {model: n for model, n in entry["models"].items() if n},
+            }
+        )
+    return series
+
+
+def _metric_totals(conn: sqlite3.Connection, project_id: str | None) -> list[int]:
     project_filter = "WHERE project_id = ?" if project_id else ""
     params = (project_id,) if project_id else ()
-    with db_transaction() as conn:
-        doc_count = conn.execute(
-            f"SELECT COUNT(*) FROM documents {project_filter}",
-            params,
-        ).fetchone()[0]
-        chunk_count = conn.execute(
-            f"SELECT COUNT(*) FROM chunks {project_filter}",
-            params,
-        ).fetchone()[0]
-        query_rows = conn.execute(
-            f"SELECT id, latency_ms FROM queries {project_filter}",
-            params,
-        ).fetchall()
-        query_count = len(query_rows)
-        total_latency = sum(row["latency_ms"] for row in query_rows if row["latency_ms"] is not None)
-        if project_id:
-            feedback_rows = conn.execute(
-                "SELECT rating FROM feedback f JOIN queries q ON f.query_id = q.id WHERE q.project_id = ?",
-                (project_id,),
-            ).fetchall()
-        else:
-            feedback_rows = conn.execute("SELECT rating FROM feedback").fetchall()
+    doc_count = conn.execute(
+        f"SELECT COUNT(*) FROM documents {project_filter}",
+        params,
+    ).fetchone()[0]
+    chunk_count = conn.execute(
+        f"SELECT COUNT(*) FROM chunks {project_filter}",
+        params,
+    ).fetchone()[0]
+    query_count, total_latency = conn.execute(
+        f"SELECT COUNT(*), COALESCE(SUM(latency_ms), 0) FROM queries {project_filter}",
+        params,
+    ).fetchone()
+    if project_id:
+        rating_count, rating_total = conn.execute(
+            """SELECT COUNT(f.rating), COALESCE(SUM(f.rating), 0)
+               FROM feedback f JOIN queries q ON f.query_id = q.id WHERE q.project_id = ?""",
+            (project_id,),
+        ).fetchone()
+    else:
+        rating_count, rating_total = conn.execute(
+            "SELECT COUNT(rating), COALESCE(SUM(rating), 0) FROM feedback"
+        ).fetchone()
+    rolled = conn.execute(
+        f"""SELECT COALESCE(SUM(query_count), 0), COALESCE(SUM(latency_total), 0),
+                   COALESCE(SUM(rating_count), 0), COALESCE(SUM(rating_total), 0)
+            FROM query_rollups WHERE granularity = 'day' {project_filter.replace("WHERE", "AND")}""",
+        params,
+    ).fetchone()
+    return [
+        doc_count,
+        chunk_count,
+        query_count + rolled[0],
+        total_latency + rolled[1],
+        rating_count + rolled[2],
+        rating_total + rolled[3],
+    ]
+
+
+def metric_snapshot(project_id: str | None = None) -> dict[str, Any]:
+    totals = [0] * 6
+    # without a project every shard is summed; the main file holds pre-sharding rows
+    for partition in [project_id] if project_id else partitions():
+        with db_transaction(partition) as conn:
+            totals = [a + b for a, b in zip(totals, _metric_totals(conn, project_id))]
+    doc_count, chunk_count, query_count, total_latency, rating_count, rating_total = totals
     avg_latency = total_latency / query_count if query_count else 0
-    ratings = [row[0] for row in feedback_rows if row[0] is not None]
-    avg_rating = sum(ratings) / len(ratings) if ratings else None
+    avg_rating = rating_total / rating_count if rating_count else None
     return {
         "documents": int(doc_count),
         "chunks": int(chunk_count),
         "queries": int(query_count),
         "avg_query_latency_ms": round(avg_latency, 2),
-        "feedback_count": len(ratings),
+        "feedback_count": int(rating_count),
         "avg_feedback_rating": None if avg_rating is None else round(avg_rating, 2),
     }
@@ -1,41 +1,73 @@
 from __future__ import annotations
 
+import asyncio
+import secrets
 import traceback
-import uuid
 from contextlib import asynccontextmanager
 from datetime import datetime, timezone
 
-from fastapi import FastAPI, File, Form, HTTPException, Request, UploadFile
+import orjson
+from fastapi import Depends, FastAPI, File, Form, Header, HTTPException, Query, Request, UploadFile
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, ORJSONResponse, PlainTextResponse, StreamingResponse
 
 from . import db
 from .config import load_settings
 from .schemas import (
     ActionRequest,
     ActionResponse,
-    Citation,
+    BulkIngestResponse,
     DocumentCreateResponse,
     DocumentItem,
     EvalRequest,
     EvalResponse,
+    MemoryProfileResponse,
     MetricResponse,
+    MetricSeriesResponse,
+    ProjectionRequest,
+    ProjectionResponse,
     QueryDetail,
     QueryRequest,
     QueryResponse,
+    ReadinessResponse,
+    RechunkRequest,
+    ReembedJobResponse,
+    SlowRequest,
 )
 from .services.actions import execute_action
-from .services.ingest import process_document
+from .services.bulk import ingest_files, shutdown_bulk_pool, unpack_upload
+from .services.ingest import process_document, rechunk_document, resume_document_summaries, source_type_for
 from .services.metrics import get_metrics
-from .services.query import answer_query
+from .services.limits import OverloadedError
+from .services import profiling, projection, querylog
+from .services.query import active_embedding_model, answer_query_shared
+from .services.reembed import resume_reembed_jobs, start_reembed
+from .services.retention import start_retention, stop_retention
+from .services.warmup import readiness, start_warmup, stop_warmup
 
 @asynccontextmanager
 async def lifespan(_app: FastAPI):
     db.init_db()
+    resume_reembed_jobs()
+    resume_document_summaries()
+    await querylog.start_query_log()
+    start_retention()
+    start_warmup()
+    profiling.start_request_profiler()
     yield
-
-
-app = FastAPI(title="Knowledge Copilot API", version="0.1.0", lifespan=lifespan)
+    profiling.stop_request_profiler()
+    await stop_warmup()
+    await stop_retention()
+    await querylog.stop_query_log()
+    shutdown_bulk_pool()
+
+
+app = FastAPI(
+    title="Knowledge Copilot API",
+    version="0.1.0",
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse,
+)
 
 
 settings = load_settings()
@@ -45,18 +77,76 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "X-Total-Count"],
 )
+if settings.profile_slow_requests:
+    app.add_middleware(profiling.SlowRequestMiddleware, threshold_ms=settings.profile_slow_ms)
+
+
+_DEFAULT_CHUNK_FIELDS = ("id", "chunk_index", "text", "metadata", "start_offset", "end_offset")
+_EXPORT_PAGE_SIZE = 200
 
 
 def _to_list_response(item: db.DocumentRecord) -> DocumentItem:
     return DocumentItem(**item.__dict__)
 
 
+def _trusted(content, headers: dict[str, str] | None = None) -> ORJSONResponse:
+    # rows we wrote ourselves already match the response model; returning a
+    # Response skips FastAPI's validate-then-reserialize pass
+    return ORJSONResponse(content, headers=headers)
+
+
+def _require_admin(x_admin_token: str | None = Header(default=None)) -> None:
+    token = load_settings().admin_token
+    if not token:
+        raise HTTPException(status_code=404, detail="admin endpoints are disabled")
+    if x_admin_token is None or not secrets.compare_digest(x_admin_token, token):
+        raise HTTPException(status_code=403, detail="admin token required")
+
+
+def _to_reembed_response(job: db.ReembedJob) -> ReembedJobResponse:
+    progress = 1.0 if job.status == "completed" else min(1.0, job.processed / job.total) if job.total else 0.0
+    return ReembedJobResponse(**job.__dict__, progress=round(progress, 4))
+
+
+def _to_projection_response(item: projection.Projection, evaluation: dict | None = None) -> ProjectionResponse:
+    return ProjectionResponse(
+        project_id=item.project_id,
+        embedding_model=item.embedding_model,
+        method=item.method,
+        source_dim=item.source_dim,
+        target_dim=item.target_dim,
+        version=item.version,
+        sample_size=item.sample_size,
+        explained_variance=item.explained_variance,
+        fitted_at=item.fitted_at,
+        evaluation=evaluation,
+    )
+
+
+def _parse_chunk_fields(fields: str | None, default: tuple[str, ...]) -> list[str]:
+    requested = default if not fields else tuple(field.strip() for field in fields.split(",") if field.strip())
+    unknown = [field for field in requested if field not in db.CHUNK_FIELDS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"unknown chunk fields: {', '.join(unknown)}")
+    # chunk_index is always returned because it doubles as the pagination cursor
+    return list(dict.fromkeys(("chunk_index", *requested)))
+
+
 @app.get("/api/v1/health")
 def health() -> dict[str, str]:
     return {"status": "ok"}
 
 
+@app.get("/api/v1/ready", response_model=ReadinessResponse)
+def ready():
+    state = ReadinessResponse(**readiness())
+    if not state.ready:
+        return JSONResponse(status_code=503, content=state.model_dump())
+    return state
+
+
 @app.post("/api/v1/documents", response_model=DocumentCreateResponse)
 async def upload_document(
     project_id: str = Form("default"),
@@ -78,13 +168,7 @@ async def upload_document(
         except UnicodeDecodeError:
             raise HTTPException(status_code=400, detail="Only UTF-8 text files are supported in this build")
         filename = file.filename
-        source_type = "file"
-        if filename.lower().endswith(".md"):
-            source_type = "markdown"
-        elif filename.lower().endswith(".txt"):
-            source_type = "text"
-        else:
-            source_type = "unknown"
+        source_type = source_type_for(filename)
     else:
         text = source_text.strip()
         filename = "source_text.txt"
@@ -92,10 +176,10 @@ async def upload_document(
 
     document = db.create_document(project_id=project_id, filename=filename, source_type=source_type)
     try:
-        chunk_count = await process_document(document.id, project_id, text)
+        chunk_count = await process_document(document.id, project_id, text, source_type=source_type)
         return DocumentCreateResponse(
             id=document.id,
-            status="ready" if chunk_count > 0 else "empty",
+            status=db.get_document(document.id).status,
             project_id=project_id,
             chunk_count=chunk_count,
         )
@@ -104,21 +188,158 @@ async def upload_document(
         raise HTTPException(status_code=500, detail=f"Failed to process document: {err}") from err
 
 
+@app.post("/api/v1/documents/bulk", response_model=BulkIngestResponse)
+async def bulk_upload_documents(
+    project_id: str = Form("default"),
+    files: list[UploadFile] = File(...),
+):
+    if not project_id:
+        raise HTTPException(status_code=400, detail="project_id is required")
+
+    settings = load_settings()
+    entries: list[tuple[str, bytes]] = []
+    for upload in files:
+        if not upload.filename:
+            raise HTTPException(status_code=400, detail="file name is missing")
+        try:
+            entries.extend(unpack_upload(upload.filename, await upload.read(), settings.bulk_max_archive_bytes))
+        except ValueError as err:
+            raise HTTPException(status_code=400, detail=str(err)) from err
+        if len(entries) > settings.bulk_max_files:
+            raise HTTPException(status_code=413, detail=f"bulk upload is limited to {settings.bulk_max_files} files")
+    if not entries:
+        raise HTTPException(status_code=400, detail="No files found in upload")
+
+    return BulkIngestResponse(**await ingest_files(project_id, entries))
+
+
 @app.get("/api/v1/documents", response_model=list[DocumentItem])
-def list_documents(project_id: str = "default", limit: int = 100, offset: int = 0):
-    rows = db.list_documents(project_id=project_id, limit=limit, offset=offset)
-    return [_to_list_response(row) for row in rows]
+def list_documents(
+    project_id: str = "default",
+    limit: int = Query(default=100, ge=1, le=1000),
+    offset: int = 0,
+    cursor: str | None = None,
+):
+    after = None
+    if cursor and offset:
+        raise HTTPException(status_code=400, detail="cursor and offset cannot be combined")
+    if cursor:
+        try:
+            after = db.decode_document_cursor(cursor)
+        except ValueError as err:
+            raise HTTPException(status_code=400, detail=str(err)) from err
+    rows = db.list_documents(project_id=project_id, limit=limit + 1, offset=offset, after=after)
+    headers = {"X-Total-Count": str(db.count_documents(project_id))}
+    if len(rows) > limit:
+        headers["X-Next-Cursor"] = db.encode_document_cursor(rows[limit - 1])
+    return _trusted([row.__dict__ for row in rows[:limit]], headers)
 
 
 @app.get("/api/v1/documents/{document_id}")
-def get_document(document_id: str):
+def get_document(
+    document_id: str,
+    fields: str | None = None,
+    cursor: int | None = None,
+    limit: int = Query(default=50, ge=1, le=500),
+):
     item = db.get_document(document_id)
     if item is None:
         raise HTTPException(status_code=404, detail="document not found")
-    return {
-        "document": _to_list_response(item),
-        "chunks": db.get_chunks_for_document(document_id),
-    }
+    requested = _parse_chunk_fields(fields, _DEFAULT_CHUNK_FIELDS)
+    chunks = db.get_chunks_for_document(document_id, fields=requested, after_index=cursor, limit=limit + 1)
+    next_cursor = chunks[limit - 1]["chunk_index"] if len(chunks) > limit else None
+    return _trusted({"document": item.__dict__, "chunks": chunks[:limit], "next_cursor": next_cursor})
+
+
+@app.get("/api/v1/documents/{document_id}/export")
+def export_document(document_id: str, fields: str | None = None):
+    item = db.get_document(document_id)
+    if item is None:
+        raise HTTPException(status_code=404, detail="document not found")
+    requested = _parse_chunk_fields(fields, db.CHUNK_FIELDS)
+
+    def _stream():
+        yield b'{"document": ' + orjson.dumps(item.__dict__) + b', "chunks": ['
+        # decompressed once for the whole export instead of once per page
+        content = db.get_document_content(document_id) if "text" in requested else None
+        cursor = None
+        first = True
+        while True:
+            page = db.get_chunks_for_document(
+                document_id, fields=requested, after_index=cursor, limit=_EXPORT_PAGE_SIZE, content=content
+            )
+            for chunk in page:
+                yield (b"" if first else b", ") + orjson.dumps(chunk)
+                first = False
+            if len(page) < _EXPORT_PAGE_SIZE:
+                break
+            cursor = page[-1]["chunk_index"]
+        yield b"]}"
+
+    return StreamingResponse(_stream(), media_type="application/json")
+
+
+@app.post("/api/v1/documents/{document_id}/rechunk", response_model=DocumentCreateResponse)
+async def rechunk(document_id: str, payload: RechunkRequest):
+    try:
+        chunk_count = await rechunk_document(document_id, payload.max_tokens, payload.overlap)
+    except KeyError as err:
+        raise HTTPException(status_code=404, detail="document not found") from err
+    except ValueError as err:
+        raise HTTPException(status_code=409, detail=str(err)) from err
+    document = db.get_document(document_id)
+    return DocumentCreateResponse(
+        id=document_id,
+        status=document.status,
+        project_id=document.project_id,
+        chunk_count=chunk_count,
+    )
+
+
+@app.post("/api/v1/projects/{project_id}/reembed", response_model=ReembedJobResponse)
+async def reembed_project(project_id: str):
+    return _to_reembed_response(await start_reembed(project_id))
+
+
+@app.get("/api/v1/projects/{project_id}/reembed", response_model=ReembedJobResponse)
+def reembed_status(project_id: str):
+    job = db.get_reembed_job(project_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="no re-embedding job for this project")
+    return _to_reembed_response(job)
+
+
+@app.post("/api/v1/projects/{project_id}/projection", response_model=ProjectionResponse)
+async def fit_projection(project_id: str, payload: ProjectionRequest):
+    try:
+        fitted = await asyncio.to_thread(
+            projection.fit_projection,
+            project_id,
+            payload.method,
+            payload.dim,
+            active_embedding_model(project_id),
+        )
+    except KeyError as err:
+        raise HTTPException(status_code=404, detail="project has no embeddings") from err
+    except ValueError as err:
+        raise HTTPException(status_code=400, detail=str(err)) from err
+    return _to_projection_response(fitted, await asyncio.to_thread(projection.evaluate_projection, fitted))
+
+
+@app.get("/api/v1/projects/{project_id}/projection", response_model=ProjectionResponse)
+async def get_projection(project_id: str, evaluate: bool = False):
+    current = projection.current_projection(project_id)
+    if current is None:
+        raise HTTPException(status_code=404, detail="no projection for this project")
+    evaluation = await asyncio.to_thread(projection.evaluate_projection, current) if evaluate else None
+    return _to_projection_response(current, evaluation)
+
+
+@app.delete("/api/v1/projects/{project_id}/projection")
+def drop_projection(project_id: str) -> dict[str, bool]:
+    if not projection.drop_projection(project_id):
+        raise HTTPException(status_code=404, detail="no projection for this project")
+    return {"ok": True}
 
 
 @app.post("/api/v1/queries", response_model=QueryResponse)
@@ -127,11 +348,11 @@ async def query(payload: QueryRequest):
         raise HTTPException(status_code=400, detail="question cannot be empty")
 
     started = datetime.now(timezone.utc)
-    result = await answer_query(payload.project_id, payload.question, payload.top_k)
+    result = await answer_query_shared(payload.project_id, payload.question, payload.top_k)
     latency_ms = int((datetime.now(timezone.utc) - started).total_seconds() * 1000)
-    query_id = str(uuid.uuid4())
+    query_id = db.new_record_id(payload.project_id)
 
-    db.create_query(
+    await querylog.record_query(
         db.QueryRecord(
             id=query_id,
             project_id=payload.project_id,
@@ -143,41 +364,50 @@ async def query(payload: QueryRequest):
             model=result["model"],
             related_documents=result["related_documents"],
             created_at=started.isoformat(),
+            context_tokens_saved=result["context_tokens_saved"],
+            profile=profiling.current_request_profile(latency_ms),
         )
     )
 
-    return QueryResponse(
-        id=query_id,
-        answer=result["answer"],
-        citations=[Citation(**c) for c in result["citations"]],
-        latency_ms=latency_ms,
-        model=result["model"],
-        related_documents=result["related_documents"],
+    return _trusted(
+        {
+            "id": query_id,
+            "answer": result["answer"],
+            "citations": result["citations"],
+            "latency_ms": latency_ms,
+            "model": result["model"],
+            "related_documents": result["related_documents"],
+            "context_tokens_saved": result["context_tokens_saved"],
+        }
     )
 
 
 @app.get("/api/v1/queries/{query_id}", response_model=QueryDetail)
 def get_query(query_id: str):
-    item = db.get_query(query_id)
+    item = querylog.get_query(query_id)
     if item is None:
         raise HTTPException(status_code=404, detail="query not found")
-    return QueryDetail(
-        id=item.id,
-        answer=item.answer,
-        citations=[Citation(**citation) for citation in item.citations],
-        latency_ms=item.latency_ms,
-        model=item.model,
-        related_documents=item.related_documents,
-        question=item.question,
-        tokens_used=item.tokens_used,
-        created_at=item.created_at,
+    return _trusted(
+        {
+            "id": item.id,
+            "answer": item.answer,
+            "citations": item.citations,
+            "latency_ms": item.latency_ms,
+            "model": item.model,
+            "related_documents": item.related_documents,
+            "context_tokens_saved": item.context_tokens_saved,
+            "question": item.question,
+            "tokens_used": item.tokens_used,
+            "created_at": item.created_at,
+            "profile": item.profile,
+        }
     )
 
 
 @app.post("/api/v1/evals", response_model=EvalResponse)
-def add_eval(payload: EvalRequest):
+async def add_eval(payload: EvalRequest):
     try:
-        db.add_feedback(payload.query_id, payload.rating, payload.note)
+        await querylog.record_feedback(payload.query_id, payload.rating, payload.note)
     except KeyError as err:
         raise HTTPException(status_code=404, detail=str(err))
     return EvalResponse(ok=True)
@@ -190,6 +420,9 @@ async def run_action(payload: ActionRequest):
         result = await execute_action(payload.project_id, payload.type, payload.payload)
         db.complete_action(action_id, result)
         return ActionResponse(action_id=action_id, status="completed", result=result)
+    except OverloadedError:
+        db.complete_action(action_id, "rejected", status="failed")
+        raise
     except Exception:
         db.complete_action(action_id, "failed", status="failed")
         raise HTTPException(status_code=500, detail="action execution failed")
@@ -200,6 +433,56 @@ def metrics(project_id: str | None = None):
     return get_metrics(project_id)
 
 
+@app.get("/api/v1/metrics/timeseries", response_model=MetricSeriesResponse)
+def metrics_timeseries(
+    since: datetime,
+    until: datetime | None = None,
+    granularity: str = Query(default="hour", pattern="^(hour|day)$"),
+    project_id: str | None = None,
+):
+    since = since if since.tzinfo else since.replace(tzinfo=timezone.utc)
+    until = until or datetime.now(timezone.utc)
+    until = until if until.tzinfo else until.replace(tzinfo=timezone.utc)
+    if until <= since:
+        raise HTTPException(status_code=400, detail="until must be after since")
+    buckets = db.query_timeseries(granularity, since, until, project_id)
+    return MetricSeriesResponse(granularity=granularity, buckets=buckets)
+
+
+@app.get("/api/v1/admin/profile/cpu", response_class=PlainTextResponse, dependencies=[Depends(_require_admin)])
+async def profile_cpu(
+    seconds: float = Query(default=5.0, gt=0),
+    interval_ms: float = Query(default=5.0, ge=1, le=1000),
+):
+    limit = load_settings().profile_max_seconds
+    if seconds > limit:
+        raise HTTPException(status_code=400, detail=f"seconds must be at most {limit}")
+    try:
+        return PlainTextResponse(await profiling.capture_cpu_profile(seconds, interval_ms))
+    except profiling.ProfilerBusyError as err:
+        raise HTTPException(status_code=409, detail=str(err)) from err
+
+
+@app.get("/api/v1/admin/profile/memory", response_model=MemoryProfileResponse, dependencies=[Depends(_require_admin)])
+async def profile_memory(
+    seconds: float = Query(default=5.0, ge=0),
+    top: int = Query(default=25, ge=1, le=200),
+    frames: int = Query(default=1, ge=1, le=25),
+):
+    limit = load_settings().profile_max_seconds
+    if seconds > limit:
+        raise HTTPException(status_code=400, detail=f"seconds must be at most {limit}")
+    try:
+        return await profiling.capture_memory_diff(seconds, top, frames)
+    except profiling.ProfilerBusyError as err:
+        raise HTTPException(status_code=409, detail=str(err)) from err
+
+
+@app.get("/api/v1/admin/profile/slow", response_model=list[SlowRequest], dependencies=[Depends(_require_admin)])
+def profile_slow_requests():
+    return profiling.slow_requests()
+
+
 @app.get("/api/v1/changelog")
 def changelog() -> dict[str, str]:
     return {
@@ -208,6 +491,15 @@ def changelog() -> dict[str, str]:
     }
 
 
+@app.exception_handler(OverloadedError)
+def overloaded_exception_handler(request: Request, exc: OverloadedError):
+    return JSONResponse(
+        status_code=429,
+        content={"detail": str(exc)},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
+
 @app.exception_handler(Exception)
 def generic_exception_handler(request: Request, exc: Exception):
     return JSONResponse(
@@ -10,6 +10,27 @@ class DocumentCreateResponse(BaseModel):
     chunk_count: int
 
 
+class BulkFileResult(BaseModel):
+    filename: str
+    document_id: str | None = None
+    status: str
+    chunk_count: int
+    duplicate_of: str | None = None
+    error: str | None = None
+
+
+class BulkIngestResponse(BaseModel):
+    project_id: str
+    total: int
+    ingested: int
+    failed: int
+    chunks: int
+    elapsed_ms: int
+    files_per_second: float
+    chunks_per_second: float
+    files: list[BulkFileResult]
+
+
 class DocumentItem(BaseModel):
     id: str
     project_id: str
@@ -19,6 +40,13 @@ class DocumentItem(BaseModel):
     chunk_count: int
     created_at: str
     updated_at: str
+    summary: str | None = None
+    duplicate_of: str | None = None
+
+
+class RechunkRequest(BaseModel):
+    max_tokens: int = Field(default=220, ge=1, le=2000)
+    overlap: int = Field(default=40, ge=0)
 
 
 class Citation(BaseModel):
@@ -41,12 +69,43 @@ class QueryResponse(BaseModel):
     latency_ms: int
     model: str
     related_documents: list[str]
+    context_tokens_saved: int = 0
+
+
+class ProfileFrame(BaseModel):
+    frame: str
+    samples: int
+    share: float
 
 
 class QueryDetail(QueryResponse):
     question: str
     tokens_used: int
     created_at: str
+    profile: list[ProfileFrame] | None = None
+
+
+class MemoryAllocation(BaseModel):
+    location: list[str]
+    size_bytes: int
+    size_diff_bytes: int
+    count: int
+    count_diff: int
+
+
+class MemoryProfileResponse(BaseModel):
+    seconds: float
+    traced_current_bytes: int
+    traced_peak_bytes: int
+    top: list[MemoryAllocation]
+
+
+class SlowRequest(BaseModel):
+    method: str
+    path: str
+    elapsed_ms: float
+    finished_at: str
+    top_frames: list[ProfileFrame]
 
 
 class EvalRequest(BaseModel):
@@ -78,3 +137,92 @@ class MetricResponse(BaseModel):
     avg_query_latency_ms: float
     feedback_count: int
     avg_feedback_rating: float | None
+    log_queue_depth: int = 0
+    log_writes_delayed: int = 0
+    log_writes_dropped: int = 0
+    index_cache_hits: int = 0
+    index_cache_misses: int = 0
+    index_cache_evictions: int = 0
+    index_cache_entries: int = 0
+    index_cache_bytes: int = 0
+    index_cache_budget_bytes: int = 0
+    ingest_chunks_produced: int = 0
+    ingest_chunks_embedded: int = 0
+    ingest_chunks_written: int = 0
+    ingest_embed_batches: int = 0
+    ingest_write_batches: int = 0
+    ingest_chunk_rate: float = 0.0
+    ingest_embed_rate: float = 0.0
+    ingest_write_rate: float = 0.0
+    ingest_backpressure_waits: int = 0
+
+
+class ReadinessResponse(BaseModel):
+    ready: bool
+    status: str
+    projects: int
+    warmed: int
+    from_snapshot: int
+    rebuilt: int
+    failed: int
+    started_at: str | None = None
+    finished_at: str | None = None
+
+
+class MetricBucket(BaseModel):
+    bucket_start: str
+    queries: int
+    avg_query_latency_ms: float
+    latency_histogram: dict[str, int]
+    tokens_used: int
+    context_tokens_saved: int
+    feedback_count: int
+    avg_feedback_rating: float | None
+    models: dict[str, int]
+
+
+class MetricSeriesResponse(BaseModel):
+    granularity: str
+    buckets: list[MetricBucket]
+
+
+class ReembedJobResponse(BaseModel):
+    project_id: str
+    target_model: str
+    status: str
+    total: int
+    processed: int
+    progress: float
+    error: str | None
+    started_at: str
+    updated_at: str
+
+
+class ProjectionRequest(BaseModel):
+    method: str = Field(default="pca", pattern="^(pca|truncate)$")
+    dim: int = Field(ge=1)
+
+
+class ProjectionEvaluation(BaseModel):
+    queries: int
+    k: int
+    recall_at_k: float | None
+    full_dim: int
+    reduced_dim: int
+    full_latency_ms: float | None
+    reduced_latency_ms: float | None
+    full_bytes: int
+    reduced_bytes: int
+
+
+class ProjectionResponse(BaseModel):
+    project_id: str
+    embedding_model: str | None
+    method: str
+    source_dim: int
+    target_dim: int
+    version: str
+    sample_size: int
+    explained_variance: float | None
+    fitted_at: str
+    evaluation: ProjectionEvaluation | None = None
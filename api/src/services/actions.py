@@ -2,21 +2,17 @@ from __future__ import annotations
 
 from typing import Any
 
-from .. import db
-from .query import answer_query
+from .summarize import DEFAULT_SUMMARY_INSTRUCTION, summarize_documents
 
 
 async def execute_action(project_id: str, action_type: str, payload: dict[str, Any]) -> str:
     if action_type == "summary":
         target_docs = payload.get("documents") or []
-        question = payload.get("question") or "문서의 핵심 내용을 5줄로 요약해줘"
+        question = payload.get("question") or DEFAULT_SUMMARY_INSTRUCTION
         if target_docs:
-            # create a synthetic project scoped to selected docs by querying each question and concatenating manually in fallback mode
-            chunks = []
-            for doc_id in target_docs:
-                chunks.extend(db.get_chunks_for_document(doc_id))
-            if chunks:
-                return " ".join(chunk["text"] for chunk in chunks[:20])
+            result = await summarize_documents(list(target_docs), question)
+            if result["summary"]:
+                return result["summary"]
         return "요약 대상 문서가 없거나 텍스트 조각이 없습니다."
 
     if action_type == "query_digest":
@@ -0,0 +1,243 @@
+from __future__ import annotations
+
+import asyncio
+import io
+import multiprocessing
+import tarfile
+import threading
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any
+
+from .. import db
+from ..config import load_settings
+from . import dedup
+from .ingest import schedule_document_summary, source_type_for
+from .projection import attach_reduced
+from .rag import _local_embed, embed_batch, iter_chunk_spans, local_embedding_model, mean_embedding
+
+_TAR_SUFFIXES = (".tar", ".tar.gz", ".tgz", ".tar.bz2", ".tbz2", ".tar.xz", ".txz")
+
+_pool: ProcessPoolExecutor | None = None
+_pool_lock = threading.Lock()
+
+
+def _skipped(name: str) -> bool:
+    parts = name.replace("\\", "/").split("/")
+    return "__MACOSX" in parts or parts[-1].startswith(".") or not parts[-1]
+
+
+def unpack_upload(filename: str, raw: bytes, max_bytes: int) -> list[tuple[str, bytes]]:
+    lower = filename.lower()
+    if lower.endswith(".zip"):
+        try:
+            with zipfile.ZipFile(io.BytesIO(raw)) as archive:
+                members = [info for info in archive.infolist() if not info.is_dir() and not _skipped(info.filename)]
+                # sizes come from the archive directory, checked before anything is inflated
+                if sum(info.file_size for info in members) > max_bytes:
+                    raise ValueError(f"archive {filename} expands beyond {max_bytes} bytes")
+                return [(info.filename, archive.read(info)) for info in members]
+        except zipfile.BadZipFile as err:
+            raise ValueError(f"invalid zip archive: {filename}") from err
+    if lower.endswith(_TAR_SUFFIXES):
+        try:
+            with tarfile.open(fileobj=io.BytesIO(raw), mode="r:*") as archive:
+                members = [member for member in archive.getmembers() if member.isfile() and not _skipped(member.name)]
+                if sum(member.size for member in members) > max_bytes:
+                    raise ValueError(f"archive {filename} expands beyond {max_bytes} bytes")
+                return [(member.name, archive.extractfile(member).read()) for member in members]
+        except tarfile.TarError as err:
+            raise ValueError(f"invalid tar archive: {filename}") from err
+    return [(filename, raw)]
+
+
+def prepare_file(
+    name: str,
+    raw: bytes,
+    max_tokens: int,
+    overlap: int,
+    embed_locally: bool,
+    signatures: bool,
+) -> dict[str, Any]:
+    # runs in a worker process: everything CPU-bound between upload and insert
+    try:
+        text = raw.decode("utf-8")
+    except UnicodeDecodeError:
+        return {"filename": name, "error": "Only UTF-8 text files are supported in this build"}
+    source_type = source_type_for(name)
+    spans = list(iter_chunk_spans(text, max_tokens=max_tokens, overlap=overlap, source_type=source_type))
+    embeddings = None
+    if embed_locally:
+        embeddings = [(_local_embed(text[start:end]), local_embedding_model()) for start, end in spans]
+    return {
+        "filename": name,
+        "source_type": source_type,
+        "text": text,
+        "spans": spans,
+        "embeddings": embeddings,
+        "signature": dedup.signature(text) if signatures else None,
+        "chunk_signatures": [dedup.signature(text[start:end]) for start, end in spans] if signatures else None,
+    }
+
+
+def bulk_pool() -> ProcessPoolExecutor | None:
+    global _pool
+    workers = load_settings().bulk_workers
+    if workers <= 1:
+        return None
+    with _pool_lock:
+        if _pool is None:
+            # spawn, not fork: the server process has live threads and sqlite handles
+            _pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+        return _pool
+
+
+def shutdown_bulk_pool() -> None:
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown(cancel_futures=True)
+
+
+def _plan(
+    project_id: str,
+    session: dedup.DedupSession | None,
+    policy: str,
+    item: dict[str, Any],
+) -> dedup.DedupPlan:
+    signatures = item["chunk_signatures"] or [None] * len(item["spans"])
+    plan = dedup.plan_document(session, policy, db.new_record_id(project_id), item["signature"], signatures)
+    computed = item["embeddings"]
+    # local vectors were already computed in the worker; only remote calls are worth saving
+    item["embedded"] = {i: computed[i] for i in plan.keep} if computed is not None else {}
+    return plan
+
+
+async def _embed_remote(items: list[dict[str, Any]], batch_size: int) -> None:
+    wanted = [(item, i) for item in items for i in item["plan"].to_embed if i not in item["embedded"]]
+    texts = [item["text"][slice(*item["spans"][i])] for item, i in wanted]
+    vectors: list[tuple[list[float], str]] = []
+    for start in range(0, len(texts), max(1, batch_size)):
+        vectors.extend(await embed_batch(texts[start : start + batch_size]))
+    for (item, i), vector in zip(wanted, vectors):
+        item["embedded"][i] = vector
+
+
+def _document_payload(project_id: str, item: dict[str, Any]) -> dict[str, Any]:
+    plan: dedup.DedupPlan = item["plan"]
+    embedded = item["embedded"]
+    chunks = []
+    for idx in plan.keep:
+        start, end = item["spans"][idx]
+        chunks.append(
+            {
+                "id": plan.chunk_ids[idx],
+                "chunk_index": idx,
+                "text": item["text"][start:end],
+                "embedding": embedded[idx][0],
+                "metadata": {"length": end - start, "index": idx},
+                "span": (start, end),
+                "embedding_model": embedded[idx][1],
+                "duplicate_of": plan.chunk_duplicates[idx],
+            }
+        )
+    attach_reduced(project_id, chunks)
+    return {
+        "id": plan.document_id,
+        "filename": item["filename"],
+        "source_type": item["source_type"],
+        "status": "duplicate" if item["spans"] and not plan.keep else None,
+        "duplicate_of": plan.duplicate_of,
+        "text": item["text"],
+        "centroid": mean_embedding([embedded[idx][0] for idx in plan.keep]),
+        "chunks": chunks,
+    }
+
+
+async def _store_batch(project_id: str, prepared: list[dict[str, Any]]) -> list[dict[str, Any]]:
+    settings = load_settings()
+    ok = [item for item in prepared if "error" not in item]
+    session = dedup.new_session(project_id, settings.dedup_policy, settings.dedup_threshold)
+    for item in ok:
+        item["plan"] = _plan(project_id, session, settings.dedup_policy, item)
+    await _embed_remote(ok, settings.bulk_embed_batch_size)
+    for item in ok:
+        plan, embedded = item["plan"], item["embedded"]
+        links = [(i, plan.chunk_duplicates[i]) for i in plan.keep if i not in embedded]
+        if not links:
+            continue
+        known = {plan.chunk_ids[i]: vector for i, vector in embedded.items()}
+        resolved, missing = await asyncio.to_thread(dedup.resolve_links, project_id, links, known)
+        embedded.update(resolved)
+        if missing:
+            spans = item["spans"]
+            embedded.update(zip(missing, await embed_batch([item["text"][slice(*spans[i])] for i in missing])))
+    records = db.create_documents_bulk(project_id, [_document_payload(project_id, item) for item in ok])
+    if session is not None:
+        session.commit()
+    stored = iter(records)
+    results = []
+    for item in prepared:
+        if "error" in item:
+            results.append({"filename": item["filename"], "status": "failed", "chunk_count": 0, "error": item["error"]})
+            continue
+        record = next(stored)
+        if settings.precompute_summaries and record.status == "ready":
+            schedule_document_summary(record.id)
+        results.append(
+            {
+                "filename": record.filename,
+                "document_id": record.id,
+                "status": record.status,
+                "chunk_count": record.chunk_count,
+                "duplicate_of": record.duplicate_of,
+            }
+        )
+    return results
+
+
+async def ingest_files(
+    project_id: str,
+    files: list[tuple[str, bytes]],
+    max_tokens: int = 220,
+    overlap: int = 40,
+) -> dict[str, Any]:
+    started = time.perf_counter()
+    settings = load_settings()
+    embed_locally = not settings.gemini_api_key or settings.embedding_model == local_embedding_model()
+    signatures = settings.dedup_policy != "off"
+    loop = asyncio.get_running_loop()
+    pool = bulk_pool()
+    futures = [
+        loop.run_in_executor(pool, prepare_file, name, raw, max_tokens, overlap, embed_locally, signatures)
+        for name, raw in files
+    ]
+
+    results: list[dict[str, Any]] = []
+    batch_size = max(1, settings.bulk_write_batch_size)
+    for start in range(0, len(futures), batch_size):
+        # the pool keeps preparing later files while this batch is embedded and written
+        outcomes = await asyncio.gather(*futures[start : start + batch_size], return_exceptions=True)
+        prepared = [
+            outcome
+            if not isinstance(outcome, BaseException)
+            else {"filename": files[start + offset][0], "error": f"processing failed: {outcome}"}
+            for offset, outcome in enumerate(outcomes)
+        ]
+        results.extend(await _store_batch(project_id, prepared))
+
+    elapsed = time.perf_counter() - started
+    chunks = sum(item["chunk_count"] for item in results)
+    return {
+        "project_id": project_id,
+        "total": len(results),
+        "ingested": sum(1 for item in results if item["status"] != "failed"),
+        "failed": sum(1 for item in results if item["status"] == "failed"),
+        "chunks": chunks,
+        "elapsed_ms": int(elapsed * 1000),
+        "files_per_second": round(len(results) / elapsed, 2) if elapsed else 0.0,
+        "chunks_per_second": round(chunks / elapsed, 2) if elapsed else 0.0,
+        "files": results,
+    }
@@ -0,0 +1,136 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Any
+
+import numpy as np
+
+from .rag import estimate_tokens
+
+
+@dataclass
+class ContextResult:
+    items: list[dict[str, Any]]
+    scores: list[float]
+    tokens: int
+    tokens_saved: int
+
+
+def mmr_select(
+    relevance: list[float],
+    embeddings: list[list[float]],
+    k: int,
+    lambda_: float = 0.7,
+) -> list[int]:
+    if not embeddings or k <= 0:
+        return []
+    matrix = np.array(embeddings, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    matrix = matrix / norms
+    relevance_arr = np.array(relevance, dtype=np.float32)
+    pairwise = matrix @ matrix.T
+
+    selected: list[int] = []
+    redundancy = np.zeros(len(matrix), dtype=np.float32)
+    available = np.ones(len(matrix), dtype=bool)
+    for _ in range(min(k, len(matrix))):
+        mmr = lambda_ * relevance_arr - (1.0 - lambda_) * redundancy
+        mmr[~available] = -np.inf
+        idx = int(np.argmax(mmr))
+        selected.append(idx)
+        available[idx] = False
+        redundancy = np.maximum(redundancy, pairwise[idx])
+    return selected
+
+
+def merge_overlap(left: str, right: str) -> str:
+    left_tokens = left.split()
+    right_tokens = right.split()
+    for size in range(min(len(left_tokens), len(right_tokens)), 0, -1):
+        if left_tokens[-size:] == right_tokens[:size]:
+            return " ".join(left_tokens + right_tokens[size:])
+    return " ".join(left_tokens + right_tokens)
+
+
+def _merge_chunk_text(last: dict[str, Any], chunk: dict[str, Any]) -> str:
+    start, end = chunk.get("start_offset"), chunk.get("end_offset")
+    if start is None or last.get("end_offset") is None:
+        return merge_overlap(last["text"], chunk["text"])
+    overlap_chars = max(0, last["end_offset"] - start)
+    gap = "" if start <= last["end_offset"] else " "
+    return last["text"] + gap + chunk["text"][overlap_chars:]
+
+
+def merge_adjacent(chunks: list[dict[str, Any]], scores: list[float]) -> list[tuple[dict[str, Any], float]]:
+    ordered = sorted(zip(chunks, scores), key=lambda item: (item[0]["document_id"], item[0]["chunk_index"]))
+    merged: list[tuple[dict[str, Any], float]] = []
+    for chunk, score in ordered:
+        if merged:
+            last, last_score = merged[-1]
+            if last["document_id"] == chunk["document_id"] and last["last_index"] + 1 == chunk["chunk_index"]:
+                last["text"] = _merge_chunk_text(last, chunk)
+                last["end_offset"] = chunk.get("end_offset")
+                last["last_index"] = chunk["chunk_index"]
+                last["chunk_ids"].append(chunk["id"])
+                merged[-1] = (last, max(last_score, score))
+                continue
+        merged.append(
+            (
+                {
+                    "id": chunk["id"],
+                    "document_id": chunk["document_id"],
+                    "chunk_index": chunk["chunk_index"],
+                    "last_index": chunk["chunk_index"],
+                    "start_offset": chunk.get("start_offset"),
+                    "end_offset": chunk.get("end_offset"),
+                    "text": chunk["text"],
+                    "chunk_ids": [chunk["id"]],
+                },
+                score,
+            )
+        )
+    merged.sort(key=lambda item: item[1], reverse=True)
+    return merged
+
+
+def _truncate(text: str, max_tokens: int) -> str:
+    return " ".join(text.split()[:max_tokens])
+
+
+def assemble_context(
+    candidates: list[tuple[float, dict[str, Any]]],
+    top_k: int,
+    token_budget: int,
+    mmr_lambda: float = 0.7,
+) -> ContextResult:
+    baseline_tokens = sum(estimate_tokens(chunk["text"]) for _, chunk in candidates[:top_k])
+    order = mmr_select(
+        [score for score, _ in candidates],
+        [chunk["embedding"] for _, chunk in candidates],
+        top_k,
+        mmr_lambda,
+    )
+    picked = [candidates[idx] for idx in order]
+    merged = merge_adjacent([chunk for _, chunk in picked], [score for score, _ in picked])
+
+    items: list[dict[str, Any]] = []
+    scores: list[float] = []
+    used = 0
+    for item, score in merged:
+        tokens = estimate_tokens(item["text"])
+        if used + tokens > token_budget:
+            if items:
+                continue
+            item["text"] = _truncate(item["text"], token_budget)
+            tokens = estimate_tokens(item["text"])
+        items.append(item)
+        scores.append(score)
+        used += tokens
+
+    return ContextResult(
+        items=items,
+        scores=scores,
+        tokens=used,
+        tokens_saved=max(0, baseline_tokens - used),
+    )
@@ -0,0 +1,213 @@
+from __future__ import annotations
+
+import hashlib
+import uuid
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Any, Hashable, TypeVar
+
+import numpy as np
+
+from .. import db
+
+POLICIES = ("off", "flag", "link", "skip")
+
+_NUM_PERM = 128
+_BANDS = 16
+_ROWS = _NUM_PERM // _BANDS
+_SHINGLE = 3
+_PRIME = (1 << 31) - 1
+_BLOCK = 4096
+
+# fixed seed: signatures are stored, so the permutations must never change
+_rng = np.random.default_rng(20240521)
+_A = _rng.integers(1, _PRIME, _NUM_PERM, dtype=np.uint64)
+_B = _rng.integers(0, _PRIME, _NUM_PERM, dtype=np.uint64)
+
+
+def _shingles(text: str) -> set[str]:
+    tokens = text.lower().split()
+    if len(tokens) <= _SHINGLE:
+        return {" ".join(tokens)} if tokens else set()
+    return {" ".join(tokens[i : i + _SHINGLE]) for i in range(len(tokens) - _SHINGLE + 1)}
+
+
+def signature(text: str) -> np.ndarray | None:
+    shingles = _shingles(text)
+    if not shingles:
+        return None
+    hashes = np.fromiter(
+        (int.from_bytes(hashlib.blake2b(item.encode("utf-8"), digest_size=4).digest(), "big") for item in shingles),
+        dtype=np.uint64,
+        count=len(shingles),
+    ) % _PRIME
+    result = np.full(_NUM_PERM, _PRIME, dtype=np.uint64)
+    for start in range(0, len(hashes), _BLOCK):
+        # a, h < 2^31 so a * h + b stays inside uint64
+        block = (np.outer(hashes[start : start + _BLOCK], _A) + _B) % _PRIME
+        np.minimum(result, block.min(axis=0), out=result)
+    return result.astype(np.uint32)
+
+
+def jaccard(left: np.ndarray, right: np.ndarray) -> float:
+    return float(np.mean(left == right))
+
+
+def band_keys(sig: np.ndarray) -> list[tuple[int, int]]:
+    return [
+        (
+            band,
+            int.from_bytes(
+                hashlib.blake2b(sig[band * _ROWS : (band + 1) * _ROWS].tobytes(), digest_size=8).digest(),
+                "big",
+                signed=True,
+            ),
+        )
+        for band in range(_BANDS)
+    ]
+
+
+class DedupSession:
+    def __init__(self, project_id: str, threshold: float):
+        self.project_id = project_id
+        self.threshold = threshold
+        self._pending: dict[str, list[tuple[str, np.ndarray, list[tuple[int, int]]]]] = defaultdict(list)
+        self._buckets: dict[tuple[str, int, int], list[int]] = defaultdict(list)
+        # items that are about to be replaced and must not become roots
+        self.retired: set[str] = set()
+
+    def match(self, kind: str, sig: np.ndarray | None, exclude: str | None = None) -> str | None:
+        if sig is None:
+            return None
+        bands = band_keys(sig)
+        candidates = [
+            (item_id, np.frombuffer(raw, dtype=np.uint32))
+            for item_id, raw in db.find_minhash_candidates(self.project_id, kind, bands)
+        ]
+        # items seen earlier in this session are not in the database yet
+        pending = {position for band, bucket in bands for position in self._buckets[(kind, band, bucket)]}
+        candidates.extend(self._pending[kind][position][:2] for position in sorted(pending))
+        best, best_score = None, self.threshold
+        for item_id, other in candidates:
+            if item_id == exclude or item_id in self.retired:
+                continue
+            score = jaccard(sig, other)
+            if score >= best_score and (best is None or score > best_score):
+                best, best_score = item_id, score
+        return best
+
+    def add(self, kind: str, item_id: str, sig: np.ndarray) -> None:
+        bands = band_keys(sig)
+        for band, bucket in bands:
+            self._buckets[(kind, band, bucket)].append(len(self._pending[kind]))
+        self._pending[kind].append((item_id, sig, bands))
+
+    def commit(self) -> None:
+        for kind, items in self._pending.items():
+            db.add_minhash_signatures(
+                self.project_id,
+                kind,
+                [(item_id, sig.tobytes(), bands) for item_id, sig, bands in items],
+            )
+        self._pending.clear()
+        self._buckets.clear()
+
+
+Vector = tuple[list[float], str | None]
+K = TypeVar("K", bound=Hashable)
+
+
+@dataclass
+class ChunkPlan:
+    chunk_id: str
+    duplicate_of: str | None
+    keep: bool
+    embed: bool
+
+
+@dataclass
+class DedupPlan:
+    document_id: str
+    duplicate_of: str | None
+    chunk_ids: list[str]
+    chunk_duplicates: list[str | None]
+    keep: list[int]
+    to_embed: list[int]
+
+
+def match_document(session: DedupSession, document_id: str, sig: np.ndarray | None) -> str | None:
+    # a rechunked document must not match its own earlier signature
+    duplicate_of = session.match("document", sig, exclude=document_id)
+    if duplicate_of is None and sig is not None:
+        session.add("document", document_id, sig)
+    return duplicate_of
+
+
+def match_chunk(session: DedupSession, chunk_id: str, sig: np.ndarray | None) -> str | None:
+    # only originals are registered, so every match is already a root
+    root = session.match("chunk", sig)
+    if root is None and sig is not None:
+        session.add("chunk", chunk_id, sig)
+    return root
+
+
+def plan_chunk(session: DedupSession | None, policy: str, chunk_id: str, sig: np.ndarray | None) -> ChunkPlan:
+    root = match_chunk(session, chunk_id, sig) if session is not None else None
+    keep = policy != "skip" or root is None
+    return ChunkPlan(chunk_id, root, keep, keep and (policy != "link" or root is None))
+
+
+def plan_document(
+    session: DedupSession | None,
+    policy: str,
+    document_id: str,
+    doc_signature: np.ndarray | None,
+    chunk_signatures: list[np.ndarray | None],
+) -> DedupPlan:
+    duplicate_of = match_document(session, document_id, doc_signature) if session is not None else None
+    if duplicate_of is not None and policy == "skip":
+        return DedupPlan(document_id, duplicate_of, [], [], [], [])
+    plans = [plan_chunk(session, policy, str(uuid.uuid4()), sig) for sig in chunk_signatures]
+    return DedupPlan(
+        document_id,
+        duplicate_of,
+        [plan.chunk_id for plan in plans],
+        [plan.duplicate_of for plan in plans],
+        [i for i, plan in enumerate(plans) if plan.keep],
+        [i for i, plan in enumerate(plans) if plan.embed],
+    )
+
+
+def resolve_links(
+    project_id: str, links: list[tuple[K, str]], known: dict[str, Vector]
+) -> tuple[dict[K, Vector], list[K]]:
+    # roots are always originals: a linked chunk reuses its root's vector from this
+    # ingest or from the database, and is only embedded when the root has none
+    roots = [root for _, root in links if root not in known]
+    stored = db.get_chunk_embeddings(project_id, list(dict.fromkeys(roots)))
+    resolved: dict[K, Vector] = {}
+    missing: list[K] = []
+    for key, root in links:
+        vector = known.get(root) or stored.get(root)
+        if vector is None:
+            missing.append(key)
+        else:
+            resolved[key] = vector
+    return resolved, missing
+
+
+def new_session(project_id: str, policy: str, threshold: float) -> DedupSession | None:
+    if policy not in POLICIES:
+        raise ValueError(f"unknown dedup policy: {policy}")
+    return None if policy == "off" else DedupSession(project_id, threshold)
+
+
+def collapse_duplicates(chunks: list[dict[str, Any]]) -> list[dict[str, Any]]:
+    seen: set[str] = set()
+    kept = []
+    for chunk in chunks:
+        key = chunk.get("duplicate_of") or chunk["id"]
+        if key not in seen:
+            seen.add(key)
+            kept.append(chunk)
+    return kept
@@ -0,0 +1,299 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+
+import numpy as np
+
+from .. import db
+from ..config import load_settings
+from .projection import Projection, projected_rows
+
+_SNAPSHOT_FORMAT = 1
+
+
+@dataclass
+class ProjectIndex:
+    project_id: str
+    embedding_model: str | None
+    embedding_dim: int
+    version: str
+    chunk_ids: np.ndarray
+    document_ids: np.ndarray
+    doc_codes: np.ndarray
+    matrix: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.chunk_ids)
+
+    def search(
+        self,
+        query_vec: list[float],
+        document_ids: list[str] | None = None,
+        limit: int = 15,
+    ) -> list[tuple[float, int]]:
+        rows = np.arange(len(self))
+        if document_ids is not None:
+            allowed = np.flatnonzero(np.isin(self.document_ids, document_ids))
+            rows = np.flatnonzero(np.isin(self.doc_codes, allowed))
+        if not len(rows) or limit <= 0:
+            return []
+        query = np.asarray(query_vec, dtype=np.float32)
+        norm = float(np.linalg.norm(query))
+        # rows are stored unit-length, so a dot product is the cosine similarity
+        scores = self.matrix[rows] @ (query / norm) if norm else np.zeros(len(rows), dtype=np.float32)
+        if limit < len(rows):
+            top = np.argpartition(-scores, limit - 1)[:limit]
+        else:
+            top = np.arange(len(rows))
+        top = top[np.lexsort((rows[top], -scores[top]))]
+        return [(float(scores[i]), int(rows[i])) for i in top]
+
+
+def index_nbytes(index: ProjectIndex) -> int:
+    return int(sum(array.nbytes for array in (index.matrix, index.chunk_ids, index.document_ids, index.doc_codes)))
+
+
+def _from_rows(
+    project_id: str,
+    embedding_model: str | None,
+    embedding_dim: int,
+    version: str,
+    rows: list[tuple[str, str, list[float]]],
+    width: int | None = None,
+) -> ProjectIndex:
+    document_ids, doc_codes = np.unique(np.array([row[1] for row in rows], dtype=str), return_inverse=True)
+    matrix = np.array([row[2] for row in rows], dtype=np.float32).reshape(len(rows), width or embedding_dim)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return ProjectIndex(
+        project_id=project_id,
+        embedding_model=embedding_model,
+        embedding_dim=embedding_dim,
+        version=version,
+        chunk_ids=np.array([row[0] for row in rows], dtype=str),
+        document_ids=document_ids,
+        doc_codes=doc_codes.astype(np.int32),
+        matrix=matrix / norms,
+    )
+
+
+def build_index(
+    project_id: str,
+    embedding_model: str | None,
+    embedding_dim: int,
+    projection: Projection | None = None,
+) -> ProjectIndex:
+    if projection is not None:
+        version, rows = projected_rows(projection)
+        return _from_rows(project_id, embedding_model, embedding_dim, version, rows, projection.target_dim)
+    version, rows = db.get_chunk_vectors(project_id, embedding_model, embedding_dim)
+    return _from_rows(project_id, embedding_model, embedding_dim, version, rows)
+
+
+def snapshot_dir() -> Path:
+    configured = load_settings().index_snapshot_dir
+    if configured:
+        return Path(configured).expanduser()
+    return Path(db.get_db_path()).parent / "index_snapshots"
+
+
+def _snapshot_meta(project_id: str, embedding_model: str | None, embedding_dim: int, version: str) -> dict:
+    return {
+        "format": _SNAPSHOT_FORMAT,
+        "project_id": project_id,
+        "embedding_model": embedding_model,
+        "embedding_dim": embedding_dim,
+        "version": version,
+    }
+
+
+def _snapshot_path(project_id: str, embedding_model: str | None, embedding_dim: int) -> Path:
+    digest = hashlib.sha256(json.dumps([project_id, embedding_model, embedding_dim]).encode("utf-8")).hexdigest()
+    return snapshot_dir() / f"{digest[:32]}.npz"
+
+
+def save_snapshot(index: ProjectIndex) -> Path:
+    path = _snapshot_path(index.project_id, index.embedding_model, index.embedding_dim)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    meta = _snapshot_meta(index.project_id, index.embedding_model, index.embedding_dim, index.version)
+    partial = path.with_suffix(".partial")
+    with open(partial, "wb") as handle:
+        np.savez(
+            handle,
+            meta=np.array(json.dumps(meta)),
+            chunk_ids=index.chunk_ids,
+            document_ids=index.document_ids,
+            doc_codes=index.doc_codes,
+            matrix=index.matrix,
+        )
+    os.replace(partial, path)
+    _persisted[(index.project_id, index.embedding_model, index.embedding_dim)] = index.version
+    return path
+
+
+def load_snapshot(project_id: str, embedding_model: str | None, embedding_dim: int, version: str) -> ProjectIndex | None:
+    path = _snapshot_path(project_id, embedding_model, embedding_dim)
+    if not path.exists():
+        return None
+    try:
+        with np.load(path, allow_pickle=False) as data:
+            if json.loads(str(data["meta"])) != _snapshot_meta(project_id, embedding_model, embedding_dim, version):
+                return None
+            _persisted[(project_id, embedding_model, embedding_dim)] = version
+            return ProjectIndex(
+                project_id=project_id,
+                embedding_model=embedding_model,
+                embedding_dim=embedding_dim,
+                version=version,
+                chunk_ids=data["chunk_ids"],
+                document_ids=data["document_ids"],
+                doc_codes=data["doc_codes"],
+                matrix=data["matrix"],
+            )
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+IndexKey = tuple[str, str | None, int]
+
+# last version written to (or read from) disk per key, so unchanged indexes
+# are not rewritten on eviction or shutdown
+_persisted: dict[IndexKey, str] = {}
+
+
+class IndexCache:
+    def __init__(self, budget_bytes: int):
+        self.budget_bytes = max(0, budget_bytes)
+        self.bytes = 0
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0, "oversized": 0}
+        self._entries: OrderedDict[IndexKey, tuple[ProjectIndex, int]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __contains__(self, key: IndexKey) -> bool:
+        return key in self._entries
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: IndexKey, version: str) -> ProjectIndex | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0].version != version:
+                self.stats["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self.stats["hits"] += 1
+            return entry[0]
+
+    def put(self, key: IndexKey, index: ProjectIndex) -> list[ProjectIndex]:
+        size = index_nbytes(index)
+        evicted: list[ProjectIndex] = []
+        with self._lock:
+            self._discard(key)
+            if size > self.budget_bytes:
+                # served once, never resident: caching it would flush everything else
+                self.stats["oversized"] += 1
+                return evicted
+            while self._entries and self.bytes + size > self.budget_bytes:
+                oldest = next(iter(self._entries))
+                evicted.append(self._entries[oldest][0])
+                self._discard(oldest)
+                self.stats["evictions"] += 1
+            self._entries[key] = (index, size)
+            self.bytes += size
+        return evicted
+
+    def _discard(self, key: IndexKey) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.bytes -= entry[1]
+
+    def values(self) -> list[ProjectIndex]:
+        with self._lock:
+            return [index for index, _ in self._entries.values()]
+
+    def snapshot(self) -> dict[str, int]:
+        return {**self.stats, "entries": len(self._entries), "bytes": self.bytes, "budget_bytes": self.budget_bytes}
+
+
+_cache: IndexCache | None = None
+_cache_lock = threading.Lock()
+
+
+def index_cache() -> IndexCache:
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = IndexCache(load_settings().index_cache_bytes)
+        return _cache
+
+
+def _persist(indexes: list[ProjectIndex]) -> int:
+    saved = 0
+    for index in indexes:
+        if _persisted.get((index.project_id, index.embedding_model, index.embedding_dim)) != index.version:
+            save_snapshot(index)
+            saved += 1
+    return saved
+
+
+def load_project_index(
+    project_id: str,
+    embedding_model: str | None,
+    embedding_dim: int,
+    persist: bool = False,
+    projection: Projection | None = None,
+) -> tuple[ProjectIndex, str]:
+    settings = load_settings()
+    cache = index_cache()
+    key = (project_id, embedding_model, embedding_dim)
+    version = db.get_index_version(project_id)
+    if projection is not None:
+        # a refit or a dropped projection invalidates the cached matrix and its snapshot
+        version = f"{version}:{projection.version}"
+    cached = cache.get(key, version)
+    if cached is not None:
+        return cached, "memory"
+    index = load_snapshot(project_id, embedding_model, embedding_dim, version) if settings.index_snapshots else None
+    source = "snapshot"
+    if index is None:
+        index, source = build_index(project_id, embedding_model, embedding_dim, projection), "rebuilt"
+        if persist and settings.index_snapshots:
+            save_snapshot(index)
+    evicted = cache.put(key, index)
+    if evicted and settings.index_snapshots:
+        # an evicted project comes back from disk instead of a full chunk scan
+        _persist(evicted)
+    return index, source
+
+
+def get_project_index(
+    project_id: str,
+    embedding_model: str | None,
+    embedding_dim: int,
+    projection: Projection | None = None,
+) -> ProjectIndex:
+    return load_project_index(project_id, embedding_model, embedding_dim, projection=projection)[0]
+
+
+def save_snapshots() -> int:
+    if not load_settings().index_snapshots:
+        return 0
+    return _persist(index_cache().values())
+
+
+def cache_stats() -> dict[str, int]:
+    return index_cache().snapshot()
+
+
+def clear_indexes() -> None:
+    global _cache
+    with _cache_lock:
+        _cache = None
+    _persisted.clear()
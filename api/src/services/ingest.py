@@ -1,27 +1,173 @@
 from __future__ import annotations
 
+import asyncio
+import logging
+from collections import deque
 from typing import Iterable
 
 from .. import db
-from .rag import chunk_text, embed_texts
+from ..config import load_settings
+from . import dedup
+from .limits import OverloadedError, _loop_local, background_priority
+from .rag import LLMError, embed_batch, iter_chunk_spans, mean_embedding
+from .pipeline import run_pipeline
+from .summarize import DEFAULT_SUMMARY_INSTRUCTION, summarize_documents
+from .vectorstore import get_vector_store
 
+logger = logging.getLogger(__name__)
 
-async def process_document(document_id: str, project_id: str, text: str) -> int:
-    chunks = chunk_text(text)
-    if not chunks:
-        db.set_document_status(document_id, "empty")
+
+class _SummaryQueue:
+    # background summaries run through a small worker pool and never queue for the
+    # LLM behind or ahead of interactive requests (see limits.background_priority)
+    def __init__(self) -> None:
+        self.pending: deque[tuple[str, int]] = deque()
+        self.queued: set[str] = set()
+        self.runners: set[asyncio.Task] = set()
+
+
+def summary_queue() -> _SummaryQueue:
+    return _loop_local("summary_queue", _SummaryQueue)
+
+
+def source_type_for(filename: str) -> str:
+    if filename.lower().endswith(".md"):
+        return "markdown"
+    if filename.lower().endswith(".txt"):
+        return "text"
+    return "unknown"
+
+
+async def process_document(
+    document_id: str,
+    project_id: str,
+    text: str,
+    source_type: str = "text",
+    max_tokens: int = 220,
+    overlap: int = 40,
+) -> int:
+    db.set_document_content(document_id, text)
+    return await _index_document(document_id, project_id, text, source_type, max_tokens, overlap)
+
+
+async def rechunk_document(document_id: str, max_tokens: int, overlap: int) -> int:
+    document = db.get_document(document_id)
+    if document is None:
+        raise KeyError("document not found")
+    text = db.get_document_content(document_id)
+    if text is None:
+        raise ValueError("document was uploaded before content storage and must be re-uploaded")
+    # the old chunks keep serving queries until the new ones are written
+    previous = [chunk["id"] for chunk in db.get_chunks_for_document(document_id, fields=["id"])]
+    return await _index_document(
+        document_id, document.project_id, text, document.source_type, max_tokens, overlap, replacing=previous
+    )
+
+
+async def _index_document(
+    document_id: str,
+    project_id: str,
+    text: str,
+    source_type: str,
+    max_tokens: int,
+    overlap: int,
+    replacing: list[str] | None = None,
+) -> int:
+    settings = load_settings()
+    store = get_vector_store()
+    replacing = replacing or []
+    session = dedup.new_session(project_id, settings.dedup_policy, settings.dedup_threshold)
+    if session is not None:
+        session.retired.update(replacing)
+        duplicate_of = dedup.match_document(session, document_id, await asyncio.to_thread(dedup.signature, text))
+        db.set_document_duplicate(document_id, duplicate_of)
+        if duplicate_of is not None and settings.dedup_policy == "skip":
+            session.commit()
+            store.delete(project_id, chunk_ids=replacing)
+            db.set_document_status(document_id, "duplicate", chunk_count=0)
+            return 0
+
+    try:
+        with db.deferred_index_version(project_id):
+            result = await run_pipeline(
+                project_id,
+                document_id,
+                text,
+                iter_chunk_spans(text, max_tokens=max_tokens, overlap=overlap, source_type=source_type),
+                store,
+                embed_batch,
+                batch_size=settings.ingest_batch_size,
+                queue_depth=settings.ingest_queue_depth,
+                session=session,
+                policy=settings.dedup_policy,
+            )
+    except BaseException:
+        # batches are written as they finish, so a failure leaves a partial document behind;
+        # the chunks being replaced are still intact and stay in place
+        kept = set(replacing)
+        partial = [chunk["id"] for chunk in db.get_chunks_for_document(document_id, fields=["id"])]
+        store.delete(project_id, chunk_ids=[chunk_id for chunk_id in partial if chunk_id not in kept])
+        raise
+    if session is not None:
+        session.commit()
+    store.delete(project_id, chunk_ids=replacing)
+
+    if not result.chunked:
+        db.set_document_status(document_id, "empty", chunk_count=0)
+        return 0
+    if not result.vectors:
+        # skip policy: every chunk in the document is already indexed
+        db.set_document_status(document_id, "duplicate", chunk_count=0)
         return 0
+    db.set_document_centroid(document_id, mean_embedding(result.vectors))
+    db.set_document_status(document_id, "ready", chunk_count=len(result.vectors))
+    if settings.precompute_summaries:
+        schedule_document_summary(document_id)
+    return len(result.vectors)
+
+
+async def precompute_document_summary(document_id: str) -> None:
+    result = await summarize_documents([document_id], DEFAULT_SUMMARY_INSTRUCTION, concurrency=1)
+    if result["summary"]:
+        db.set_document_summary(document_id, result["summary"])
+
+
+def schedule_document_summary(document_id: str, attempt: int = 0) -> None:
+    queue = summary_queue()
+    if document_id in queue.queued:
+        return
+    queue.queued.add(document_id)
+    queue.pending.append((document_id, attempt))
+    # a few long-lived runners drain the queue instead of one task per document
+    for _ in range(max(1, load_settings().summary_precompute_concurrency) - len(queue.runners)):
+        task = asyncio.create_task(_run_summaries(queue))
+        queue.runners.add(task)
+        task.add_done_callback(queue.runners.discard)
+
+
+def resume_document_summaries() -> int:
+    if not load_settings().precompute_summaries:
+        return 0
+    document_ids = db.list_unsummarized_documents()
+    for document_id in document_ids:
+        schedule_document_summary(document_id)
+    return len(document_ids)
+
 
-    embeddings = await embed_texts(chunks)
-    for idx, (chunk, vector) in enumerate(zip(chunks, embeddings)):
-        db.create_chunk(
-            document_id=document_id,
-            project_id=project_id,
-            chunk_index=idx,
-            text=chunk,
-            embedding=vector,
-            metadata={"length": len(chunk), "index": idx},
-        )
-
-    db.set_document_status(document_id, "ready", chunk_count=len(chunks))
-    return len(chunks)
+async def _run_summaries(queue: _SummaryQueue) -> None:
+    settings = load_settings()
+    while queue.pending:
+        document_id, attempt = queue.pending.popleft()
+        queue.queued.discard(document_id)
+        try:
+            with background_priority():
+                await precompute_document_summary(document_id)
+        except (LLMError, OverloadedError) as err:
+            # the summary stays NULL, so a later attempt or the next startup fills it in
+            if attempt + 1 >= settings.summary_max_attempts:
+                logger.warning("giving up on summary for %s after %d attempts: %s", document_id, attempt + 1, err)
+                continue
+            delay = err.retry_after if isinstance(err, OverloadedError) else settings.summary_retry_seconds * 2**attempt
+            asyncio.get_running_loop().call_later(delay, schedule_document_summary, document_id, attempt + 1)
+        except Exception:
+            logger.exception("summary precomputation failed for %s", document_id)
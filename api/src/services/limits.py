@@ -0,0 +1,178 @@
+from __future__ import annotations
+
+import asyncio
+import math
+import time
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from typing import Any, AsyncIterator, Awaitable, Callable, Hashable, Iterator, TypeVar
+
+from ..config import load_settings
+
+T = TypeVar("T")
+
+_background = ContextVar("llm_background", default=False)
+
+
+class OverloadedError(RuntimeError):
+    def __init__(self, retry_after: int):
+        super().__init__("LLM capacity is exhausted, retry later")
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    def __init__(self, max_concurrent: int, max_queue: int):
+        self.max_concurrent = max(1, max_concurrent)
+        self.max_queue = max(0, max_queue)
+        self.rejected = 0
+        self.deferred = 0
+        self._semaphore = asyncio.Semaphore(self.max_concurrent)
+        self._waiting = 0
+        self._background = 0
+        self._avg_seconds = 1.0
+
+    @property
+    def waiting(self) -> int:
+        return self._waiting
+
+    def retry_after(self) -> int:
+        return max(1, math.ceil(self._avg_seconds * (self._waiting + 1) / self.max_concurrent))
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[None]:
+        background = _background.get()
+        if background and (self._semaphore.locked() or self._waiting):
+            # background work only takes a slot nobody is waiting for, and never queues
+            self.deferred += 1
+            raise OverloadedError(self.retry_after())
+        # interactive callers may also queue behind every slot background work holds
+        if self._semaphore.locked() and self._waiting >= self.max_queue + self._background:
+            self.rejected += 1
+            raise OverloadedError(self.retry_after())
+        self._waiting += 1
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self._waiting -= 1
+        self._background += background
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._background -= background
+            self._semaphore.release()
+            self._avg_seconds = 0.8 * self._avg_seconds + 0.2 * (time.perf_counter() - started)
+
+
+@contextmanager
+def background_priority() -> Iterator[None]:
+    token = _background.set(True)
+    try:
+        yield
+    finally:
+        _background.reset(token)
+
+
+class SingleFlight:
+    def __init__(self) -> None:
+        self.coalesced = 0
+        self._calls: dict[Hashable, asyncio.Future] = {}
+
+    async def run(self, key: Hashable, func: Callable[[], Awaitable[T]]) -> T:
+        existing = self._calls.get(key)
+        if existing is not None:
+            self.coalesced += 1
+            return await asyncio.shield(existing)
+        # shield keeps the shared call alive for followers if the leader's
+        # request is cancelled
+        task = asyncio.ensure_future(func())
+        self._calls[key] = task
+        try:
+            return await asyncio.shield(task)
+        finally:
+            if self._calls.get(key) is task:
+                del self._calls[key]
+
+
+class CircuitBreaker:
+    def __init__(
+        self,
+        failure_threshold: int,
+        reset_seconds: float,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_seconds = reset_seconds
+        self._clock = clock
+        self._failures = 0
+        self._opened_at: float | None = None
+        self._trial_in_flight = False
+
+    @property
+    def state(self) -> str:
+        if self._opened_at is None:
+            return "closed"
+        if self._clock() - self._opened_at >= self.reset_seconds:
+            return "half-open"
+        return "open"
+
+    def allow(self) -> bool:
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "half-open" and not self._trial_in_flight:
+            # let exactly one probe through; everyone else keeps failing fast
+            self._trial_in_flight = True
+            return True
+        return False
+
+    def release(self) -> None:
+        # a probe that never finished (cancelled mid-call) proves nothing either way
+        self._trial_in_flight = False
+
+    def record_success(self) -> None:
+        self._failures = 0
+        self._opened_at = None
+        self._trial_in_flight = False
+
+    def record_failure(self) -> None:
+        self._failures += 1
+        self._trial_in_flight = False
+        if self._opened_at is not None or self._failures >= self.failure_threshold:
+            self._opened_at = self._clock()
+
+
+_embedding_breaker: CircuitBreaker | None = None
+
+
+def embedding_breaker() -> CircuitBreaker:
+    global _embedding_breaker
+    if _embedding_breaker is None:
+        settings = load_settings()
+        _embedding_breaker = CircuitBreaker(settings.breaker_failure_threshold, settings.breaker_reset_seconds)
+    return _embedding_breaker
+
+
+_loop_state: dict[str, tuple[asyncio.AbstractEventLoop, Any]] = {}
+
+
+def _loop_local(name: str, factory: Callable[[], T]) -> T:
+    # asyncio primitives are bound to the loop that first waits on them
+    loop = asyncio.get_running_loop()
+    current = _loop_state.get(name)
+    if current is None or current[0] is not loop:
+        current = (loop, factory())
+        _loop_state[name] = current
+    return current[1]
+
+
+def llm_admission() -> AdmissionController:
+    def _build() -> AdmissionController:
+        settings = load_settings()
+        return AdmissionController(settings.llm_max_concurrency, settings.llm_max_queue)
+
+    return _loop_local("llm_admission", _build)
+
+
+def query_flight() -> SingleFlight:
+    return _loop_local("query_flight", SingleFlight)
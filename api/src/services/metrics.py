@@ -1,7 +1,33 @@
 from __future__ import annotations
 
 from .. import db
+from .index import cache_stats
+from .pipeline import pipeline_stats
+from .querylog import writer_stats
 
 
 def get_metrics(project_id: str | None = None) -> dict[str, float | int | None]:
-    return db.metric_snapshot(project_id)
+    stats = writer_stats()
+    cache = cache_stats()
+    ingest = pipeline_stats()
+    return {
+        **db.metric_snapshot(project_id),
+        "log_queue_depth": stats["queue_depth"],
+        "log_writes_delayed": stats["delayed"],
+        "log_writes_dropped": stats["dropped"],
+        "index_cache_hits": cache["hits"],
+        "index_cache_misses": cache["misses"],
+        "index_cache_evictions": cache["evictions"],
+        "index_cache_entries": cache["entries"],
+        "index_cache_bytes": cache["bytes"],
+        "index_cache_budget_bytes": cache["budget_bytes"],
+        "ingest_chunks_produced": ingest["chunk"]["items"],
+        "ingest_chunks_embedded": ingest["embed"]["items"],
+        "ingest_chunks_written": ingest["write"]["items"],
+        "ingest_embed_batches": ingest["embed"]["batches"],
+        "ingest_write_batches": ingest["write"]["batches"],
+        "ingest_chunk_rate": ingest["chunk"]["items_per_second"],
+        "ingest_embed_rate": ingest["embed"]["items_per_second"],
+        "ingest_write_rate": ingest["write"]["items_per_second"],
+        "ingest_backpressure_waits": ingest["chunk"]["backpressure_waits"] + ingest["embed"]["backpressure_waits"],
+    }
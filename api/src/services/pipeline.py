@@ -0,0 +1,183 @@
+from __future__ import annotations
+
+import asyncio
+import time
+import uuid
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Iterable
+
+from . import dedup
+from .vectorstore import VectorRecord, VectorStore
+
+Embedder = Callable[[list[str]], Awaitable[list[tuple[list[float], str]]]]
+
+
+@dataclass
+class StageCounter:
+    items: int = 0
+    batches: int = 0
+    busy_seconds: float = 0.0
+    # times this stage found the downstream queue full and had to wait
+    backpressure_waits: int = 0
+
+    def snapshot(self) -> dict[str, float | int]:
+        rate = self.items / self.busy_seconds if self.busy_seconds else 0.0
+        return {
+            "items": self.items,
+            "batches": self.batches,
+            "busy_seconds": round(self.busy_seconds, 4),
+            "items_per_second": round(rate, 2),
+            "backpressure_waits": self.backpressure_waits,
+        }
+
+
+_STAGES = ("chunk", "embed", "write")
+_counters = {stage: StageCounter() for stage in _STAGES}
+
+
+def pipeline_stats() -> dict[str, dict[str, float | int]]:
+    return {stage: counter.snapshot() for stage, counter in _counters.items()}
+
+
+def reset_pipeline_stats() -> None:
+    for stage in _STAGES:
+        _counters[stage] = StageCounter()
+
+
+@dataclass
+class PendingChunk:
+    index: int
+    span: tuple[int, int]
+    text: str
+    chunk_id: str
+    duplicate_of: str | None
+    embed: bool
+
+
+@dataclass
+class PipelineResult:
+    chunked: int
+    vectors: list[list[float]]
+
+
+async def _put(queue: asyncio.Queue, item, counter: StageCounter) -> None:
+    if queue.full():
+        counter.backpressure_waits += 1
+    await queue.put(item)
+
+
+async def run_pipeline(
+    project_id: str,
+    document_id: str,
+    text: str,
+    spans: Iterable[tuple[int, int]],
+    store: VectorStore,
+    embed: Embedder,
+    batch_size: int,
+    queue_depth: int,
+    session: dedup.DedupSession | None = None,
+    policy: str = "off",
+) -> PipelineResult:
+    batch_size = max(1, batch_size)
+    # bounded queues: a slow embedder stalls chunking, a slow writer stalls embedding
+    chunk_queue: asyncio.Queue[PendingChunk | None] = asyncio.Queue(maxsize=batch_size * max(1, queue_depth))
+    write_queue: asyncio.Queue[list | None] = asyncio.Queue(maxsize=max(1, queue_depth))
+    known: dict[str, tuple[list[float], str | None]] = {}
+    written: list[list[float]] = []
+    chunked = 0
+
+    async def chunk_stage() -> None:
+        nonlocal chunked
+        counter = _counters["chunk"]
+        started = time.perf_counter()
+        for index, (start, end) in enumerate(spans):
+            body = text[start:end]
+            # minhashing is pure CPU work: keep it off the event loop
+            sig = await asyncio.to_thread(dedup.signature, body) if session is not None else None
+            plan = dedup.plan_chunk(session, policy, str(uuid.uuid4()), sig)
+            chunked += 1
+            counter.items += 1
+            if not plan.keep:
+                continue
+            counter.busy_seconds += time.perf_counter() - started
+            pending = PendingChunk(index, (start, end), body, plan.chunk_id, plan.duplicate_of, plan.embed)
+            await _put(chunk_queue, pending, counter)
+            started = time.perf_counter()
+        counter.busy_seconds += time.perf_counter() - started
+        await chunk_queue.put(None)
+
+    async def resolve_linked(batch: list[PendingChunk]) -> None:
+        links = [(chunk.chunk_id, chunk.duplicate_of) for chunk in batch if not chunk.embed]
+        if not links:
+            return
+        resolved, missing = await asyncio.to_thread(dedup.resolve_links, project_id, links, known)
+        known.update(resolved)
+        if missing:
+            texts = {chunk.chunk_id: chunk.text for chunk in batch}
+            known.update(zip(missing, await embed([texts[chunk_id] for chunk_id in missing])))
+
+    async def embed_stage() -> None:
+        counter = _counters["embed"]
+        finished = False
+        while not finished:
+            batch: list[PendingChunk] = []
+            while len(batch) < batch_size:
+                item = await chunk_queue.get()
+                if item is None:
+                    finished = True
+                    break
+                batch.append(item)
+            if not batch:
+                break
+            started = time.perf_counter()
+            fresh = [chunk for chunk in batch if chunk.embed]
+            if fresh:
+                known.update(zip((chunk.chunk_id for chunk in fresh), await embed([chunk.text for chunk in fresh])))
+            await resolve_linked(batch)
+            counter.items += len(batch)
+            counter.batches += 1
+            counter.busy_seconds += time.perf_counter() - started
+            await _put(write_queue, batch, counter)
+        await write_queue.put(None)
+
+    async def write_stage() -> None:
+        counter = _counters["write"]
+        while (batch := await write_queue.get()) is not None:
+            started = time.perf_counter()
+            records = [
+                VectorRecord(
+                    document_id=document_id,
+                    chunk_index=chunk.index,
+                    text=chunk.text,
+                    embedding=known[chunk.chunk_id][0],
+                    metadata={"length": len(chunk.text), "index": chunk.index},
+                    span=chunk.span,
+                    embedding_model=known[chunk.chunk_id][1],
+                    chunk_id=chunk.chunk_id,
+                    duplicate_of=chunk.duplicate_of,
+                )
+                for chunk in batch
+            ]
+            # sqlite work runs off the event loop so the next batch keeps embedding;
+            # an in-flight write still lands before cancellation so cleanup sees it
+            write = asyncio.ensure_future(asyncio.to_thread(store.add, project_id, records))
+            try:
+                await asyncio.shield(write)
+            except asyncio.CancelledError:
+                await write
+                raise
+            written.extend(record.embedding for record in records)
+            counter.items += len(records)
+            counter.batches += 1
+            counter.busy_seconds += time.perf_counter() - started
+
+    tasks = [asyncio.create_task(stage()) for stage in (chunk_stage, embed_stage, write_stage)]
+    # a failed stage stops feeding its neighbours, so cancel them instead of waiting on a sentinel
+    try:
+        await asyncio.gather(*tasks)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        raise
+    return PipelineResult(chunked=chunked, vectors=written)
@@ -0,0 +1,220 @@
+from __future__ import annotations
+
+import asyncio
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter, deque
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from typing import Any
+
+from ..config import load_settings
+
+Stack = tuple[str, ...]
+
+# leaf frames of threads that are parked rather than doing work
+_IDLE_LEAVES = {"selectors.py:select", "threading.py:wait", "thread.py:_worker", "queue.py:get"}
+_SLOW_REQUEST_HISTORY = 50
+
+_request_started: ContextVar[float | None] = ContextVar("request_started", default=None)
+_capturing = False
+
+
+class ProfilerBusyError(RuntimeError):
+    def __init__(self):
+        super().__init__("another profile capture is already running")
+
+
+def _label(frame) -> str:
+    return f"{os.path.basename(frame.f_code.co_filename)}:{frame.f_code.co_name}"
+
+
+def _stack(frame) -> Stack:
+    labels = []
+    while frame is not None:
+        labels.append(_label(frame))
+        frame = frame.f_back
+    return tuple(reversed(labels))
+
+
+def sample_stacks(skip: set[int]) -> list[Stack]:
+    stacks = []
+    for thread_id, frame in sys._current_frames().items():
+        if thread_id in skip:
+            continue
+        stack = _stack(frame)
+        if stack and stack[-1] not in _IDLE_LEAVES:
+            stacks.append(stack)
+    return stacks
+
+
+def collapse(stacks: list[Stack]) -> str:
+    # flamegraph.pl / speedscope "collapsed" format: root;...;leaf <count>
+    counts = Counter(";".join(stack) for stack in stacks)
+    return "".join(f"{line} {count}\n" for line, count in counts.most_common())
+
+
+def top_frames(stacks: list[Stack], limit: int = 10) -> list[dict[str, Any]]:
+    if not stacks:
+        return []
+    leaves = Counter(stack[-1] for stack in stacks)
+    return [
+        {"frame": frame, "samples": count, "share": round(count / len(stacks), 4)}
+        for frame, count in leaves.most_common(limit)
+    ]
+
+
+def _sample_for(seconds: float, interval: float) -> list[Stack]:
+    skip = {threading.get_ident()}
+    stacks: list[Stack] = []
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        stacks.extend(sample_stacks(skip))
+        time.sleep(interval)
+    return stacks
+
+
+async def capture_cpu_profile(seconds: float, interval_ms: float) -> str:
+    global _capturing
+    if _capturing:
+        raise ProfilerBusyError()
+    _capturing = True
+    try:
+        # the sampler runs in a worker thread so the event loop keeps serving
+        # requests and shows up in the samples
+        stacks = await asyncio.to_thread(_sample_for, seconds, interval_ms / 1000)
+    finally:
+        _capturing = False
+    return collapse(stacks)
+
+
+async def capture_memory_diff(seconds: float, top: int = 25, frames: int = 1) -> dict[str, Any]:
+    global _capturing
+    if _capturing:
+        raise ProfilerBusyError()
+    _capturing = True
+    started_here = not tracemalloc.is_tracing()
+    try:
+        if started_here:
+            tracemalloc.start(frames)
+        ignore = (
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+        )
+        before = tracemalloc.take_snapshot().filter_traces(ignore)
+        await asyncio.sleep(seconds)
+        after = tracemalloc.take_snapshot().filter_traces(ignore)
+        current, peak = tracemalloc.get_traced_memory()
+        stats = after.compare_to(before, "traceback" if frames > 1 else "lineno")
+    finally:
+        if started_here:
+            tracemalloc.stop()
+        _capturing = False
+    return {
+        "seconds": seconds,
+        "traced_current_bytes": current,
+        "traced_peak_bytes": peak,
+        "top": [
+            {
+                "location": [f"{frame.filename}:{frame.lineno}" for frame in stat.traceback],
+                "size_bytes": stat.size,
+                "size_diff_bytes": stat.size_diff,
+                "count": stat.count,
+                "count_diff": stat.count_diff,
+            }
+            for stat in stats[:top]
+        ],
+    }
+
+
+class RequestSampler:
+    def __init__(self, interval_seconds: float, window_seconds: float):
+        self.interval_seconds = interval_seconds
+        self._samples: deque[tuple[float, Stack]] = deque(maxlen=max(1, int(window_seconds / interval_seconds)))
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def start(self) -> None:
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="request-sampler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self) -> None:
+        skip = {threading.get_ident()}
+        while not self._stop.wait(self.interval_seconds):
+            now = time.monotonic()
+            self._samples.extend((now, stack) for stack in sample_stacks(skip))
+
+    def between(self, started: float, finished: float) -> list[Stack]:
+        # samples cover every busy thread, so concurrent requests share blame
+        return [stack for at, stack in list(self._samples) if started <= at <= finished]
+
+
+_sampler: RequestSampler | None = None
+_slow_requests: deque[dict[str, Any]] = deque(maxlen=_SLOW_REQUEST_HISTORY)
+
+
+def start_request_profiler() -> None:
+    global _sampler
+    settings = load_settings()
+    if not settings.profile_slow_requests or _sampler is not None:
+        return
+    # keep enough history to cover a request several times slower than the threshold
+    window = max(10.0, settings.profile_slow_ms / 1000 * 10)
+    _sampler = RequestSampler(settings.profile_sample_interval_ms / 1000, window)
+    _sampler.start()
+
+
+def stop_request_profiler() -> None:
+    global _sampler
+    if _sampler is not None:
+        _sampler.stop()
+        _sampler = None
+
+
+def current_request_profile(elapsed_ms: float, limit: int = 10) -> list[dict[str, Any]] | None:
+    started = _request_started.get()
+    if _sampler is None or started is None or elapsed_ms < load_settings().profile_slow_ms:
+        return None
+    return top_frames(_sampler.between(started, time.monotonic()), limit)
+
+
+def slow_requests() -> list[dict[str, Any]]:
+    return list(reversed(_slow_requests))
+
+
+class SlowRequestMiddleware:
+    def __init__(self, app, threshold_ms: float):
+        self.app = app
+        self.threshold_ms = threshold_ms
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or _sampler is None:
+            await self.app(scope, receive, send)
+            return
+        started = time.monotonic()
+        token = _request_started.set(started)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _request_started.reset(token)
+            elapsed_ms = (time.monotonic() - started) * 1000
+            if elapsed_ms >= self.threshold_ms and _sampler is not None:
+                _slow_requests.append(
+                    {
+                        "method": scope["method"],
+                        "path": scope["path"],
+                        "elapsed_ms": round(elapsed_ms, 1),
+                        "finished_at": datetime.now(timezone.utc).isoformat(),
+                        "top_frames": top_frames(_sampler.between(started, time.monotonic())),
+                    }
+                )
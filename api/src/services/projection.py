@@ -0,0 +1,249 @@
+from __future__ import annotations
+
+import time
+import uuid
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Any
+
+import numpy as np
+
+from .. import db
+from ..config import load_settings
+
+METHODS = ("pca", "truncate")
+_REPROJECT_BATCH_SIZE = 1000
+
+ProjectedRow = tuple[str, str, np.ndarray]
+
+
+@dataclass
+class Projection:
+    project_id: str
+    embedding_model: str | None
+    method: str
+    source_dim: int
+    target_dim: int
+    components: np.ndarray
+    version: str
+    sample_size: int
+    explained_variance: float | None
+    fitted_at: str
+
+    def apply(self, vectors) -> np.ndarray:
+        matrix = _unit(np.asarray(vectors, dtype=np.float32).reshape(-1, self.source_dim))
+        if self.method == "truncate":
+            # Matryoshka-style: the leading dimensions already carry the signal
+            return np.ascontiguousarray(matrix[:, : self.target_dim])
+        return matrix @ self.components.T
+
+    def matches(self, embedding_model: str | None, embedding_dim: int) -> bool:
+        return embedding_dim == self.source_dim and self.embedding_model in (None, embedding_model)
+
+
+def _unit(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def fit_pca(vectors: np.ndarray, target_dim: int) -> tuple[np.ndarray, float]:
+    # uncentered: retrieval ranks by dot product, so the components must span
+    # the vectors themselves rather than their spread around the mean
+    _, singular, components = np.linalg.svd(_unit(vectors.astype(np.float32)), full_matrices=False)
+    energy = singular.astype(np.float64) ** 2
+    explained = float(energy[:target_dim].sum() / energy.sum()) if energy.sum() else 1.0
+    return components[:target_dim].astype(np.float32), explained
+
+
+def _truncation_energy(vectors: np.ndarray, target_dim: int) -> float:
+    squared = _unit(vectors.astype(np.float32)) ** 2
+    total = float(squared.sum())
+    return float(squared[:, :target_dim].sum()) / total if total else 1.0
+
+
+def _from_record(record: db.ProjectionRecord) -> Projection:
+    components = np.frombuffer(record.components, dtype=np.float32)
+    return Projection(
+        project_id=record.project_id,
+        embedding_model=record.embedding_model,
+        method=record.method,
+        source_dim=record.source_dim,
+        target_dim=record.target_dim,
+        components=components.reshape(-1, record.source_dim) if components.size else components,
+        version=record.version,
+        sample_size=record.sample_size,
+        explained_variance=record.explained_variance,
+        fitted_at=record.fitted_at,
+    )
+
+
+_projections: dict[str, Projection] = {}
+
+
+def current_projection(project_id: str) -> Projection | None:
+    # one indexed lookup per call; the matrix itself is only re-read after a refit
+    version = db.get_projection_version(project_id)
+    if version is None:
+        _projections.pop(project_id, None)
+        return None
+    cached = _projections.get(project_id)
+    if cached is None or cached.version != version:
+        record = db.get_projection(project_id)
+        if record is None:
+            return None
+        cached = _projections[project_id] = _from_record(record)
+    return cached
+
+
+def get_projection(project_id: str, embedding_model: str | None, embedding_dim: int) -> Projection | None:
+    projection = current_projection(project_id)
+    if projection is None or not projection.matches(embedding_model, embedding_dim):
+        return None
+    return projection
+
+
+def fit_projection(project_id: str, method: str, target_dim: int, embedding_model: str | None) -> Projection:
+    if method not in METHODS:
+        raise ValueError(f"unknown projection method: {method}")
+    source_dim = db.dominant_embedding_dim(project_id, embedding_model)
+    if source_dim is None:
+        raise KeyError("project has no embeddings")
+    if not 0 < target_dim < source_dim:
+        raise ValueError(f"dim must be between 1 and {source_dim - 1}")
+    _, rows = db.get_chunk_vectors(project_id, embedding_model, source_dim)
+    vectors = np.array([row[2] for row in rows], dtype=np.float32).reshape(len(rows), source_dim)
+    sample_size = min(len(vectors), max(1, load_settings().projection_fit_sample))
+    if sample_size < len(vectors):
+        vectors = vectors[np.random.default_rng(0).choice(len(vectors), sample_size, replace=False)]
+
+    if method == "pca":
+        if sample_size < target_dim:
+            raise ValueError(f"pca needs at least {target_dim} chunks, project has {sample_size}")
+        components, explained = fit_pca(vectors, target_dim)
+    else:
+        components = np.zeros(0, dtype=np.float32)
+        explained = _truncation_energy(vectors, target_dim)
+
+    record = db.ProjectionRecord(
+        project_id=project_id,
+        embedding_model=embedding_model,
+        method=method,
+        source_dim=source_dim,
+        target_dim=target_dim,
+        components=components.tobytes(),
+        version=uuid.uuid4().hex,
+        sample_size=sample_size,
+        explained_variance=round(explained, 6),
+        fitted_at=datetime.now(timezone.utc).isoformat(),
+    )
+    db.save_projection(record)
+    projection = _projections[project_id] = _from_record(record)
+    reproject(projection)
+    return projection
+
+
+def reproject(projection: Projection) -> int:
+    updated = 0
+    after_id = ""
+    while True:
+        batch = db.get_chunks_to_reproject(
+            projection.project_id,
+            projection.embedding_model,
+            projection.source_dim,
+            projection.version,
+            after_id,
+            _REPROJECT_BATCH_SIZE,
+        )
+        if not batch:
+            return updated
+        reduced = projection.apply([vector for _, vector in batch])
+        db.set_reduced_embeddings(
+            projection.project_id,
+            projection.version,
+            [(chunk_id, row.astype(np.float32).tobytes()) for (chunk_id, _), row in zip(batch, reduced)],
+        )
+        updated += len(batch)
+        after_id = batch[-1][0]
+
+
+def drop_projection(project_id: str) -> bool:
+    _projections.pop(project_id, None)
+    return db.delete_projection(project_id)
+
+
+def attach_reduced(project_id: str, chunks: list[dict[str, Any]]) -> None:
+    projection = current_projection(project_id) if chunks else None
+    if projection is None:
+        return
+    matching = [
+        chunk for chunk in chunks if projection.matches(chunk.get("embedding_model"), len(chunk["embedding"]))
+    ]
+    if not matching:
+        return
+    reduced = projection.apply([chunk["embedding"] for chunk in matching])
+    for chunk, row in zip(matching, reduced):
+        chunk["reduced_embedding"] = row.astype(np.float32).tobytes()
+        chunk["reduced_version"] = projection.version
+
+
+def projected_rows(projection: Projection) -> tuple[str, list[ProjectedRow]]:
+    version, rows = db.get_projected_vectors(
+        projection.project_id,
+        projection.embedding_model,
+        projection.source_dim,
+        projection.version,
+    )
+    # rows that raced a refit still carry the previous reduction
+    stale = [i for i, row in enumerate(rows) if row[2] is None]
+    fresh = dict(zip(stale, projection.apply([rows[i][3] for i in stale]))) if stale else {}
+    projected = [
+        (chunk_id, document_id, fresh[i] if reduced is None else np.frombuffer(reduced, dtype=np.float32))
+        for i, (chunk_id, document_id, reduced, _) in enumerate(rows)
+    ]
+    return f"{version}:{projection.version}", projected
+
+
+def _top_k(matrix: np.ndarray, query: np.ndarray, exclude: int, k: int) -> np.ndarray:
+    scores = matrix @ query
+    scores[exclude] = -np.inf
+    return np.argpartition(-scores, k - 1)[:k]
+
+
+def evaluate_projection(projection: Projection, queries: int | None = None, k: int | None = None) -> dict[str, Any]:
+    settings = load_settings()
+    _, rows = db.get_chunk_vectors(projection.project_id, projection.embedding_model, projection.source_dim)
+    full = _unit(np.array([row[2] for row in rows], dtype=np.float32).reshape(len(rows), projection.source_dim))
+    reduced = _unit(projection.apply(full).astype(np.float32))
+    k = min(k or settings.projection_eval_k, len(rows) - 1)
+    report: dict[str, Any] = {
+        "queries": 0,
+        "k": max(k, 0),
+        "recall_at_k": None,
+        "full_dim": projection.source_dim,
+        "reduced_dim": projection.target_dim,
+        "full_latency_ms": None,
+        "reduced_latency_ms": None,
+        "full_bytes": int(full.nbytes),
+        "reduced_bytes": int(reduced.nbytes),
+    }
+    if k <= 0:
+        return report
+
+    # stored chunks double as queries; each is left out of its own results
+    picks = np.random.default_rng(0).choice(len(rows), min(queries or settings.projection_eval_queries, len(rows)), replace=False)
+    started = time.perf_counter()
+    exact = [_top_k(full, full[i], i, k) for i in picks]
+    full_seconds = time.perf_counter() - started
+    started = time.perf_counter()
+    approx = [_top_k(reduced, reduced[i], i, k) for i in picks]
+    reduced_seconds = time.perf_counter() - started
+
+    overlap = [len(np.intersect1d(a, b)) / k for a, b in zip(exact, approx)]
+    report.update(
+        queries=len(picks),
+        recall_at_k=round(float(np.mean(overlap)), 4),
+        full_latency_ms=round(full_seconds * 1000 / len(picks), 4),
+        reduced_latency_ms=round(reduced_seconds * 1000 / len(picks), 4),
+    )
+    return report
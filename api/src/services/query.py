@@ -1,33 +1,99 @@
 from __future__ import annotations
 
+import asyncio
 from typing import Any
 
+import numpy as np
+
 from .. import db
-from .rag import build_citations, embed_text, generate_answer, similarity
+from ..config import load_settings
+from .context import assemble_context
+from .dedup import collapse_duplicates
+from .limits import query_flight
+from .projection import get_projection
+from .rag import build_citations, embed_text_with_model, generate_answer
+from .vectorstore import get_vector_store
+
+_CANDIDATE_MULTIPLIER = 3
+
+
+def active_embedding_model(project_id: str) -> str | None:
+    models = db.get_embedding_models(project_id)
+    if not models:
+        return None
+    # the bulk of the project stays searchable until a re-embedding job
+    # switches it over; legacy rows without provenance count as current
+    return max(models, key=lambda model: models[model])
+
+
+async def embed_query(project_id: str, question: str) -> tuple[list[float], str]:
+    # embed once, with the model the project is indexed under rather than the default
+    return await embed_text_with_model(question, active_embedding_model(project_id))
+
+
+def prefilter_documents(project_id: str, query_vec: list[float]) -> list[str] | None:
+    settings = load_settings()
+    centroids = db.get_document_centroids(project_id)
+    if len(centroids) < settings.centroid_prefilter_min_documents:
+        return None
+
+    # documents without a comparable centroid are never filtered out
+    selected = [doc_id for doc_id, centroid in centroids if not centroid or len(centroid) != len(query_vec)]
+    comparable = [(doc_id, centroid) for doc_id, centroid in centroids if centroid and len(centroid) == len(query_vec)]
+    if comparable:
+        matrix = np.array([centroid for _, centroid in comparable], dtype=np.float32)
+        scores = matrix @ np.array(query_vec, dtype=np.float32)
+        top = np.argsort(-scores)[: settings.centroid_prefilter_top_documents]
+        selected.extend(comparable[int(idx)][0] for idx in top)
+    return selected
 
 
 async def answer_query(project_id: str, question: str, top_k: int = 5) -> dict[str, Any]:
-    query_vec = await embed_text(question)
-    all_chunks = db.get_chunks_by_project(project_id)
-    if not all_chunks:
+    query_vec, query_model = await embed_query(project_id, question)
+    candidate_documents = prefilter_documents(project_id, query_vec)
+    projection = get_projection(project_id, query_model, len(query_vec))
+    # search may rebuild a cold index and snapshot evicted ones: keep that off the event loop
+    hits = await asyncio.to_thread(
+        get_vector_store().search,
+        project_id,
+        projection.apply(query_vec)[0].tolist() if projection is not None else query_vec,
+        top_k * _CANDIDATE_MULTIPLIER,
+        embedding_model=query_model,
+        document_ids=candidate_documents,
+        projection=projection,
+    )
+    chunks = db.get_chunks_by_ids(project_id, [hit.chunk_id for hit in hits])
+    settings = load_settings()
+    if settings.dedup_collapse:
+        chunks = collapse_duplicates(chunks)
+    if not chunks:
+        answer = "아직 프로젝트에 업로드된 문서가 없습니다. 먼저 문서를 업로드해 주세요."
+        if candidate_documents is None and db.get_embedding_models(project_id):
+            answer = "임베딩 모델이 일치하는 문서 조각이 없어 검색할 수 없습니다. 잠시 후 다시 시도해 주세요."
         return {
-            "answer": "아직 프로젝트에 업로드된 문서가 없습니다. 먼저 문서를 업로드해 주세요.",
+            "answer": answer,
             "citations": [],
             "model": "local-fallback",
             "tokens_used": 0,
             "related_documents": [],
+            "context_tokens_saved": 0,
         }
 
+    by_id = {hit.chunk_id: hit for hit in hits}
     scored = []
-    for chunk in all_chunks:
-        score = similarity(query_vec, chunk["embedding"])
-        scored.append((score, chunk))
+    for chunk in chunks:
+        hit = by_id[chunk["id"]]
+        chunk["embedding"] = hit.embedding
+        scored.append((hit.score, chunk))
 
-    scored.sort(key=lambda item: item[0], reverse=True)
-    top = scored[:top_k]
-    selected_chunks = [chunk for _, chunk in top]
-    scores = [score for score, _ in top]
-    citations = build_citations(selected_chunks, scores)
+    context = assemble_context(
+        scored,
+        top_k,
+        settings.context_token_budget,
+        settings.mmr_lambda,
+    )
+    selected_chunks = context.items
+    citations = build_citations(selected_chunks, context.scores)
 
     answer, tokens_used, model = await generate_answer(
         question=question,
@@ -41,4 +107,11 @@ async def answer_query(project_id: str, question: str, top_k: int = 5) -> dict[s
         "model": model,
         "tokens_used": int(tokens_used or 0),
         "related_documents": list(related_documents),
+        "context_tokens_saved": context.tokens_saved,
     }
+
+
+async def answer_query_shared(project_id: str, question: str, top_k: int = 5) -> dict[str, Any]:
+    # identical questions asked concurrently share one retrieval + generation
+    key = (project_id, " ".join(question.split()), top_k)
+    return await query_flight().run(key, lambda: answer_query(project_id, question, top_k))
@@ -0,0 +1,176 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from typing import Any
+
+from .. import db
+from ..config import load_settings
+
+logger = logging.getLogger(__name__)
+
+
+class QueryLogWriter:
+    def __init__(self, batch_size: int, interval_seconds: float, buffer_size: int, enqueue_timeout: float = 1.0):
+        self.batch_size = max(1, batch_size)
+        self.interval_seconds = interval_seconds
+        self.enqueue_timeout = enqueue_timeout
+        self._queue: asyncio.Queue[db.QueryRecord | db.FeedbackRecord] = asyncio.Queue(maxsize=max(1, buffer_size))
+        self._pending: dict[str, db.QueryRecord] = {}
+        # records from a failed flush, written ahead of the next batch
+        self._retry: list[db.QueryRecord | db.FeedbackRecord] = []
+        self._retry_limit = max(1, buffer_size)
+        self._task: asyncio.Task | None = None
+        self._stopping = False
+        self.stats = {"enqueued": 0, "flushed": 0, "batches": 0, "delayed": 0, "dropped": 0}
+
+    def start(self) -> None:
+        self._stopping = False
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        # no cancellation: the loop drains the queue and exits on its own,
+        # so a batch is never lost between dequeue and commit
+        self._stopping = True
+        if self._task is not None:
+            await self._task
+            self._task = None
+
+    async def submit(self, record: db.QueryRecord | db.FeedbackRecord) -> bool:
+        # registered before enqueueing so a concurrent flush can't pop it first
+        if isinstance(record, db.QueryRecord):
+            self._pending[record.id] = record
+        try:
+            self._queue.put_nowait(record)
+        except asyncio.QueueFull:
+            self.stats["delayed"] += 1
+            try:
+                await asyncio.wait_for(self._queue.put(record), self.enqueue_timeout)
+            except asyncio.TimeoutError:
+                self.stats["dropped"] += 1
+                if isinstance(record, db.QueryRecord):
+                    self._pending.pop(record.id, None)
+                return False
+        self.stats["enqueued"] += 1
+        return True
+
+    def pending_query(self, query_id: str) -> db.QueryRecord | None:
+        return self._pending.get(query_id)
+
+    def snapshot(self) -> dict[str, int]:
+        return {**self.stats, "queue_depth": self._queue.qsize()}
+
+    def _drain(self, limit: int) -> list[db.QueryRecord | db.FeedbackRecord]:
+        items = []
+        while len(items) < limit and not self._queue.empty():
+            items.append(self._queue.get_nowait())
+        return items
+
+    async def _collect(self) -> list[db.QueryRecord | db.FeedbackRecord]:
+        if self._stopping:
+            return self._drain(self.batch_size)
+        batch: list[db.QueryRecord | db.FeedbackRecord] = []
+        deadline = time.monotonic() + self.interval_seconds
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self) -> None:
+        while not (self._stopping and self._queue.empty() and not self._retry):
+            await self._flush(await self._collect())
+
+    async def _flush(self, batch: list[db.QueryRecord | db.FeedbackRecord]) -> None:
+        batch, self._retry = self._retry + batch, []
+        if not batch:
+            return
+        queries = [item for item in batch if isinstance(item, db.QueryRecord)]
+        feedback = [item for item in batch if isinstance(item, db.FeedbackRecord)]
+        for attempt in (1, 2):
+            try:
+                await asyncio.to_thread(db.write_log_batch, queries, feedback)
+            except Exception:
+                if attempt == 2:
+                    self._hold(batch)
+                continue
+            self.stats["batches"] += 1
+            self.stats["flushed"] += len(batch)
+            for record in queries:
+                self._pending.pop(record.id, None)
+            break
+
+    def _hold(self, batch: list[db.QueryRecord | db.FeedbackRecord]) -> None:
+        # held records stay readable through _pending; on shutdown there is no next flush
+        keep = 0 if self._stopping else self._retry_limit
+        dropped = batch[: max(0, len(batch) - keep)]
+        logger.exception("query log flush failed; holding %d records, dropping %d", len(batch) - len(dropped), len(dropped))
+        self._retry = batch[len(dropped) :]
+        self.stats["dropped"] += len(dropped)
+        for record in dropped:
+            if isinstance(record, db.QueryRecord):
+                self._pending.pop(record.id, None)
+
+
+_writer: QueryLogWriter | None = None
+
+
+async def start_query_log() -> None:
+    global _writer
+    settings = load_settings()
+    if not settings.write_behind_logging:
+        return
+    _writer = QueryLogWriter(
+        settings.log_flush_batch_size,
+        settings.log_flush_interval_seconds,
+        settings.log_buffer_size,
+        settings.log_enqueue_timeout_seconds,
+    )
+    _writer.start()
+
+
+async def stop_query_log() -> None:
+    global _writer
+    if _writer is not None:
+        await _writer.stop()
+        _writer = None
+
+
+async def record_query(record: db.QueryRecord) -> None:
+    if _writer is None:
+        db.write_log_batch([record], [])
+    else:
+        await _writer.submit(record)
+
+
+async def record_feedback(query_id: str, rating: int | None, note: str | None) -> None:
+    if not query_exists(query_id):
+        raise KeyError("query_id does not exist")
+    record = db.new_feedback_record(query_id, rating, note)
+    if _writer is None:
+        db.write_log_batch([], [record])
+    else:
+        await _writer.submit(record)
+
+
+def get_query(query_id: str) -> db.QueryRecord | None:
+    # the buffer is checked first: a record leaves it only after its commit
+    pending = _writer.pending_query(query_id) if _writer is not None else None
+    return pending or db.get_query(query_id)
+
+
+def query_exists(query_id: str) -> bool:
+    if _writer is not None and _writer.pending_query(query_id) is not None:
+        return True
+    return db.query_exists(query_id)
+
+
+def writer_stats() -> dict[str, Any]:
+    if _writer is None:
+        return {"enqueued": 0, "flushed": 0, "batches": 0, "delayed": 0, "dropped": 0, "queue_depth": 0}
+    return _writer.snapshot()
@@ -1,13 +1,15 @@
 from __future__ import annotations
 
 import hashlib
-import time
-from typing import Any
+import re
+from collections import deque
+from typing import Any, Iterator
 
 import httpx
 import numpy as np
 
 from ..config import load_settings
+from .limits import embedding_breaker, llm_admission
 
 
 class LLMError(RuntimeError):
@@ -16,6 +18,9 @@ class LLMError(RuntimeError):
 
 _EMBED_DIM = 256
 _GEMINI_BASE = "https://generativelanguage.googleapis.com/v1beta"
+_TOKEN_PATTERN = re.compile(r"\S+")
+_SENTENCE_END = re.compile(r"[.!?。！？]+[\"')\]]*(?=\s|$)|\n[ \t]*\n")
+_MARKDOWN_HEADING = re.compile(r"^#{1,6}[ \t]", re.MULTILINE)
 
 
 def _normalize_vector(vector: np.ndarray) -> np.ndarray:
@@ -53,18 +58,89 @@ def chunk_text(text: str, max_tokens: int = 220, overlap: int = 40) -> list[str]
     return chunks
 
 
-async def embed_text(text: str) -> list[float]:
+def _trimmed(text: str, start: int, end: int) -> tuple[int, int] | None:
+    while start < end and text[start].isspace():
+        start += 1
+    while end > start and text[end - 1].isspace():
+        end -= 1
+    return (start, end) if start < end else None
+
+
+def _iter_units(text: str, start: int, end: int, max_tokens: int) -> Iterator[tuple[int, int, int]]:
+    # (start, end, token_count) per sentence; sentences longer than
+    # max_tokens are cut on token boundaries so every unit fits a chunk.
+    pos = start
+    boundaries = [match.end() for match in _SENTENCE_END.finditer(text, start, end)]
+    for boundary in [*boundaries, end]:
+        span = _trimmed(text, pos, boundary)
+        pos = boundary
+        if span is None:
+            continue
+        count = len(text[span[0] : span[1]].split())
+        if count <= max_tokens:
+            yield span[0], span[1], count
+            continue
+        tokens = [match.span() for match in _TOKEN_PATTERN.finditer(text, span[0], span[1])]
+        for offset in range(0, len(tokens), max_tokens):
+            piece = tokens[offset : offset + max_tokens]
+            yield piece[0][0], piece[-1][1], len(piece)
+
+
+def _iter_sections(text: str, source_type: str) -> Iterator[tuple[int, int]]:
+    if source_type != "markdown":
+        yield 0, len(text)
+        return
+    pos = 0
+    for match in _MARKDOWN_HEADING.finditer(text):
+        if match.start() > pos:
+            yield pos, match.start()
+        pos = match.start()
+    yield pos, len(text)
+
+
+def iter_chunk_spans(
+    text: str,
+    max_tokens: int = 220,
+    overlap: int = 40,
+    source_type: str = "text",
+) -> Iterator[tuple[int, int]]:
+    if max_tokens <= 0:
+        raise ValueError("max_tokens must be greater than 0")
+    for section_start, section_end in _iter_sections(text, source_type):
+        window: deque[tuple[int, int, int]] = deque()
+        window_tokens = 0
+        fresh = False
+        for unit in _iter_units(text, section_start, section_end, max_tokens):
+            if window and window_tokens + unit[2] > max_tokens:
+                yield window[0][0], window[-1][1]
+                fresh = False
+                while window and (window_tokens > overlap or window_tokens + unit[2] > max_tokens):
+                    window_tokens -= window.popleft()[2]
+            window.append(unit)
+            window_tokens += unit[2]
+            fresh = True
+        if fresh:
+            yield window[0][0], window[-1][1]
+
+
+def local_embedding_model() -> str:
+    return f"local-hash-{_EMBED_DIM}"
+
+
+async def embed_text_with_model(text: str, model: str | None = None) -> tuple[list[float], str]:
     settings = load_settings()
-    if not settings.gemini_api_key:
-        return _local_embed(text)
+    selected_model = model or settings.embedding_model
+    breaker = embedding_breaker()
+    if selected_model == local_embedding_model() or not settings.gemini_api_key or not breaker.allow():
+        return _local_embed(text), local_embedding_model()
 
-    endpoint = f"{_GEMINI_BASE}/models/{settings.embedding_model}:embedContent"
+    endpoint = f"{_GEMINI_BASE}/models/{selected_model}:embedContent"
     headers = {
         "x-goog-api-key": settings.gemini_api_key,
         "Content-Type": "application/json",
     }
     payload = {
-        "model": f"models/{settings.embedding_model}",
+        "model": f"models/{selected_model}",
         "content": {"parts": [{"text": text}]},
     }
     try:
@@ -72,13 +148,60 @@ async def embed_text(text: str) -> list[float]:
             response = await client.post(endpoint, json=payload, headers=headers)
             response.raise_for_status()
             data = response.json()
-            return data["embedding"]["values"]
+            values = data["embedding"]["values"]
     except Exception:
-        return _local_embed(text)
+        breaker.record_failure()
+        return _local_embed(text), local_embedding_model()
+    except BaseException:
+        breaker.release()
+        raise
+    breaker.record_success()
+    return values, selected_model
+
+
+async def embed_text(text: str) -> list[float]:
+    vector, _ = await embed_text_with_model(text)
+    return vector
+
 
+async def embed_texts(texts: list[str], model: str | None = None) -> list[tuple[list[float], str]]:
+    return [await embed_text_with_model(text, model) for text in texts]
 
-async def embed_texts(texts: list[str]) -> list[list[float]]:
-    return [await embed_text(text) for text in texts]
+
+async def embed_batch(texts: list[str], model: str | None = None) -> list[tuple[list[float], str]]:
+    settings = load_settings()
+    selected_model = model or settings.embedding_model
+    breaker = embedding_breaker()
+    if not texts:
+        return []
+    if selected_model == local_embedding_model() or not settings.gemini_api_key or not breaker.allow():
+        return [(_local_embed(text), local_embedding_model()) for text in texts]
+
+    endpoint = f"{_GEMINI_BASE}/models/{selected_model}:batchEmbedContents"
+    headers = {
+        "x-goog-api-key": settings.gemini_api_key,
+        "Content-Type": "application/json",
+    }
+    payload = {
+        "requests": [
+            {"model": f"models/{selected_model}", "content": {"parts": [{"text": text}]}} for text in texts
+        ],
+    }
+    try:
+        async with httpx.AsyncClient(timeout=settings.api_timeout) as client:
+            response = await client.post(endpoint, json=payload, headers=headers)
+            response.raise_for_status()
+            vectors = [item["values"] for item in response.json()["embeddings"]]
+        if len(vectors) != len(texts):
+            raise ValueError("embedding count mismatch")
+    except Exception:
+        breaker.record_failure()
+        return [(_local_embed(text), local_embedding_model()) for text in texts]
+    except BaseException:
+        breaker.release()
+        raise
+    breaker.record_success()
+    return [(vector, selected_model) for vector in vectors]
 
 
 def similarity(query: list[float], candidate: list[float]) -> float:
@@ -94,6 +217,14 @@ def similarity(query: list[float], candidate: list[float]) -> float:
     return float(np.dot(q, c) / denom)
 
 
+def mean_embedding(vectors: list[list[float]]) -> list[float]:
+    if not vectors:
+        return []
+    dim = len(vectors[0])
+    matrix = np.array([vec for vec in vectors if len(vec) == dim], dtype=np.float32)
+    return _normalize_vector(matrix.mean(axis=0)).astype(float).tolist()
+
+
 def build_prompt(question: str, context_chunks: list[dict[str, Any]]) -> str:
     context_lines = []
     for i, chunk in enumerate(context_chunks, start=1):
@@ -128,12 +259,18 @@ async def generate_answer(question: str, context_chunks: list[dict[str, Any]], m
         )
 
     selected_model = model or settings.chat_model
-    endpoint = f"{_GEMINI_BASE}/models/{selected_model}:generateContent"
+    prompt = build_prompt(question, context_chunks)
+    answer, used_tokens = await _generate_content(prompt, selected_model)
+    return answer, used_tokens, selected_model
+
+
+async def _generate_content(prompt: str, model: str) -> tuple[str, int]:
+    settings = load_settings()
+    endpoint = f"{_GEMINI_BASE}/models/{model}:generateContent"
     headers = {
         "x-goog-api-key": settings.gemini_api_key,
         "Content-Type": "application/json",
     }
-    prompt = build_prompt(question, context_chunks)
     payload = {
         "systemInstruction": {
             "parts": [{"text": "You are a practical engineering assistant."}],
@@ -145,18 +282,50 @@ async def generate_answer(question: str, context_chunks: list[dict[str, Any]], m
             "temperature": 0.2,
         },
     }
-    try:
-        start = time.perf_counter()
-        async with httpx.AsyncClient(timeout=settings.api_timeout) as client:
-            response = await client.post(endpoint, json=payload, headers=headers)
-            response.raise_for_status()
-            data = response.json()
-            answer = data["candidates"][0]["content"]["parts"][0]["text"]
-            used_tokens = int(data.get("usageMetadata", {}).get("totalTokenCount", 0))
-            _ = time.perf_counter() - start
-            return answer.strip(), used_tokens, selected_model
-    except Exception as err:
-        raise LLMError(str(err))
+    # admission happens outside the try so OverloadedError reaches the caller
+    async with llm_admission().slot():
+        try:
+            async with httpx.AsyncClient(timeout=settings.api_timeout) as client:
+                response = await client.post(endpoint, json=payload, headers=headers)
+                response.raise_for_status()
+                data = response.json()
+                answer = data["candidates"][0]["content"]["parts"][0]["text"]
+                used_tokens = int(data.get("usageMetadata", {}).get("totalTokenCount", 0))
+                return answer.strip(), used_tokens
+        except Exception as err:
+            raise LLMError(str(err))
+
+
+def estimate_tokens(text: str) -> int:
+    return len(text.split())
+
+
+def build_summary_prompt(instruction: str, text: str) -> str:
+    return (
+        "아래 텍스트를 지시에 맞게 요약하세요. 텍스트에 없는 내용은 추가하지 마세요.\n\n"
+        f"지시: {instruction}\n\n"
+        f"텍스트:\n{text}\n\n"
+        "규칙:\n"
+        "1) 핵심 사실, 수치, 결정 사항을 우선 보존하세요.\n"
+        "2) 답변은 한국어로 작성하세요."
+    )
+
+
+def _local_summary(text: str, max_tokens: int = 80) -> str:
+    tokens = text.split()
+    if len(tokens) <= max_tokens:
+        return " ".join(tokens)
+    return " ".join(tokens[:max_tokens]) + " ..."
+
+
+async def summarize_text(text: str, instruction: str, model: str | None = None) -> tuple[str, int, str]:
+    settings = load_settings()
+    if not settings.gemini_api_key:
+        return _local_summary(text), 0, "local-fallback"
+
+    selected_model = model or settings.chat_model
+    summary, used_tokens = await _generate_content(build_summary_prompt(instruction, text), selected_model)
+    return summary, used_tokens, selected_model
 
 
 def build_citations(context_chunks: list[dict[str, Any]], scores: list[float]) -> list[dict[str, Any]]:
@@ -0,0 +1,105 @@
+from __future__ import annotations
+
+import asyncio
+from collections import defaultdict
+
+from .. import db
+from ..config import load_settings
+from .rag import embed_texts, local_embedding_model, mean_embedding
+
+_running: dict[str, asyncio.Task] = {}
+
+
+def target_embedding_model() -> str:
+    settings = load_settings()
+    return settings.embedding_model if settings.gemini_api_key else local_embedding_model()
+
+
+async def run_reembed_job(project_id: str) -> None:
+    settings = load_settings()
+    job = db.get_reembed_job(project_id)
+    if job is None or job.status != "running":
+        return
+    target = job.target_model
+    cursor = job.last_chunk_id
+    processed = job.processed
+    while True:
+        batch = db.get_chunks_to_reembed(project_id, target, cursor, settings.reembed_batch_size)
+        if not batch:
+            # chunks ingested behind the cursor while the job ran get a second pass
+            if db.count_chunks_to_reembed(project_id, target):
+                cursor = ""
+                continue
+            break
+
+        embedded = await embed_texts([chunk["text"] for chunk in batch], target)
+        if any(model != target for _, model in embedded):
+            db.update_reembed_job(
+                project_id,
+                status="paused",
+                error=f"embedding provider did not return {target}; resume once it is available",
+            )
+            return
+        db.write_shadow_embeddings(project_id, [(chunk["id"], vector, model) for chunk, (vector, model) in zip(batch, embedded)])
+        cursor = batch[-1]["id"]
+        processed += len(batch)
+        db.update_reembed_job(project_id, processed=processed, last_chunk_id=cursor)
+        await asyncio.sleep(settings.reembed_batch_delay_seconds)
+
+    db.promote_shadow_embeddings(project_id, target)
+    refresh_document_centroids(project_id)
+    db.update_reembed_job(project_id, status="completed", error=None)
+
+
+def refresh_document_centroids(project_id: str) -> None:
+    vectors: dict[str, list[list[float]]] = defaultdict(list)
+    for chunk in db.get_chunks_by_project(project_id):
+        vectors[chunk["document_id"]].append(chunk["embedding"])
+    for document_id, document_vectors in vectors.items():
+        db.set_document_centroid(document_id, mean_embedding(document_vectors))
+
+
+def schedule_reembed(project_id: str) -> asyncio.Task:
+    existing = _running.get(project_id)
+    if existing is not None and not existing.done():
+        return existing
+    task = asyncio.create_task(_guarded_run(project_id))
+    _running[project_id] = task
+    return task
+
+
+async def _cancel_running(project_id: str) -> None:
+    task = _running.get(project_id)
+    if task is not None and not task.done():
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+
+
+async def _guarded_run(project_id: str) -> None:
+    try:
+        await run_reembed_job(project_id)
+    except Exception as err:
+        db.update_reembed_job(project_id, status="failed", error=str(err))
+    finally:
+        _running.pop(project_id, None)
+
+
+async def start_reembed(project_id: str) -> db.ReembedJob:
+    job = db.get_reembed_job(project_id)
+    target = target_embedding_model()
+    if job is None or job.status == "completed" or job.target_model != target:
+        # a job still embedding for the old target would keep writing over the reset cursor
+        await _cancel_running(project_id)
+        job = db.start_reembed_job(project_id, target)
+    elif job.status in {"paused", "failed"}:
+        db.update_reembed_job(project_id, status="running", error=None)
+        job = db.get_reembed_job(project_id)
+    schedule_reembed(project_id)
+    return job
+
+
+def resume_reembed_jobs() -> list[str]:
+    resumed = [job.project_id for job in db.list_reembed_jobs("running")]
+    for project_id in resumed:
+        schedule_reembed(project_id)
+    return resumed
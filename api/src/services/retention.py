@@ -0,0 +1,62 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+
+from .. import db
+from ..config import load_settings
+
+logger = logging.getLogger(__name__)
+
+_task: asyncio.Task | None = None
+
+
+def apply_retention(now: datetime | None = None) -> int:
+    settings = load_settings()
+    now = now or datetime.now(timezone.utc)
+    if settings.summary_cache_days > 0:
+        cache_cutoff = (now - timedelta(days=settings.summary_cache_days)).isoformat()
+        while db.prune_summary_cache(cache_cutoff, settings.retention_batch_size):
+            pass
+    if settings.query_retention_days <= 0:
+        return 0
+    cutoff = (now - timedelta(days=settings.query_retention_days)).isoformat()
+    pruned = 0
+    for partition in db.partitions():
+        while True:
+            deleted = db.roll_up_queries(cutoff, settings.retention_batch_size, partition)
+            pruned += deleted
+            if deleted == 0:
+                break
+    return pruned
+
+
+async def _retention_loop(interval_seconds: float) -> None:
+    while True:
+        try:
+            await asyncio.to_thread(apply_retention)
+        except Exception:
+            logger.exception("retention pass failed")
+        await asyncio.sleep(interval_seconds)
+
+
+def start_retention() -> None:
+    global _task
+    settings = load_settings()
+    enabled = settings.query_retention_days > 0 or settings.summary_cache_days > 0
+    if not enabled or (_task is not None and not _task.done()):
+        return
+    _task = asyncio.create_task(_retention_loop(settings.retention_interval_seconds))
+
+
+async def stop_retention() -> None:
+    global _task
+    if _task is None:
+        return
+    _task.cancel()
+    try:
+        await _task
+    except asyncio.CancelledError:
+        pass
+    _task = None
@@ -0,0 +1,513 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import queue
+import shutil
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, replace
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+
+from .. import db
+from ..config import load_settings
+from .projection import Projection
+
+logger = logging.getLogger(__name__)
+
+_MANIFEST_FORMAT = 1
+
+# (database file, project, model, dim, projection version)
+SegmentKey = tuple[str, str, str | None, int, str | None]
+SegmentHit = tuple[float, int, "Segment", int]
+
+
+@dataclass(frozen=True, eq=False)
+class Segment:
+    id: str
+    rowids: np.ndarray
+    chunk_ids: np.ndarray
+    document_ids: np.ndarray
+    doc_codes: np.ndarray
+    matrix: np.ndarray
+    rowid_sum: int
+
+    def __len__(self) -> int:
+        return len(self.rowids)
+
+
+def _segment(rowids, chunk_ids, documents, matrix: np.ndarray, segment_id: str | None = None) -> Segment:
+    document_ids, doc_codes = np.unique(np.asarray(documents, dtype=str), return_inverse=True)
+    rowids = np.asarray(rowids, dtype=np.int64)
+    return Segment(
+        id=segment_id or uuid.uuid4().hex,
+        rowids=rowids,
+        chunk_ids=np.asarray(chunk_ids, dtype=str),
+        document_ids=document_ids,
+        doc_codes=doc_codes.astype(np.int32).reshape(-1),
+        matrix=matrix,
+        rowid_sum=int(rowids.sum()),
+    )
+
+
+def _from_rows(rows: list, width: int, projection: Projection | None) -> Segment:
+    if projection is not None:
+        # rows that raced a refit still carry the previous reduction
+        stale = [i for i, row in enumerate(rows) if row[3] is None]
+        fresh = dict(zip(stale, projection.apply([rows[i][4] for i in stale]))) if stale else {}
+        vectors = [fresh[i] if row[3] is None else np.frombuffer(row[3], dtype=np.float32) for i, row in enumerate(rows)]
+    else:
+        vectors = [row[4] for row in rows]
+    matrix = np.array(vectors, dtype=np.float32).reshape(len(rows), width)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return _segment([row[0] for row in rows], [row[1] for row in rows], [row[2] for row in rows], matrix / norms)
+
+
+def _merge(segments: list[Segment], live: list[np.ndarray | None]) -> Segment:
+    keep = [slice(None) if mask is None else mask for mask in live]
+    rowids = np.concatenate([segment.rowids[rows] for segment, rows in zip(segments, keep)])
+    order = np.argsort(rowids, kind="stable")
+    return _segment(
+        rowids[order],
+        np.concatenate([segment.chunk_ids[rows] for segment, rows in zip(segments, keep)])[order],
+        np.concatenate([segment.document_ids[segment.doc_codes][rows] for segment, rows in zip(segments, keep)])[order],
+        np.concatenate([np.asarray(segment.matrix[rows]) for segment, rows in zip(segments, keep)])[order],
+    )
+
+
+def _search_segment(
+    segment: Segment,
+    live: np.ndarray | None,
+    query: np.ndarray,
+    document_ids: list[str] | None,
+    k: int,
+) -> list[SegmentHit]:
+    mask = live
+    if document_ids is not None:
+        in_documents = np.isin(segment.doc_codes, np.flatnonzero(np.isin(segment.document_ids, document_ids)))
+        mask = in_documents if mask is None else mask & in_documents
+    rows = np.arange(len(segment)) if mask is None else np.flatnonzero(mask)
+    if not len(rows):
+        return []
+    scores = (segment.matrix if mask is None else segment.matrix[rows]) @ query
+    top = np.argpartition(-scores, k - 1)[:k] if k < len(rows) else np.arange(len(rows))
+    return [(float(scores[i]), int(segment.rowids[rows[i]]), segment, int(rows[i])) for i in top]
+
+
+@dataclass(frozen=True)
+class SegmentState:
+    version: str
+    watermark: int
+    sealed: tuple[Segment, ...]
+    head: Segment | None
+    tombstones: frozenset[int]
+    # per segment id: a mask of the rows still live, or None when nothing in it was deleted
+    live: dict[str, np.ndarray | None]
+
+    def segments(self) -> tuple[Segment, ...]:
+        return self.sealed if self.head is None else (*self.sealed, self.head)
+
+    def live_totals(self) -> tuple[int, int]:
+        count = total = 0
+        for segment in self.segments():
+            mask = self.live.get(segment.id)
+            if mask is None:
+                count += len(segment)
+                total += segment.rowid_sum
+            else:
+                count += int(mask.sum())
+                total += int(segment.rowids[mask].sum())
+        return count, total
+
+
+_EMPTY = SegmentState(version="", watermark=0, sealed=(), head=None, tombstones=frozenset(), live={})
+
+
+def _live_masks(
+    segments: tuple[Segment, ...],
+    tombstones: frozenset[int],
+    previous: SegmentState | None = None,
+) -> dict[str, np.ndarray | None]:
+    if not tombstones:
+        return {}
+    dead = np.fromiter(tombstones, dtype=np.int64, count=len(tombstones))
+    reuse = previous is not None and previous.tombstones is tombstones
+    masks: dict[str, np.ndarray | None] = {}
+    for segment in segments:
+        if reuse and segment.id in previous.live:
+            masks[segment.id] = previous.live[segment.id]
+            continue
+        deleted = np.isin(segment.rowids, dead)
+        masks[segment.id] = ~deleted if deleted.any() else None
+    return masks
+
+
+def segment_dir() -> Path:
+    configured = load_settings().segment_dir
+    if configured:
+        return Path(configured).expanduser()
+    return Path(db.get_db_path()).parent / "segments"
+
+
+def _manifest_key(key: SegmentKey) -> list:
+    return [key[1], key[2], key[3], key[4]]
+
+
+class SegmentSet:
+    def __init__(self, key: SegmentKey, projection: Projection | None = None):
+        self.key = key
+        _, self.project_id, self.embedding_model, self.embedding_dim, _ = key
+        self.projection = projection
+        self.width = projection.target_dim if projection is not None else self.embedding_dim
+        digest = hashlib.sha256(json.dumps(_manifest_key(key)).encode("utf-8")).hexdigest()
+        self.directory = segment_dir() / digest[:32]
+        self.state: SegmentState | None = None
+        self.source = "rebuilt"
+        self.merging = False
+        self.stats = {"seals": 0, "merges": 0, "rebuilds": 0}
+        self._lock = threading.Lock()
+
+    # readers take whatever state is published; only writers serialise
+    def current(self) -> SegmentState:
+        state = self.state
+        if state is not None and state.version == db.get_index_version(self.project_id):
+            return state
+        # another thread is already folding new rows in: keep serving the last published state
+        if not self._lock.acquire(blocking=state is None):
+            return state
+        try:
+            return self._refresh()
+        finally:
+            self._lock.release()
+
+    def refresh(self) -> SegmentState:
+        with self._lock:
+            return self._refresh()
+
+    def delete(self, rowids: list[int]) -> None:
+        with self._lock:
+            state = self.state
+            if state is None:
+                return
+            if rowids:
+                tombstones = state.tombstones | frozenset(rowids)
+                self._publish(replace(state, tombstones=tombstones, live=_live_masks(state.segments(), tombstones)))
+            self._refresh()
+
+    def search(self, query_vec: list[float], document_ids: list[str] | None, k: int) -> list[SegmentHit]:
+        state = self.current()
+        segments = state.segments()
+        if k <= 0 or not segments:
+            return []
+        query = np.asarray(query_vec, dtype=np.float32)
+        norm = float(np.linalg.norm(query))
+        query = query / norm if norm else np.zeros_like(query)
+        jobs = [(segment, state.live.get(segment.id), query, document_ids, k) for segment in segments]
+        pool = _search_pool()
+        if pool is not None and len(jobs) > 1:
+            # numpy releases the GIL in the matrix product, so segments really run side by side
+            partials = list(pool.map(lambda job: _search_segment(*job), jobs))
+        else:
+            partials = [_search_segment(*job) for job in jobs]
+        hits = [hit for partial in partials for hit in partial]
+        hits.sort(key=lambda hit: (-hit[0], hit[1]))
+        return hits[:k]
+
+    def summary(self) -> dict[str, Any]:
+        state = self.state or _EMPTY
+        live, _ = state.live_totals()
+        return {
+            "segments": len(state.sealed),
+            "head_rows": len(state.head) if state.head is not None else 0,
+            "sealed_rows": sum(len(segment) for segment in state.sealed),
+            "live_rows": live,
+            "tombstones": len(state.tombstones),
+            **self.stats,
+        }
+
+    def _refresh(self) -> SegmentState:
+        previous = self.state
+        state = previous
+        if state is None:
+            state = self._load_manifest()
+            self.source = "rebuilt" if state is None else "snapshot"
+        state, consistent = self._catch_up(state or _EMPTY)
+        if not consistent:
+            # rows changed under already-indexed rowids (a delete that bypassed the
+            # store, an in-place re-embed): start again from the table
+            self.stats["rebuilds"] += 1
+            self.source = "rebuilt"
+            state, _ = self._catch_up(_EMPTY)
+        self._publish(state)
+        settings = load_settings()
+        if _pick_merge(state, max(1, settings.segment_max_count), max(2, settings.segment_merge_factor)):
+            _schedule_merge(self)
+        return state
+
+    def _catch_up(self, state: SegmentState) -> tuple[SegmentState, bool]:
+        version, count, rowid_sum, rows = db.get_vector_rows_since(
+            self.project_id,
+            self.embedding_model,
+            self.embedding_dim,
+            state.watermark,
+            self.projection.version if self.projection is not None else None,
+        )
+        if rows:
+            added = _from_rows(rows, self.width, self.projection)
+            head = added if state.head is None else _merge([state.head, added], [state.live.get(state.head.id), None])
+            sealed = state.sealed
+            if len(head) >= max(1, load_settings().segment_head_rows):
+                sealed = (*sealed, self._seal(head))
+                head = None
+                self.stats["seals"] += 1
+            segments = sealed if head is None else (*sealed, head)
+            state = replace(
+                state,
+                watermark=int(rows[-1][0]),
+                sealed=sealed,
+                head=head,
+                live=_live_masks(segments, state.tombstones, state),
+            )
+        state = replace(state, version=version)
+        return state, state.live_totals() == (count, rowid_sum)
+
+    def _publish(self, state: SegmentState) -> None:
+        previous = self.state
+        self.state = state
+        if previous is not None and previous.sealed == state.sealed and previous.tombstones is state.tombstones:
+            return
+        if state.sealed or (previous is not None and previous.sealed):
+            self._write_manifest(state)
+        kept = {segment.id for segment in state.sealed}
+        for segment in previous.sealed if previous is not None else ():
+            if segment.id not in kept:
+                # readers still holding the old state keep their mapping; the file just loses its name
+                self._remove_segment(segment.id)
+
+    def merge(self) -> bool:
+        settings = load_settings()
+        state = self.state
+        if state is None:
+            return False
+        picks = _pick_merge(state, max(1, settings.segment_max_count), max(2, settings.segment_merge_factor))
+        if not picks:
+            return False
+        merged = _merge(picks, [state.live.get(segment.id) for segment in picks])
+        merged = self._seal(merged) if len(merged) else None
+        with self._lock:
+            current = self.state
+            picked = {segment.id for segment in picks}
+            if current is None or not picked <= {segment.id for segment in current.sealed}:
+                # a rebuild replaced the inputs while this merge ran
+                if merged is not None:
+                    self._remove_segment(merged.id)
+                return False
+            sealed = tuple(segment for segment in current.sealed if segment.id not in picked)
+            if merged is not None:
+                sealed = tuple(sorted((*sealed, merged), key=lambda segment: int(segment.rowids[0])))
+            segments = sealed if current.head is None else (*sealed, current.head)
+            tombstones = _prune_tombstones(current.tombstones, segments)
+            live = _live_masks(segments, tombstones, current if tombstones is current.tombstones else None)
+            self._publish(replace(current, sealed=sealed, tombstones=tombstones, live=live))
+            self.stats["merges"] += 1
+        return True
+
+    def _seal(self, segment: Segment) -> Segment:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        matrix_path = self.directory / f"{segment.id}.npy"
+        partial = matrix_path.with_suffix(".partial")
+        with open(partial, "wb") as handle:
+            np.save(handle, np.ascontiguousarray(segment.matrix, dtype=np.float32))
+        os.replace(partial, matrix_path)
+        rows_path = self.directory / f"{segment.id}.rows.npz"
+        partial = rows_path.with_suffix(".partial")
+        with open(partial, "wb") as handle:
+            np.savez(
+                handle,
+                rowids=segment.rowids,
+                chunk_ids=segment.chunk_ids,
+                document_ids=segment.document_ids,
+                doc_codes=segment.doc_codes,
+            )
+        os.replace(partial, rows_path)
+        # sealed segments are served from the page cache rather than the heap
+        return self._load_segment(segment.id)
+
+    def _load_segment(self, segment_id: str) -> Segment:
+        with np.load(self.directory / f"{segment_id}.rows.npz", allow_pickle=False) as data:
+            rowids = data["rowids"]
+            return Segment(
+                id=segment_id,
+                rowids=rowids,
+                chunk_ids=data["chunk_ids"],
+                document_ids=data["document_ids"],
+                doc_codes=data["doc_codes"],
+                matrix=np.load(self.directory / f"{segment_id}.npy", mmap_mode="r"),
+                rowid_sum=int(rowids.sum()),
+            )
+
+    def _remove_segment(self, segment_id: str) -> None:
+        for name in (f"{segment_id}.npy", f"{segment_id}.rows.npz"):
+            try:
+                (self.directory / name).unlink()
+            except OSError:
+                pass
+
+    def _write_manifest(self, state: SegmentState) -> None:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        manifest = {
+            "format": _MANIFEST_FORMAT,
+            "key": _manifest_key(self.key),
+            # the head is not on disk: a restart re-reads everything past the last sealed row
+            "watermark": max((int(segment.rowids[-1]) for segment in state.sealed if len(segment)), default=0),
+            "segments": [segment.id for segment in state.sealed],
+            "tombstones": sorted(state.tombstones),
+        }
+        path = self.directory / "manifest.json"
+        partial = path.with_suffix(".partial")
+        partial.write_text(json.dumps(manifest), encoding="utf-8")
+        os.replace(partial, path)
+
+    def _load_manifest(self) -> SegmentState | None:
+        try:
+            manifest = json.loads((self.directory / "manifest.json").read_text(encoding="utf-8"))
+            if manifest.get("format") != _MANIFEST_FORMAT or manifest.get("key") != _manifest_key(self.key):
+                return None
+            sealed = tuple(self._load_segment(segment_id) for segment_id in manifest["segments"])
+        except (OSError, ValueError, KeyError):
+            return None
+        if any(segment.matrix.shape[1:] != (self.width,) for segment in sealed):
+            return None
+        tombstones = frozenset(manifest["tombstones"])
+        return replace(
+            _EMPTY,
+            watermark=manifest["watermark"],
+            sealed=sealed,
+            tombstones=tombstones,
+            live=_live_masks(sealed, tombstones),
+        )
+
+
+def _pick_merge(state: SegmentState, max_count: int, factor: int) -> list[Segment]:
+    # a segment that lost most of its rows is rewritten on its own
+    for segment in state.sealed:
+        mask = state.live.get(segment.id)
+        if mask is not None and int(mask.sum()) * 2 < len(segment):
+            return [segment]
+    if len(state.sealed) <= max_count:
+        return []
+    # size-tiered: the smallest segments merge first, so large ones are rarely rewritten
+    return sorted(state.sealed, key=len)[:factor]
+
+
+def _prune_tombstones(tombstones: frozenset[int], segments: tuple[Segment, ...]) -> frozenset[int]:
+    if not tombstones:
+        return tombstones
+    dead = np.fromiter(tombstones, dtype=np.int64, count=len(tombstones))
+    present = np.zeros(len(dead), dtype=bool)
+    for segment in segments:
+        present |= np.isin(dead, segment.rowids)
+    if present.all():
+        return tombstones
+    return frozenset(int(rowid) for rowid in dead[present])
+
+
+_sets: dict[SegmentKey, SegmentSet] = {}
+_sets_lock = threading.Lock()
+_pool: ThreadPoolExecutor | None = None
+_merge_queue: queue.Queue[SegmentSet] = queue.Queue()
+_merger: threading.Thread | None = None
+
+
+def _search_pool() -> ThreadPoolExecutor | None:
+    global _pool
+    workers = load_settings().segment_search_workers
+    if workers <= 1:
+        return None
+    with _sets_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="segment-search")
+        return _pool
+
+
+def _merge_worker() -> None:
+    while True:
+        segment_set = _merge_queue.get()
+        try:
+            while segment_set.merge():
+                pass
+        except Exception:
+            logger.exception("segment merge failed for project %s", segment_set.project_id)
+        finally:
+            segment_set.merging = False
+            _merge_queue.task_done()
+
+
+def _schedule_merge(segment_set: SegmentSet) -> None:
+    global _merger
+    if segment_set.merging:
+        return
+    segment_set.merging = True
+    with _sets_lock:
+        if _merger is None:
+            _merger = threading.Thread(target=_merge_worker, name="segment-merger", daemon=True)
+            _merger.start()
+    _merge_queue.put(segment_set)
+
+
+def wait_for_merges() -> None:
+    _merge_queue.join()
+
+
+def get_segment_set(
+    project_id: str,
+    embedding_model: str | None,
+    embedding_dim: int,
+    projection: Projection | None = None,
+) -> SegmentSet:
+    db_path = db.get_db_path()
+    key = (db_path, project_id, embedding_model, embedding_dim, projection.version if projection is not None else None)
+    with _sets_lock:
+        segment_set = _sets.get(key)
+        if segment_set is not None:
+            return segment_set
+        segment_set = _sets[key] = SegmentSet(key, projection)
+        # a refit retires the previous reduction for good
+        retired = [
+            other
+            for other_key, other in _sets.items()
+            if other_key[:4] == key[:4] and other_key[4] not in (None, key[4])
+        ]
+        for other in retired:
+            del _sets[other.key]
+    for other in retired:
+        shutil.rmtree(other.directory, ignore_errors=True)
+    return segment_set
+
+
+def project_sets(project_id: str) -> list[SegmentSet]:
+    db_path = db.get_db_path()
+    with _sets_lock:
+        return [segment_set for key, segment_set in _sets.items() if key[:2] == (db_path, project_id)]
+
+
+def refresh_project(project_id: str) -> None:
+    for segment_set in project_sets(project_id):
+        segment_set.refresh()
+
+
+def delete_rows(project_id: str, rowids: list[int]) -> None:
+    for segment_set in project_sets(project_id):
+        segment_set.delete(rowids)
+
+
+def clear_segments() -> None:
+    with _sets_lock:
+        _sets.clear()
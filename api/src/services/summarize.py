@@ -0,0 +1,108 @@
+from __future__ import annotations
+
+import asyncio
+import hashlib
+from itertools import groupby
+from typing import Any
+
+from .. import db
+from ..config import load_settings
+from .rag import estimate_tokens, summarize_text
+
+DEFAULT_SUMMARY_INSTRUCTION = "문서의 핵심 내용을 5줄로 요약해줘"
+
+
+def pack_batches(texts: list[str], token_budget: int, min_items: int = 1) -> list[list[str]]:
+    # min_items > 1 guarantees every reduce round shrinks the input, even when
+    # individual summaries are close to the budget.
+    batches: list[list[str]] = []
+    current: list[str] = []
+    current_tokens = 0
+    for text in texts:
+        tokens = estimate_tokens(text)
+        if current and current_tokens + tokens > token_budget and len(current) >= min_items:
+            batches.append(current)
+            current, current_tokens = [], 0
+        current.append(text)
+        current_tokens += tokens
+    if current:
+        batches.append(current)
+    return batches
+
+
+def summary_cache_key(texts: list[str], instruction: str, model: str) -> str:
+    # content-addressed: identical chunks share a summary whichever document they came from
+    digest = hashlib.sha256()
+    for part in (model, instruction, *texts):
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\x00")
+    return digest.hexdigest()
+
+
+class _Summarizer:
+    def __init__(self, instruction: str, token_budget: int, concurrency: int):
+        self.instruction = instruction
+        self.token_budget = token_budget
+        self.semaphore = asyncio.Semaphore(max(1, concurrency))
+        self.tokens_used = 0
+        self.model = "local-fallback"
+
+    async def summarize(self, texts: list[str]) -> str:
+        async with self.semaphore:
+            summary, used, model = await summarize_text("\n\n".join(texts), self.instruction)
+        self.tokens_used += used
+        self.model = model
+        return summary
+
+    async def reduce(self, texts: list[str]) -> str:
+        while True:
+            batches = pack_batches(texts, self.token_budget, min_items=2)
+            if len(batches) == 1:
+                return await self.summarize(batches[0])
+            texts = list(await asyncio.gather(*(self.summarize(batch) for batch in batches)))
+
+    async def summarize_document(self, texts: list[str]) -> str:
+        key = summary_cache_key(texts, self.instruction, _model_label())
+        cached = db.get_cached_summary(key)
+        if cached is not None:
+            return cached
+        batches = pack_batches(texts, self.token_budget)
+        partials = list(await asyncio.gather(*(self.summarize(batch) for batch in batches)))
+        summary = partials[0] if len(partials) == 1 else await self.reduce(partials)
+        db.put_cached_summary(key, summary, self.model)
+        return summary
+
+
+def _model_label() -> str:
+    settings = load_settings()
+    return settings.chat_model if settings.gemini_api_key else "local-fallback"
+
+
+async def summarize_documents(
+    document_ids: list[str], instruction: str, concurrency: int | None = None
+) -> dict[str, Any]:
+    settings = load_settings()
+    summarizer = _Summarizer(instruction, settings.summary_batch_tokens, concurrency or settings.summary_concurrency)
+    precomputed: dict[str, str] = {}
+    if instruction == DEFAULT_SUMMARY_INSTRUCTION:
+        precomputed = db.get_document_summaries(document_ids)
+    pending = [doc_id for doc_id in document_ids if doc_id not in precomputed]
+    rows = db.get_chunk_texts_for_documents(pending)
+    grouped = {
+        document_id: [row["text"] for row in items]
+        for document_id, items in groupby(rows, key=lambda row: row["document_id"])
+    }
+    ordered = [
+        doc_id for doc_id in dict.fromkeys(document_ids) if doc_id in grouped or doc_id in precomputed
+    ]
+    if not ordered:
+        return {"summary": "", "documents": [], "tokens_used": 0}
+
+    async def _document_summary(doc_id: str) -> str:
+        if doc_id in precomputed:
+            return precomputed[doc_id]
+        return await summarizer.summarize_document(grouped[doc_id])
+
+    partials = await asyncio.gather(*(_document_summary(doc_id) for doc_id in ordered))
+    summary = partials[0] if len(partials) == 1 else await summarizer.reduce(list(partials))
+    return {"summary": summary, "documents": ordered, "tokens_used": summarizer.tokens_used}
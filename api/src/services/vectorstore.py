@@ -0,0 +1,240 @@
+from __future__ import annotations
+
+from abc import ABC, abstractmethod
+from dataclasses import dataclass, field
+from typing import Any, Callable
+
+import numpy as np
+
+from .. import db
+from ..config import load_settings
+from . import index, segments
+from .projection import Projection, attach_reduced, projected_rows
+from .rag import similarity
+
+
+@dataclass
+class VectorRecord:
+    document_id: str
+    chunk_index: int
+    text: str
+    embedding: list[float]
+    metadata: dict[str, Any] = field(default_factory=dict)
+    span: tuple[int, int] | None = None
+    embedding_model: str | None = None
+    chunk_id: str | None = None
+    duplicate_of: str | None = None
+
+
+@dataclass
+class VectorHit:
+    chunk_id: str
+    document_id: str
+    score: float
+    embedding: np.ndarray
+
+
+class VectorStore(ABC):
+    name = "base"
+
+    # the chunks table stays the system of record; a backend only decides how
+    # it is searched, so add/delete are shared and always write through
+    def add(self, project_id: str, records: list[VectorRecord]) -> list[str]:
+        chunks = [
+            {
+                "id": record.chunk_id,
+                "document_id": record.document_id,
+                "chunk_index": record.chunk_index,
+                "text": record.text,
+                "embedding": record.embedding,
+                "metadata": record.metadata,
+                "span": record.span,
+                "embedding_model": record.embedding_model,
+                "duplicate_of": record.duplicate_of,
+            }
+            for record in records
+        ]
+        # reduced vectors are computed once here, not on every index rebuild
+        attach_reduced(project_id, chunks)
+        return db.create_chunks(project_id, chunks)
+
+    def delete(self, project_id: str, chunk_ids: list[str] | None = None, document_id: str | None = None) -> int:
+        deleted = db.delete_chunks(project_id, chunk_ids or [])
+        if document_id is not None:
+            deleted += db.delete_chunks_for_document(document_id)
+        return deleted
+
+    @abstractmethod
+    def search(
+        self,
+        project_id: str,
+        query_vec: list[float],
+        k: int,
+        embedding_model: str | None = None,
+        document_ids: list[str] | None = None,
+        projection: Projection | None = None,
+    ) -> list[VectorHit]:
+        # with a projection, query_vec is already reduced and the project's
+        # reduced vectors are searched instead of the full-dimension ones
+        raise NotImplementedError
+
+    def warm(
+        self,
+        project_id: str,
+        embedding_model: str | None,
+        embedding_dim: int,
+        projection: Projection | None = None,
+    ) -> str | None:
+        # loads whatever the backend keeps resident; returns "snapshot" or "rebuilt"
+        return None
+
+    def stats(self, project_id: str) -> dict[str, Any]:
+        return {"backend": self.name, "vectors": sum(db.get_embedding_models(project_id).values())}
+
+
+class SQLiteVectorStore(VectorStore):
+    name = "sqlite"
+
+    def search(
+        self,
+        project_id: str,
+        query_vec: list[float],
+        k: int,
+        embedding_model: str | None = None,
+        document_ids: list[str] | None = None,
+        projection: Projection | None = None,
+    ) -> list[VectorHit]:
+        if k <= 0:
+            return []
+        allowed = set(document_ids) if document_ids is not None else None
+        if projection is not None:
+            _, projected = projected_rows(projection)
+            rows = [(chunk_id, document_id, vector.tolist()) for chunk_id, document_id, vector in projected]
+        else:
+            _, rows = db.get_chunk_vectors(project_id, embedding_model, len(query_vec))
+        scored = [
+            (similarity(query_vec, vector), position, chunk_id, document_id, vector)
+            for position, (chunk_id, document_id, vector) in enumerate(rows)
+            if allowed is None or document_id in allowed
+        ]
+        scored.sort(key=lambda item: (-item[0], item[1]))
+        return [
+            VectorHit(chunk_id, document_id, score, np.asarray(vector, dtype=np.float32))
+            for score, _, chunk_id, document_id, vector in scored[:k]
+        ]
+
+
+class MemoryIndexStore(VectorStore):
+    name = "memory"
+
+    def search(
+        self,
+        project_id: str,
+        query_vec: list[float],
+        k: int,
+        embedding_model: str | None = None,
+        document_ids: list[str] | None = None,
+        projection: Projection | None = None,
+    ) -> list[VectorHit]:
+        embedding_dim = projection.source_dim if projection is not None else len(query_vec)
+        project_index = index.get_project_index(project_id, embedding_model, embedding_dim, projection)
+        return [
+            VectorHit(
+                str(project_index.chunk_ids[row]),
+                str(project_index.document_ids[project_index.doc_codes[row]]),
+                score,
+                project_index.matrix[row],
+            )
+            for score, row in project_index.search(query_vec, document_ids, k)
+        ]
+
+    def warm(
+        self,
+        project_id: str,
+        embedding_model: str | None,
+        embedding_dim: int,
+        projection: Projection | None = None,
+    ) -> str | None:
+        return index.load_project_index(project_id, embedding_model, embedding_dim, persist=True, projection=projection)[1]
+
+    def stats(self, project_id: str) -> dict[str, Any]:
+        resident = [item for item in index.index_cache().values() if item.project_id == project_id]
+        return {
+            **super().stats(project_id),
+            "resident_indexes": len(resident),
+            "resident_bytes": sum(index.index_nbytes(item) for item in resident),
+        }
+
+
+class SegmentedIndexStore(VectorStore):
+    name = "segmented"
+
+    # writes land in a small in-memory head that is sealed into immutable
+    # on-disk segments; searches never wait for ingest or a rebuild
+    def add(self, project_id: str, records: list[VectorRecord]) -> list[str]:
+        chunk_ids = super().add(project_id, records)
+        segments.refresh_project(project_id)
+        return chunk_ids
+
+    def delete(self, project_id: str, chunk_ids: list[str] | None = None, document_id: str | None = None) -> int:
+        rowids = db.get_chunk_rowids(project_id, chunk_ids or [], document_id)
+        deleted = super().delete(project_id, chunk_ids, document_id)
+        segments.delete_rows(project_id, rowids)
+        return deleted
+
+    def search(
+        self,
+        project_id: str,
+        query_vec: list[float],
+        k: int,
+        embedding_model: str | None = None,
+        document_ids: list[str] | None = None,
+        projection: Projection | None = None,
+    ) -> list[VectorHit]:
+        embedding_dim = projection.source_dim if projection is not None else len(query_vec)
+        segment_set = segments.get_segment_set(project_id, embedding_model, embedding_dim, projection)
+        return [
+            VectorHit(
+                str(segment.chunk_ids[row]),
+                str(segment.document_ids[segment.doc_codes[row]]),
+                score,
+                np.asarray(segment.matrix[row]),
+            )
+            for score, _, segment, row in segment_set.search(query_vec, document_ids, k)
+        ]
+
+    def warm(
+        self,
+        project_id: str,
+        embedding_model: str | None,
+        embedding_dim: int,
+        projection: Projection | None = None,
+    ) -> str | None:
+        segment_set = segments.get_segment_set(project_id, embedding_model, embedding_dim, projection)
+        segment_set.current()
+        return segment_set.source
+
+    def stats(self, project_id: str) -> dict[str, Any]:
+        resident = [segment_set.summary() for segment_set in segments.project_sets(project_id)]
+        return {
+            **super().stats(project_id),
+            "segments": sum(item["segments"] for item in resident),
+            "head_rows": sum(item["head_rows"] for item in resident),
+            "tombstones": sum(item["tombstones"] for item in resident),
+            "merges": sum(item["merges"] for item in resident),
+        }
+
+
+VECTOR_STORES: dict[str, Callable[[], VectorStore]] = {
+    SQLiteVectorStore.name: SQLiteVectorStore,
+    MemoryIndexStore.name: MemoryIndexStore,
+    SegmentedIndexStore.name: SegmentedIndexStore,
+}
+
+
+def get_vector_store(name: str | None = None) -> VectorStore:
+    name = name or load_settings().vector_store
+    factory = VECTOR_STORES.get(name)
+    if factory is None:
+        raise ValueError(f"unknown vector store: {name}")
+    return factory()
@@ -0,0 +1,79 @@
+from __future__ import annotations
+
+import asyncio
+from datetime import datetime, timezone
+from typing import Any
+
+from .. import db
+from ..config import load_settings
+from .index import save_snapshots
+from .projection import get_projection
+from .query import active_embedding_model
+from .reembed import target_embedding_model
+from .vectorstore import get_vector_store
+
+_state: dict[str, Any] = {
+    "status": "starting",
+    "projects": 0,
+    "warmed": 0,
+    "from_snapshot": 0,
+    "rebuilt": 0,
+    "failed": 0,
+    "started_at": None,
+    "finished_at": None,
+}
+_task: asyncio.Task | None = None
+
+
+def warm_project(project_id: str) -> str | None:
+    model = active_embedding_model(project_id) or target_embedding_model()
+    dim = db.dominant_embedding_dim(project_id, model)
+    if dim is None:
+        return None
+    return get_vector_store().warm(project_id, model, dim, get_projection(project_id, model, dim))
+
+
+async def _warm_up(projects: list[str]) -> None:
+    for project_id in projects:
+        try:
+            source = await asyncio.to_thread(warm_project, project_id)
+        except Exception:
+            _state["failed"] += 1
+            continue
+        _state["warmed"] += 1
+        if source == "snapshot":
+            _state["from_snapshot"] += 1
+        elif source == "rebuilt":
+            _state["rebuilt"] += 1
+    _state["status"] = "ready"
+    _state["finished_at"] = datetime.now(timezone.utc).isoformat()
+
+
+def start_warmup() -> None:
+    global _task
+    settings = load_settings()
+    now = datetime.now(timezone.utc).isoformat()
+    _state.update(projects=0, warmed=0, from_snapshot=0, rebuilt=0, failed=0, started_at=now, finished_at=None)
+    if not settings.index_warmup:
+        _state.update(status="ready", finished_at=now)
+        return
+    projects = db.get_busiest_projects(settings.warmup_projects)
+    _state.update(status="warming", projects=len(projects))
+    _task = asyncio.create_task(_warm_up(projects))
+
+
+async def stop_warmup() -> None:
+    global _task
+    if _task is not None:
+        _task.cancel()
+        try:
+            await _task
+        except asyncio.CancelledError:
+            pass
+        _task = None
+    # the next start loads these instead of re-reading every chunk
+    await asyncio.to_thread(save_snapshots)
+
+
+def readiness() -> dict[str, Any]:
+    return {**_state, "ready": _state["status"] == "ready"}
@@ -0,0 +1,38 @@
+from __future__ import annotations
+
+import sys
+from pathlib import Path
+
+import pytest
+
+API_ROOT = Path(__file__).resolve().parents[1]
+sys.path.append(str(API_ROOT))
+
+from src import db
+from src.services import index, pipeline, segments
+
+
+@pytest.fixture
+def setup_db(request, tmp_path, monkeypatch):
+    # a module's DB_ENV holds its defaults; setup_db(shard_max_open=1) overrides one
+    # as KNOWLEDGE_COPILOT_SHARD_MAX_OPEN=1, and None unsets it. Calling it again
+    # re-initialises the same database with the new settings.
+    defaults = getattr(request.module, "DB_ENV", {})
+
+    def setup(**overrides: str | int | None) -> Path:
+        path = tmp_path / "kc.db"
+        monkeypatch.setenv("KNOWLEDGE_COPILOT_DATABASE_PATH", str(path))
+        monkeypatch.delenv("GEMINI_API_KEY", raising=False)
+        for name, value in {**defaults, **overrides}.items():
+            key = f"KNOWLEDGE_COPILOT_{name.upper()}"
+            if value is None:
+                monkeypatch.delenv(key, raising=False)
+            else:
+                monkeypatch.setenv(key, str(value))
+        db.init_db()
+        index.clear_indexes()
+        segments.clear_segments()
+        pipeline.reset_pipeline_stats()
+        return path
+
+    return setup
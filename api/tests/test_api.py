@@ -12,8 +12,8 @@ API_ROOT = Path(__file__).resolve().parents[1]
 sys.path.append(str(API_ROOT))
 
 
-def test_health_and_document_query_cycle(tmp_path, monkeypatch):
-    monkeypatch.setenv("KNOWLEDGE_COPILOT_DATABASE_PATH", str(tmp_path / "knowledge_copilot.db"))
+def test_health_and_document_query_cycle(setup_db):
+    setup_db()
 
     import src.main as main
 
@@ -47,8 +47,8 @@ def test_health_and_document_query_cycle(tmp_path, monkeypatch):
         assert "id" in query_json
 
 
-def test_eval_endpoint(tmp_path, monkeypatch):
-    monkeypatch.setenv("KNOWLEDGE_COPILOT_DATABASE_PATH", str(tmp_path / "knowledge_copilot.db"))
+def test_eval_endpoint(setup_db):
+    setup_db()
 
     import src.main as main
 
@@ -75,3 +75,96 @@ def test_eval_endpoint(tmp_path, monkeypatch):
         # feedback API accepts any query id and persists; returns true in this PoC build.
         assert res.status_code == 200
         assert res.json()["ok"] is True
+
+
+def test_rechunk_endpoint(setup_db):
+    setup_db()
+
+    import src.main as main
+
+    importlib.reload(main)
+
+    with TestClient(main.app) as client:
+        text = " ".join(f"단어{i}" for i in range(300))
+        doc_id = client.post("/api/v1/documents", data={"project_id": "default", "source_text": text}).json()["id"]
+
+        res = client.post(f"/api/v1/documents/{doc_id}/rechunk", json={"max_tokens": 100, "overlap": 0})
+        assert res.status_code == 200
+        assert res.json()["chunk_count"] == 3
+
+        missing = client.post("/api/v1/documents/unknown/rechunk", json={})
+        assert missing.status_code == 404
+
+
+def test_document_detail_projection_and_pagination(setup_db, monkeypatch):
+    setup_db()
+
+    import src.main as main
+
+    importlib.reload(main)
+
+    with TestClient(main.app) as client:
+        text = " ".join(f"단어{i}" for i in range(1000))
+        doc_id = client.post("/api/v1/documents", data={"project_id": "default", "source_text": text}).json()["id"]
+
+        first = client.get(f"/api/v1/documents/{doc_id}?limit=2").json()
+        assert len(first["chunks"]) == 2
+        assert "embedding" not in first["chunks"][0]
+        assert first["chunks"][0]["text"].startswith("단어0 ")
+        assert first["next_cursor"] == 1
+
+        rest = client.get(f"/api/v1/documents/{doc_id}?cursor={first['next_cursor']}&limit=100&fields=id").json()
+        assert set(rest["chunks"][0]) == {"id", "chunk_index"}
+        assert rest["next_cursor"] is None
+        assert len(first["chunks"]) + len(rest["chunks"]) == first["document"]["chunk_count"]
+
+        assert client.get(f"/api/v1/documents/{doc_id}?fields=bogus").status_code == 400
+
+        export = client.get(f"/api/v1/documents/{doc_id}/export")
+        assert export.status_code == 200
+        exported = export.json()
+        assert len(exported["chunks"]) == first["document"]["chunk_count"]
+        assert len(exported["chunks"][0]["embedding"]) == 256
+
+        decompress = main.db._decompress_text
+        calls = []
+        monkeypatch.setattr(main, "_EXPORT_PAGE_SIZE", 2)
+        monkeypatch.setattr(main.db, "_decompress_text", lambda raw: calls.append(raw) or decompress(raw))
+        paged = client.get(f"/api/v1/documents/{doc_id}/export").json()
+        assert paged["chunks"] == exported["chunks"]
+        assert len(calls) == 1
+
+
+def test_document_list_keyset_pagination(setup_db):
+    setup_db()
+
+    import src.main as main
+
+    importlib.reload(main)
+
+    with TestClient(main.app) as client:
+        created = [
+            client.post("/api/v1/documents", data={"project_id": "paged", "source_text": f"문서 {i}"}).json()["id"]
+            for i in range(5)
+        ]
+
+        seen = []
+        cursor = None
+        while True:
+            url = "/api/v1/documents?project_id=paged&limit=2" + (f"&cursor={cursor}" if cursor else "")
+            res = client.get(url)
+            assert res.status_code == 200
+            assert res.headers["X-Total-Count"] == "5"
+            seen.extend(item["id"] for item in res.json())
+            cursor = res.headers.get("X-Next-Cursor")
+            if cursor is None:
+                break
+
+        assert sorted(seen) == sorted(created)
+        assert len(seen) == len(set(seen))
+        assert client.get("/api/v1/documents?cursor=not-a-cursor").status_code == 400
+
+        cursor = client.get("/api/v1/documents?project_id=paged&limit=2").headers["X-Next-Cursor"]
+        mixed = client.get(f"/api/v1/documents?project_id=paged&limit=2&offset=2&cursor={cursor}")
+        assert mixed.status_code == 400
+        assert mixed.json()["detail"] == "cursor and offset cannot be combined"
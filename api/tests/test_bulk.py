@@ -0,0 +1,145 @@
+from __future__ import annotations
+
+import asyncio
+import importlib
+import io
+import sys
+import tarfile
+import zipfile
+from pathlib import Path
+
+import pytest
+from fastapi.testclient import TestClient
+
+API_ROOT = Path(__file__).resolve().parents[1]
+sys.path.append(str(API_ROOT))
+
+from src import db
+from src.services import bulk, ingest
+from src.services.rag import local_embedding_model
+
+
+DB_ENV = {"bulk_workers": 1}
+
+
+def _zip(files: dict[str, bytes]) -> bytes:
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as archive:
+        for name, data in files.items():
+            archive.writestr(name, data)
+    return buffer.getvalue()
+
+
+def _tar(files: dict[str, bytes]) -> bytes:
+    buffer = io.BytesIO()
+    with tarfile.open(fileobj=buffer, mode="w:gz") as archive:
+        for name, data in files.items():
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            archive.addfile(info, io.BytesIO(data))
+    return buffer.getvalue()
+
+
+class TestUnpack:
+    def test_archives_and_plain_files(self):
+        files = {"docs/a.md": b"# A", "docs/b.txt": b"B", "__MACOSX/docs/._a.md": b"x", "docs/.hidden": b"x"}
+        assert bulk.unpack_upload("export.zip", _zip(files), 1024) == [("docs/a.md", b"# A"), ("docs/b.txt", b"B")]
+        assert bulk.unpack_upload("export.tar.gz", _tar(files), 1024) == [("docs/a.md", b"# A"), ("docs/b.txt", b"B")]
+        assert bulk.unpack_upload("note.txt", b"plain", 1024) == [("note.txt", b"plain")]
+
+    def test_rejects_bad_or_oversized_archives(self):
+        with pytest.raises(ValueError):
+            bulk.unpack_upload("broken.zip", b"not a zip", 1024)
+        with pytest.raises(ValueError):
+            bulk.unpack_upload("big.zip", _zip({"a.txt": b"x" * 2048}), 1024)
+
+
+class TestIngestFiles:
+    def test_matches_single_file_ingest(self, setup_db):
+        setup_db()
+        text = "# Title\n\nkubernetes rollout plan. sourdough bread recipe.\n\n## Notes\n\ntax filing deadline."
+        report = asyncio.run(bulk.ingest_files("p", [("guide.md", text.encode())], max_tokens=5, overlap=0))
+        assert (report["total"], report["ingested"], report["failed"]) == (1, 1, 0)
+
+        single = db.create_document("q", "guide.md", "markdown")
+        asyncio.run(ingest.process_document(single.id, "q", text, source_type="markdown", max_tokens=5, overlap=0))
+
+        bulk_doc = db.get_document(report["files"][0]["document_id"])
+        assert (bulk_doc.status, bulk_doc.source_type, bulk_doc.chunk_count) == ("ready", "markdown", report["chunks"])
+        assert db.get_document_content(bulk_doc.id) == text
+        bulk_chunks = db.get_chunks_for_document(bulk_doc.id)
+        single_chunks = db.get_chunks_for_document(single.id)
+        assert [c["text"] for c in bulk_chunks] == [c["text"] for c in single_chunks]
+        assert [c["embedding"] for c in bulk_chunks] == [c["embedding"] for c in single_chunks]
+        assert {c["embedding_model"] for c in bulk_chunks} == {local_embedding_model()}
+        assert db.get_document_centroids("p")[0][1] == db.get_document_centroids("q")[0][1]
+
+    def test_per_file_status_and_batched_writes(self, setup_db, monkeypatch):
+        setup_db(bulk_write_batch_size=2)
+        calls = []
+        original = db.create_documents_bulk
+        monkeypatch.setattr(db, "create_documents_bulk", lambda p, d: (calls.append(len(d)), original(p, d))[1])
+        files = [("a.txt", b"alpha body"), ("bad.txt", b"\xff\xfe"), ("empty.txt", b"   "), ("b.txt", b"beta body")]
+
+        report = asyncio.run(bulk.ingest_files("p", files))
+        assert [(f["filename"], f["status"]) for f in report["files"]] == [
+            ("a.txt", "ready"),
+            ("bad.txt", "failed"),
+            ("empty.txt", "empty"),
+            ("b.txt", "ready"),
+        ]
+        assert "UTF-8" in report["files"][1]["error"]
+        assert calls == [1, 2]
+        assert (report["ingested"], report["failed"], report["chunks"]) == (3, 1, 2)
+        assert report["files_per_second"] > 0
+        assert db.metric_snapshot("p")["documents"] == 3
+
+    def test_remote_embeddings_are_batched(self, setup_db, monkeypatch):
+        setup_db(bulk_embed_batch_size=3, dedup_policy="off")
+        monkeypatch.setenv("GEMINI_API_KEY", "test-key")
+        batches = []
+
+        async def fake_batch(texts, model=None):
+            batches.append(len(texts))
+            return [([1.0, 0.0], "remote-model") for _ in texts]
+
+        monkeypatch.setattr(bulk, "embed_batch", fake_batch)
+        files = [(f"{i}.txt", b"one. two. three.") for i in range(2)]
+        report = asyncio.run(bulk.ingest_files("p", files, max_tokens=1, overlap=0))
+        assert batches == [3, 3]
+        assert report["chunks"] == 6
+        assert db.get_embedding_models("p") == {"remote-model": 6}
+
+    def test_process_pool(self, setup_db):
+        setup_db(bulk_workers=2)
+        try:
+            files = [(f"doc-{i}.txt", f"document number {i} body".encode()) for i in range(6)]
+            report = asyncio.run(bulk.ingest_files("p", files))
+        finally:
+            bulk.shutdown_bulk_pool()
+        assert [f["filename"] for f in report["files"]] == [name for name, _ in files]
+        assert report["ingested"] == 6 and report["chunks"] == 6
+
+
+def test_bulk_endpoint(setup_db):
+    setup_db()
+    import src.main as main
+
+    importlib.reload(main)
+    with TestClient(main.app) as client:
+        res = client.post(
+            "/api/v1/documents/bulk",
+            data={"project_id": "bulk"},
+            files=[
+                ("files", ("export.zip", _zip({"a.md": b"# A\n\nalpha", "b.txt": b"beta"}), "application/zip")),
+                ("files", ("c.txt", b"gamma", "text/plain")),
+            ],
+        )
+        assert res.status_code == 200
+        body = res.json()
+        assert [f["filename"] for f in body["files"]] == ["a.md", "b.txt", "c.txt"]
+        assert body["ingested"] == 3
+        assert len(client.get("/api/v1/documents?project_id=bulk").json()) == 3
+
+        bad = client.post("/api/v1/documents/bulk", files=[("files", ("x.zip", b"nope", "application/zip"))])
+        assert bad.status_code == 400
@@ -0,0 +1,62 @@
+from __future__ import annotations
+
+import sys
+from pathlib import Path
+
+API_ROOT = Path(__file__).resolve().parents[1]
+sys.path.append(str(API_ROOT))
+
+from src.services.context import assemble_context, merge_adjacent, merge_overlap, mmr_select
+from src.services.rag import _local_embed, chunk_text
+
+
+def _chunk(doc_id: str, idx: int, text: str) -> dict:
+    return {"id": f"{doc_id}-{idx}", "document_id": doc_id, "chunk_index": idx, "text": text, "embedding": _local_embed(text)}
+
+
+class TestMergeOverlap:
+    def test_removes_shared_tokens(self):
+        assert merge_overlap("a b c d", "c d e f") == "a b c d e f"
+
+    def test_no_overlap_concatenates(self):
+        assert merge_overlap("a b", "c d") == "a b c d"
+
+    def test_reassembles_overlapping_chunks(self):
+        words = [f"w{i}" for i in range(60)]
+        first, second = chunk_text(" ".join(words), max_tokens=40, overlap=10)[:2]
+        assert merge_overlap(first, second).split() == words[:70]
+
+
+class TestMergeAdjacent:
+    def test_merges_consecutive_chunks_of_same_document(self):
+        chunks = [_chunk("d1", 1, "c d e"), _chunk("d1", 0, "a b c"), _chunk("d2", 1, "x y")]
+        merged = merge_adjacent(chunks, [0.5, 0.9, 0.4])
+        assert len(merged) == 2
+        top, score = merged[0]
+        assert top["text"] == "a b c d e"
+        assert top["chunk_ids"] == ["d1-0", "d1-1"]
+        assert score == 0.9
+
+
+class TestMMR:
+    def test_prefers_diverse_candidates(self):
+        embeddings = [_local_embed("apple banana"), _local_embed("apple banana"), _local_embed("banana cherry")]
+        assert mmr_select([1.0, 1.0, 0.5], embeddings, 2, lambda_=0.3) == [0, 2]
+
+    def test_pure_relevance(self):
+        embeddings = [_local_embed("cherry"), _local_embed("apple")]
+        assert mmr_select([0.2, 0.9], embeddings, 1, lambda_=1.0) == [1]
+
+
+class TestAssembleContext:
+    def test_packs_to_budget_and_reports_savings(self):
+        words = [f"w{i}" for i in range(300)]
+        texts = chunk_text(" ".join(words), max_tokens=100, overlap=40)
+        candidates = [(1.0 - i * 0.1, _chunk("d1", i, text)) for i, text in enumerate(texts)]
+        result = assemble_context(candidates, top_k=3, token_budget=1000, mmr_lambda=1.0)
+        assert len(result.items) == 1
+        assert result.tokens == 220
+        assert result.tokens_saved == 80
+
+        tight = assemble_context(candidates, top_k=3, token_budget=50, mmr_lambda=1.0)
+        assert tight.tokens == 50
@@ -0,0 +1,113 @@
+from __future__ import annotations
+
+import asyncio
+import sys
+from pathlib import Path
+
+API_ROOT = Path(__file__).resolve().parents[1]
+sys.path.append(str(API_ROOT))
+
+from src import db
+from src.services import bulk, dedup, ingest
+from src.services.query import answer_query
+
+PAGE = (
+    "Deployments roll out in three waves across the staging and production clusters. "
+    "Each wave waits for health checks before the next one starts. "
+    "Rollbacks restore the previous image tag and page the on-call engineer."
+)
+OTHER = "Sourdough needs a mature starter, a long cold proof and a very hot oven for a good crust."
+DB_ENV = {"bulk_workers": 1}
+
+
+def _ingest(text: str, name: str = "doc.txt") -> str:
+    document = db.create_document(project_id="p", filename=name, source_type="text")
+    asyncio.run(ingest.process_document(document.id, "p", text, max_tokens=12, overlap=0))
+    return document.id
+
+
+class TestSignature:
+    def test_similarity_tracks_overlap(self):
+        base = dedup.signature(PAGE)
+        assert dedup.jaccard(base, dedup.signature(PAGE.upper())) == 1.0
+        assert dedup.jaccard(base, dedup.signature(PAGE.replace("three", "four"))) > 0.8
+        assert dedup.jaccard(base, dedup.signature(OTHER)) < 0.2
+        assert dedup.signature("   ") is None
+
+    def test_collapse_keeps_best_of_each_group(self):
+        chunks = [{"id": "b", "duplicate_of": "a"}, {"id": "a", "duplicate_of": None}, {"id": "c", "duplicate_of": None}]
+        assert [chunk["id"] for chunk in dedup.collapse_duplicates(chunks)] == ["b", "c"]
+
+
+class TestIngestPolicies:
+    def test_flag_marks_and_retrieval_collapses(self, setup_db):
+        setup_db(dedup_policy="flag", dedup_collapse="true")
+        original = _ingest(PAGE)
+        copy = _ingest(PAGE, "mirror.txt")
+        _ingest(OTHER)
+
+        assert db.get_document(copy).duplicate_of == original
+        assert db.get_document(original).duplicate_of is None
+        root_ids = [chunk["id"] for chunk in db.get_chunks_for_document(original)]
+        assert [chunk["duplicate_of"] for chunk in db.get_chunks_for_document(copy)] == root_ids
+
+        result = asyncio.run(answer_query("p", "deployments roll out in waves", top_k=5))
+        texts = [citation["text"] for citation in result["citations"]]
+        assert len(texts) == len(set(texts))
+
+    def test_link_reuses_embeddings(self, setup_db, monkeypatch):
+        setup_db(dedup_policy="link")
+        embedded = []
+        original_embed = ingest.embed_batch
+
+        async def counting(texts, model=None):
+            embedded.extend(texts)
+            return await original_embed(texts, model)
+
+        monkeypatch.setattr(ingest, "embed_batch", counting)
+        original = _ingest(PAGE)
+        first = len(embedded)
+        copy = _ingest(PAGE)
+
+        assert len(embedded) == first
+        copied = db.get_chunks_for_document(copy, fields=["id", "embedding", "duplicate_of"])
+        roots = {chunk["id"]: chunk for chunk in db.get_chunks_for_document(original, fields=["id", "embedding"])}
+        assert copied and all(chunk["embedding"] == roots[chunk["duplicate_of"]]["embedding"] for chunk in copied)
+        assert db.get_document(copy).status == "ready"
+
+    def test_skip_stores_no_chunks(self, setup_db):
+        setup_db(dedup_policy="skip")
+        original = _ingest(PAGE)
+        copy = _ingest(PAGE)
+        document = db.get_document(copy)
+        assert (document.status, document.chunk_count, document.duplicate_of) == ("duplicate", 0, original)
+        assert db.get_chunks_for_document(copy) == []
+        assert db.get_document_content(copy) == PAGE
+
+    def test_off_and_rechunk(self, setup_db):
+        setup_db(dedup_policy="off")
+        first = _ingest(PAGE)
+        assert db.get_document(_ingest(PAGE)).duplicate_of is None
+
+        setup_db(dedup_policy="flag")
+        asyncio.run(ingest.rechunk_document(first, 12, 0))
+        asyncio.run(ingest.rechunk_document(first, 12, 0))
+        assert db.get_document(first).duplicate_of is None
+        assert all(chunk["duplicate_of"] is None for chunk in db.get_chunks_for_document(first))
+
+    def test_resolve_links_reuses_known_then_stored_vectors(self, setup_db):
+        setup_db(dedup_policy="link")
+        root = db.get_chunks_for_document(_ingest(PAGE), fields=["id"])[0]["id"]
+        links = [(0, "fresh-root"), (1, root), (2, "deleted-root")]
+        resolved, missing = dedup.resolve_links("p", links, {"fresh-root": ([1.0, 0.0], "m")})
+        assert resolved == {0: ([1.0, 0.0], "m"), 1: db.get_chunk_embeddings("p", [root])[root]}
+        assert missing == [2]
+
+
+def test_bulk_dedups_within_one_upload(setup_db):
+    setup_db(dedup_policy="skip")
+    files = [("v1/page.md", PAGE.encode()), ("v2/page.md", PAGE.encode()), ("other.md", OTHER.encode())]
+    report = asyncio.run(bulk.ingest_files("p", files, max_tokens=12, overlap=0))
+    statuses = [(item["status"], item["duplicate_of"]) for item in report["files"]]
+    assert statuses == [("ready", None), ("duplicate", report["files"][0]["document_id"]), ("ready", None)]
+    assert report["files"][1]["chunk_count"] == 0
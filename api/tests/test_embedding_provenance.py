@@ -0,0 +1,137 @@
+from __future__ import annotations
+
+import asyncio
+import sys
+from pathlib import Path
+
+import httpx
+
+API_ROOT = Path(__file__).resolve().parents[1]
+sys.path.append(str(API_ROOT))
+
+from src import db
+from src.services import limits, rag
+from src.services.limits import CircuitBreaker
+from src.services.query import answer_query
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class TestCircuitBreaker:
+    def test_opens_after_threshold_and_probes_after_reset(self):
+        clock = FakeClock()
+        breaker = CircuitBreaker(failure_threshold=2, reset_seconds=10, clock=clock)
+        breaker.record_failure()
+        assert breaker.allow()
+        breaker.record_failure()
+        assert breaker.state == "open"
+        assert not breaker.allow()
+
+        clock.now = 10
+        assert breaker.state == "half-open"
+        assert breaker.allow()
+        assert not breaker.allow()
+        breaker.record_failure()
+        assert breaker.state == "open"
+
+        clock.now = 20
+        assert breaker.allow()
+        breaker.record_success()
+        assert breaker.state == "closed"
+
+
+def _failing_gemini(monkeypatch, threshold: int = 2):
+    calls = []
+
+    async def fail(self, *args, **kwargs):
+        calls.append(args)
+        raise httpx.ConnectTimeout("gemini down")
+
+    monkeypatch.setenv("GEMINI_API_KEY", "test-key")
+    monkeypatch.setattr(httpx.AsyncClient, "post", fail)
+    monkeypatch.setattr(limits, "_embedding_breaker", CircuitBreaker(threshold, 60))
+    return calls
+
+
+class TestEmbeddingFallback:
+    def test_breaker_skips_remote_calls_once_open(self, monkeypatch):
+        calls = _failing_gemini(monkeypatch)
+
+        async def run():
+            return [await rag.embed_text_with_model(f"text {i}") for i in range(5)]
+
+        results = asyncio.run(run())
+        assert len(calls) == 2
+        assert all(model == rag.local_embedding_model() for _, model in results)
+        assert all(len(vector) == 256 for vector, _ in results)
+
+    def test_cancelled_probe_releases_the_trial(self, monkeypatch):
+        clock = FakeClock()
+        breaker = CircuitBreaker(1, 10, clock=clock)
+        breaker.record_failure()
+        clock.now = 10
+        monkeypatch.setenv("GEMINI_API_KEY", "test-key")
+        monkeypatch.setattr(limits, "_embedding_breaker", breaker)
+        started = []
+
+        async def hang(self, *args, **kwargs):
+            started.append(args)
+            await asyncio.sleep(60)
+
+        monkeypatch.setattr(httpx.AsyncClient, "post", hang)
+
+        async def run(embed):
+            probe = asyncio.create_task(embed())
+            while not started:
+                await asyncio.sleep(0)
+            probe.cancel()
+            try:
+                await probe
+            except asyncio.CancelledError:
+                pass
+
+        asyncio.run(run(lambda: rag.embed_text_with_model("probe")))
+        assert breaker.state == "half-open" and breaker.allow()
+        breaker.release()
+        started.clear()
+        asyncio.run(run(lambda: rag.embed_batch(["a", "b"])))
+        assert breaker.allow()
+
+
+class TestCompatibleRetrieval:
+    def test_only_compatible_vectors_are_compared(self, setup_db):
+        setup_db()
+        local = db.create_document("p", "local.txt", "text")
+        db.create_chunk(local.id, "p", 0, "local chunk", rag._local_embed("local chunk"), {}, embedding_model=rag.local_embedding_model())
+        remote = db.create_document("p", "remote.txt", "text")
+        db.create_chunk(remote.id, "p", 0, "remote chunk", [0.1] * 768, {}, embedding_model="text-embedding-004")
+
+        chunks = db.get_chunks_for_document(remote.id, fields=["embedding_model", "embedding_dim"])
+        assert chunks == [{"embedding_model": "text-embedding-004", "embedding_dim": 768}]
+
+        result = asyncio.run(answer_query("p", "local chunk", top_k=5))
+        assert result["related_documents"] == [local.id]
+
+    def test_falls_back_to_local_index_when_remote_query_has_no_match(self, setup_db, monkeypatch):
+        setup_db()
+        doc = db.create_document("p", "local.txt", "text")
+        db.create_chunk(doc.id, "p", 0, "outage chunk", rag._local_embed("outage chunk"), {}, embedding_model=rag.local_embedding_model())
+
+        calls = []
+
+        async def remote(text, model=None):
+            calls.append(model)
+            if model == rag.local_embedding_model():
+                return rag._local_embed(text), model
+            return [0.1] * 768, "text-embedding-004"
+
+        monkeypatch.setattr("src.services.query.embed_text_with_model", remote)
+        result = asyncio.run(answer_query("p", "outage chunk", top_k=1))
+        assert result["related_documents"] == [doc.id]
+        assert calls == [rag.local_embedding_model()]
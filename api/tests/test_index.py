@@ -0,0 +1,168 @@
+from __future__ import annotations
+
+import asyncio
+import sys
+from pathlib import Path
+
+API_ROOT = Path(__file__).resolve().parents[1]
+sys.path.append(str(API_ROOT))
+
+from src import db
+from src.services import index, ingest, warmup
+from src.services.rag import _local_embed, local_embedding_model, similarity
+
+
+def _ingest(project_id: str, text: str) -> str:
+    document = db.create_document(project_id=project_id, filename="doc.txt", source_type="text")
+    asyncio.run(ingest.process_document(document.id, project_id, text, max_tokens=5, overlap=0))
+    return document.id
+
+
+class TestProjectIndex:
+    def test_search_matches_brute_force(self, setup_db):
+        setup_db()
+        first = _ingest("p", "kubernetes rollout plan. sourdough bread recipe. tax filing deadline notes here.")
+        _ingest("p", "kubernetes cluster upgrade. weekend hiking trail guide for beginners.")
+        query = _local_embed("kubernetes rollout")
+
+        project_index = index.get_project_index("p", local_embedding_model(), 256)
+        hits = project_index.search(query, limit=3)
+        expected = sorted(
+            (similarity(query, chunk["embedding"]) for chunk in db.get_chunks_by_project("p")),
+            reverse=True,
+        )[:3]
+        assert [round(score, 5) for score, _ in hits] == [round(score, 5) for score in expected]
+
+        filtered = project_index.search(query, document_ids=[first], limit=10)
+        assert {str(project_index.document_ids[project_index.doc_codes[row]]) for _, row in filtered} == {first}
+        assert project_index.search(query, document_ids=[], limit=10) == []
+
+    def test_writes_invalidate_cached_index(self, setup_db):
+        setup_db()
+        _ingest("p", "first document body")
+        before = index.get_project_index("p", local_embedding_model(), 256)
+        assert index.get_project_index("p", local_embedding_model(), 256) is before
+
+        _ingest("p", "second document body")
+        after = index.get_project_index("p", local_embedding_model(), 256)
+        assert after is not before and len(after) > len(before)
+
+    def test_document_ingest_bumps_version_once(self, setup_db, monkeypatch):
+        setup_db(ingest_batch_size=2)
+        bumps = []
+        bump = db._bump_index_version
+        monkeypatch.setattr(db, "_bump_index_version", lambda conn, project_id: bumps.append(project_id) or bump(conn, project_id))
+
+        _ingest("p", " ".join(f"word{i}" for i in range(40)))
+        assert len(db.get_chunks_by_project("p")) == 8
+        assert bumps == ["p"]
+
+    def test_snapshot_round_trip(self, setup_db, tmp_path):
+        setup_db()
+        _ingest("p", "snapshot document body text")
+        built, source = index.load_project_index("p", local_embedding_model(), 256, persist=True)
+        assert source == "rebuilt"
+        assert list((tmp_path / "index_snapshots").glob("*.npz"))
+
+        index.clear_indexes()
+        loaded, source = index.load_project_index("p", local_embedding_model(), 256)
+        assert source == "snapshot"
+        assert list(loaded.chunk_ids) == list(built.chunk_ids)
+        assert (loaded.matrix == built.matrix).all()
+
+        _ingest("p", "another document makes the snapshot stale")
+        index.clear_indexes()
+        assert index.load_project_index("p", local_embedding_model(), 256)[1] == "rebuilt"
+
+
+class TestWarmup:
+    def test_warms_busiest_projects(self, setup_db, monkeypatch):
+        setup_db(vector_store="memory")
+        _ingest("hot", "frequently queried project")
+        _ingest("cold", "rarely queried project")
+        for i in range(3):
+            db.create_query(
+                db.QueryRecord(
+                    id=f"q{i}",
+                    project_id="hot",
+                    question="질문",
+                    answer="답변",
+                    citations=[],
+                    latency_ms=1,
+                    tokens_used=0,
+                    model="local-fallback",
+                    related_documents=[],
+                    created_at="2026-01-01T00:00:00+00:00",
+                )
+            )
+        monkeypatch.setenv("KNOWLEDGE_COPILOT_WARMUP_PROJECTS", "1")
+
+        async def run() -> tuple[bool, dict]:
+            warmup.start_warmup()
+            warming = warmup.readiness()["ready"]
+            await warmup._task
+            return warming, warmup.readiness()
+
+        warming, state = asyncio.run(run())
+        assert warming is False
+        assert state["ready"] and state["projects"] == 1 and state["rebuilt"] == 1
+        assert ("hot", local_embedding_model(), 256) in index.index_cache()
+        assert ("cold", local_embedding_model(), 256) not in index.index_cache()
+
+    def test_disabled_is_immediately_ready(self, setup_db):
+        setup_db(index_warmup="false")
+        warmup.start_warmup()
+        assert warmup.readiness()["ready"]
+
+
+def _synthetic(project_id: str, rows: int, version: str = "v1") -> index.ProjectIndex:
+    return index._from_rows(
+        project_id,
+        "m",
+        4,
+        version,
+        [(f"{project_id}-c{i}", f"{project_id}-d", [1.0, float(i), 0.0, 0.0]) for i in range(rows)],
+    )
+
+
+class TestIndexCache:
+    def test_size_accounts_numpy_buffers(self):
+        item = _synthetic("p", 10)
+        assert index.index_nbytes(item) == item.matrix.nbytes + item.chunk_ids.nbytes + item.document_ids.nbytes + item.doc_codes.nbytes
+        assert item.matrix.nbytes == 10 * 4 * 4
+
+    def test_lru_eviction_within_budget(self):
+        size = index.index_nbytes(_synthetic("a", 10))
+        cache = index.IndexCache(budget_bytes=size * 2)
+        cache.put(("a", "m", 4), _synthetic("a", 10))
+        cache.put(("b", "m", 4), _synthetic("b", 10))
+        assert cache.get(("a", "m", 4), "v1") is not None  # a becomes most recent
+
+        evicted = cache.put(("c", "m", 4), _synthetic("c", 10))
+        assert [item.project_id for item in evicted] == ["b"]
+        assert ("a", "m", 4) in cache and ("b", "m", 4) not in cache
+        assert cache.bytes == size * 2 <= cache.budget_bytes
+
+        assert cache.get(("a", "m", 4), "stale") is None
+        stats = cache.snapshot()
+        assert (stats["hits"], stats["misses"], stats["evictions"], stats["entries"]) == (1, 1, 1, 2)
+
+    def test_oversized_index_is_not_cached(self):
+        cache = index.IndexCache(budget_bytes=index.index_nbytes(_synthetic("a", 10)))
+        cache.put(("a", "m", 4), _synthetic("a", 10))
+        assert cache.put(("big", "m", 4), _synthetic("big", 100)) == []
+        assert ("a", "m", 4) in cache and ("big", "m", 4) not in cache
+        assert cache.snapshot()["oversized"] == 1
+
+    def test_evicted_project_reloads_from_snapshot(self, setup_db, monkeypatch):
+        setup_db()
+        _ingest("a", "first project body")
+        _ingest("b", "second project body")
+        size = index.index_nbytes(index.build_index("a", local_embedding_model(), 256))
+        monkeypatch.setenv("KNOWLEDGE_COPILOT_INDEX_CACHE_BYTES", str(size))
+        index.clear_indexes()
+
+        assert index.load_project_index("a", local_embedding_model(), 256)[1] == "rebuilt"
+        assert index.load_project_index("b", local_embedding_model(), 256)[1] == "rebuilt"
+        assert index.cache_stats()["evictions"] == 1
+        assert index.load_project_index("a", local_embedding_model(), 256)[1] == "snapshot"
@@ -0,0 +1,179 @@
+from __future__ import annotations
+
+import asyncio
+import sys
+from pathlib import Path
+
+import pytest
+
+API_ROOT = Path(__file__).resolve().parents[1]
+sys.path.append(str(API_ROOT))
+
+from src import db
+from src.services import ingest, summarize
+from src.services.limits import llm_admission
+from src.services.query import answer_query, prefilter_documents
+from src.services.rag import LLMError, _local_embed
+
+
+def _ingest(project_id: str, text: str) -> str:
+    document = db.create_document(project_id=project_id, filename="doc.txt", source_type="text")
+    asyncio.run(ingest.process_document(document.id, project_id, text))
+    return document.id
+
+
+class TestDocumentProfiles:
+    def test_centroid_stored(self, setup_db):
+        setup_db()
+        doc_id = _ingest("p", "centroid test document body")
+        centroids = dict(db.get_document_centroids("p"))
+        assert len(centroids[doc_id]) == 256
+
+    def test_precomputed_summary(self, setup_db):
+        setup_db(precompute_summaries="true")
+
+        async def run() -> str:
+            document = db.create_document(project_id="p", filename="doc.txt", source_type="text")
+            await ingest.process_document(document.id, "p", "요약 대상 문서 본문입니다.")
+            await asyncio.gather(*ingest.summary_queue().runners)
+            return document.id
+
+        doc_id = asyncio.run(run())
+        assert db.get_document(doc_id).summary
+
+    def test_background_summaries_yield_to_interactive_queries(self, setup_db, monkeypatch):
+        setup_db(precompute_summaries="true", llm_max_concurrency=2, llm_max_queue=1, summary_retry_seconds=0)
+
+        async def fake_summarize_text(text, instruction, model=None):
+            async with llm_admission().slot():
+                await asyncio.sleep(0.01)
+            return "요약", 1, "fake"
+
+        monkeypatch.setattr(summarize, "summarize_text", fake_summarize_text)
+
+        async def interactive() -> None:
+            async with llm_admission().slot():
+                await asyncio.sleep(0.05)
+
+        async def run() -> tuple[list[str], int, int]:
+            doc_ids = []
+            for i in range(6):
+                document = db.create_document(project_id="p", filename=f"doc{i}.txt", source_type="text")
+                await ingest.process_document(document.id, "p", f"문서 {i} 본문입니다.")
+                doc_ids.append(document.id)
+            await asyncio.gather(*(interactive() for _ in range(3)))
+            for _ in range(500):
+                if all(db.get_document(doc_id).summary for doc_id in doc_ids):
+                    break
+                await asyncio.sleep(0.01)
+            return doc_ids, llm_admission().rejected, llm_admission().deferred
+
+        doc_ids, rejected, deferred = asyncio.run(run())
+        assert rejected == 0 and deferred > 0
+        assert all(db.get_document(doc_id).summary == "요약" for doc_id in doc_ids)
+
+    def test_failed_summary_stays_null_and_is_retried(self, setup_db, monkeypatch):
+        setup_db(precompute_summaries="true", summary_retry_seconds=0.05, summary_max_attempts=2)
+        calls = []
+
+        async def flaky(document_ids, instruction, concurrency=None):
+            calls.append(document_ids)
+            if len(calls) == 1:
+                raise LLMError("quota exceeded")
+            return {"summary": "재시도 요약"}
+
+        monkeypatch.setattr(ingest, "summarize_documents", flaky)
+
+        async def run() -> tuple[str, str | None]:
+            document = db.create_document(project_id="p", filename="doc.txt", source_type="text")
+            await ingest.process_document(document.id, "p", "요약 대상 문서 본문입니다.")
+            await asyncio.gather(*ingest.summary_queue().runners)
+            after_failure = db.get_document(document.id).summary
+            for _ in range(100):
+                if db.get_document(document.id).summary:
+                    break
+                await asyncio.sleep(0.01)
+            return document.id, after_failure
+
+        doc_id, after_failure = asyncio.run(run())
+        assert after_failure is None
+        assert len(calls) == 2
+        assert db.get_document(doc_id).summary == "재시도 요약"
+
+    def test_resume_requeues_unsummarized_documents(self, setup_db):
+        setup_db()
+        doc_id = _ingest("p", "재시작 후 요약할 문서입니다.")
+        assert db.get_document(doc_id).summary is None
+        setup_db(precompute_summaries="true")
+
+        async def run() -> int:
+            resumed = ingest.resume_document_summaries()
+            await asyncio.gather(*ingest.summary_queue().runners)
+            return resumed
+
+        assert asyncio.run(run()) == 1
+        assert db.get_document(doc_id).summary
+
+
+class TestOffsetStorage:
+    def test_chunk_text_is_materialized_from_content(self, setup_db):
+        setup_db()
+        text = " ".join(f"word{i}" for i in range(500))
+        doc_id = _ingest("p", text)
+
+        with db.db_transaction() as conn:
+            stored = conn.execute("SELECT text, start_offset FROM chunks WHERE document_id = ?", (doc_id,)).fetchall()
+        assert all(row["text"] == "" and row["start_offset"] is not None for row in stored)
+
+        chunks = db.get_chunks_for_document(doc_id)
+        assert chunks[0]["text"].startswith("word0 word1")
+        assert all(chunk["text"] == text[chunk["start_offset"] : chunk["end_offset"]] for chunk in chunks)
+        assert db.get_document_content(doc_id) == text
+
+    def test_rechunk_without_reupload(self, setup_db):
+        setup_db()
+        doc_id = _ingest("p", " ".join(f"word{i}" for i in range(500)))
+        before = len(db.get_chunks_for_document(doc_id))
+
+        count = asyncio.run(ingest.rechunk_document(doc_id, max_tokens=50, overlap=0))
+        assert count == 10
+        assert count > before
+        assert len(db.get_chunks_for_document(doc_id)) == count
+        assert db.get_document(doc_id).chunk_count == count
+
+    def test_failed_rechunk_keeps_previous_chunks(self, setup_db, monkeypatch):
+        setup_db(ingest_batch_size=2)
+        doc_id = _ingest("p", " ".join(f"word{i}" for i in range(500)))
+        before = db.get_chunks_for_document(doc_id, fields=["id"])
+        calls = []
+
+        async def flaky(texts, model=None):
+            calls.append(texts)
+            if len(calls) > 1:
+                raise RuntimeError("embedding backend went away")
+            return [(_local_embed(text), "local") for text in texts]
+
+        monkeypatch.setattr(ingest, "embed_batch", flaky)
+        with pytest.raises(RuntimeError):
+            asyncio.run(ingest.rechunk_document(doc_id, max_tokens=50, overlap=0))
+        assert db.get_chunks_for_document(doc_id, fields=["id"]) == before
+        assert (db.get_document(doc_id).status, db.get_document(doc_id).chunk_count) == ("ready", len(before))
+
+
+class TestCentroidPrefilter:
+    def test_disabled_below_threshold(self, setup_db):
+        setup_db()
+        _ingest("p", "apple banana")
+        assert prefilter_documents("p", _local_embed("apple")) is None
+
+    def test_selects_closest_documents(self, setup_db):
+        setup_db(centroid_prefilter_min_documents=3, centroid_prefilter_top_documents=1)
+        target = _ingest("p", "kubernetes deployment rollout")
+        _ingest("p", "sourdough bread recipe")
+        _ingest("p", "tax filing deadline")
+
+        selected = prefilter_documents("p", _local_embed("kubernetes rollout"))
+        assert selected == [target]
+
+        result = asyncio.run(answer_query("p", "kubernetes rollout", top_k=3))
+        assert result["related_documents"] == [target]
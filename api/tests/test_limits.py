@@ -0,0 +1,113 @@
+from __future__ import annotations
+
+import asyncio
+import importlib
+import sys
+from pathlib import Path
+
+import pytest
+from fastapi.testclient import TestClient
+
+API_ROOT = Path(__file__).resolve().parents[1]
+sys.path.append(str(API_ROOT))
+
+from src.services.limits import AdmissionController, OverloadedError, SingleFlight
+
+
+class TestAdmissionController:
+    def test_rejects_when_queue_is_full(self):
+        async def scenario():
+            controller = AdmissionController(max_concurrent=1, max_queue=1)
+            release = asyncio.Event()
+
+            async def hold():
+                async with controller.slot():
+                    await release.wait()
+
+            holder = asyncio.create_task(hold())
+            waiter = asyncio.create_task(hold())
+            await asyncio.sleep(0)
+            assert controller.waiting == 1
+
+            with pytest.raises(OverloadedError) as info:
+                async with controller.slot():
+                    pass
+            assert info.value.retry_after >= 1
+            assert controller.rejected == 1
+
+            release.set()
+            await asyncio.gather(holder, waiter)
+
+        asyncio.run(scenario())
+
+    def test_limits_concurrency(self):
+        async def scenario():
+            controller = AdmissionController(max_concurrent=2, max_queue=10)
+            active = 0
+            peak = 0
+
+            async def work():
+                nonlocal active, peak
+                async with controller.slot():
+                    active += 1
+                    peak = max(peak, active)
+                    await asyncio.sleep(0.01)
+                    active -= 1
+
+            await asyncio.gather(*(work() for _ in range(6)))
+            return peak
+
+        assert asyncio.run(scenario()) == 2
+
+
+class TestSingleFlight:
+    def test_coalesces_concurrent_calls(self):
+        async def scenario():
+            flight = SingleFlight()
+            calls = 0
+
+            async def expensive():
+                nonlocal calls
+                calls += 1
+                await asyncio.sleep(0.01)
+                return {"answer": "shared"}
+
+            results = await asyncio.gather(*(flight.run("k", expensive) for _ in range(5)))
+            assert all(result["answer"] == "shared" for result in results)
+            assert calls == 1
+            assert flight.coalesced == 4
+
+            await flight.run("k", expensive)
+            assert calls == 2
+
+        asyncio.run(scenario())
+
+    def test_propagates_errors_to_followers(self):
+        async def scenario():
+            flight = SingleFlight()
+
+            async def failing():
+                await asyncio.sleep(0.01)
+                raise OverloadedError(3)
+
+            results = await asyncio.gather(*(flight.run("k", failing) for _ in range(3)), return_exceptions=True)
+            assert all(isinstance(result, OverloadedError) for result in results)
+
+        asyncio.run(scenario())
+
+
+def test_query_returns_429_with_retry_after(setup_db, monkeypatch):
+    setup_db()
+
+    import src.main as main
+
+    importlib.reload(main)
+
+    async def overloaded(*_args, **_kwargs):
+        raise OverloadedError(7)
+
+    monkeypatch.setattr(main, "answer_query_shared", overloaded)
+    with TestClient(main.app) as client:
+        res = client.post("/api/v1/queries", json={"project_id": "default", "question": "hello"})
+        assert res.status_code == 429
+        assert res.headers["Retry-After"] == "7"
@@ -0,0 +1,111 @@
+from __future__ import annotations
+
+import asyncio
+import sys
+from pathlib import Path
+
+import pytest
+
+API_ROOT = Path(__file__).resolve().parents[1]
+sys.path.append(str(API_ROOT))
+
+from src import db
+from src.services import ingest, pipeline
+from src.services.metrics import get_metrics
+from src.services.rag import embed_batch, iter_chunk_spans, mean_embedding
+
+TEXT = " ".join(f"Sentence number {i} talks about topic {i % 7}." for i in range(40))
+DB_ENV = {"ingest_batch_size": 4, "ingest_queue_depth": 1, "dedup_policy": "off"}
+
+
+def _ingest(text: str = TEXT) -> str:
+    document = db.create_document(project_id="p", filename="doc.txt", source_type="text")
+    asyncio.run(ingest.process_document(document.id, "p", text, max_tokens=8, overlap=2))
+    return document.id
+
+
+class TestPipelinedIngest:
+    def test_matches_staged_result(self, setup_db):
+        setup_db()
+        document_id = _ingest()
+
+        spans = list(iter_chunk_spans(TEXT, max_tokens=8, overlap=2, source_type="text"))
+        expected = asyncio.run(embed_batch([TEXT[start:end] for start, end in spans]))
+        chunks = db.get_chunks_for_document(document_id)
+        assert [chunk["chunk_index"] for chunk in chunks] == list(range(len(spans)))
+        assert [chunk["text"] for chunk in chunks] == [TEXT[start:end] for start, end in spans]
+        assert [chunk["embedding"] for chunk in chunks] == [vector for vector, _ in expected]
+
+        document = db.get_document(document_id)
+        assert (document.status, document.chunk_count) == ("ready", len(spans))
+        assert db.get_document_centroids("p")[0][1] == pytest.approx(mean_embedding([v for v, _ in expected]))
+
+    def test_writes_overlap_embedding(self, setup_db, monkeypatch):
+        setup_db(ingest_batch_size=2, ingest_queue_depth=2)
+        events = []
+        original_embed = ingest.embed_batch
+        original_add = pipeline.VectorStore.add
+
+        async def slow_embed(texts, model=None):
+            events.append("embed")
+            await asyncio.sleep(0.02)
+            return await original_embed(texts, model)
+
+        def recording_add(self, project_id, records):
+            events.append("write")
+            return original_add(self, project_id, records)
+
+        monkeypatch.setattr(ingest, "embed_batch", slow_embed)
+        monkeypatch.setattr(pipeline.VectorStore, "add", recording_add)
+        _ingest()
+
+        assert events.count("write") > 2
+        first_write = events.index("write")
+        assert "embed" in events[first_write:]
+
+    def test_backpressure_and_counters(self, setup_db, monkeypatch):
+        setup_db(ingest_batch_size=1, ingest_queue_depth=1)
+        original_add = pipeline.VectorStore.add
+
+        def slow_add(self, project_id, records):
+            import time
+
+            time.sleep(0.01)
+            return original_add(self, project_id, records)
+
+        monkeypatch.setattr(pipeline.VectorStore, "add", slow_add)
+        document_id = _ingest()
+        chunk_count = db.get_document(document_id).chunk_count
+
+        stats = pipeline.pipeline_stats()
+        assert stats["chunk"]["items"] == stats["embed"]["items"] == stats["write"]["items"] == chunk_count
+        assert stats["write"]["batches"] == chunk_count
+        assert stats["chunk"]["backpressure_waits"] + stats["embed"]["backpressure_waits"] > 0
+
+        metrics = get_metrics("p")
+        assert metrics["ingest_chunks_written"] == chunk_count
+        assert metrics["ingest_write_rate"] > 0
+        assert metrics["ingest_backpressure_waits"] > 0
+
+    def test_failure_removes_partial_chunks(self, setup_db, monkeypatch):
+        setup_db(ingest_batch_size=2, ingest_queue_depth=1)
+        calls = []
+        original_embed = ingest.embed_batch
+
+        async def failing_embed(texts, model=None):
+            calls.append(len(texts))
+            if len(calls) == 3:
+                raise RuntimeError("embedding backend down")
+            return await original_embed(texts, model)
+
+        monkeypatch.setattr(ingest, "embed_batch", failing_embed)
+        document = db.create_document(project_id="p", filename="doc.txt", source_type="text")
+        with pytest.raises(RuntimeError):
+            asyncio.run(ingest.process_document(document.id, "p", TEXT, max_tokens=8, overlap=2))
+        assert db.get_chunks_for_document(document.id) == []
+        assert db.metric_snapshot("p")["chunks"] == 0
+
+    def test_empty_document(self, setup_db):
+        setup_db()
+        document_id = _ingest("   ")
+        assert (db.get_document(document_id).status, db.get_document(document_id).chunk_count) == ("empty", 0)
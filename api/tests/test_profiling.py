@@ -0,0 +1,110 @@
+from __future__ import annotations
+
+import asyncio
+import importlib
+import sys
+import threading
+import time
+from pathlib import Path
+
+from fastapi.testclient import TestClient
+
+API_ROOT = Path(__file__).resolve().parents[1]
+sys.path.append(str(API_ROOT))
+
+from src.services import profiling
+
+
+def _spin_until(stop: threading.Event) -> None:
+    while not stop.is_set():
+        sum(range(1000))
+
+
+def _client(setup_db, **env: str) -> TestClient:
+    setup_db(**env)
+    import src.main as main
+
+    importlib.reload(main)
+    return TestClient(main.app)
+
+
+class TestSampling:
+    def test_collapse_and_top_frames(self):
+        stacks = [("a.py:main", "b.py:work"), ("a.py:main", "b.py:work"), ("a.py:main", "c.py:io")]
+        assert profiling.collapse(stacks) == "a.py:main;b.py:work 2\na.py:main;c.py:io 1\n"
+        assert profiling.top_frames(stacks, limit=1) == [{"frame": "b.py:work", "samples": 2, "share": 0.6667}]
+        assert profiling.top_frames([]) == []
+
+    def test_cpu_profile_sees_busy_threads(self):
+        stop = threading.Event()
+        worker = threading.Thread(target=_spin_until, args=(stop,))
+        worker.start()
+        try:
+            collapsed = asyncio.run(profiling.capture_cpu_profile(0.2, 2))
+        finally:
+            stop.set()
+            worker.join()
+        assert "test_profiling.py:_spin_until" in collapsed
+        assert all(line.rsplit(" ", 1)[1].isdigit() for line in collapsed.splitlines())
+
+    def test_memory_diff_reports_new_allocations(self):
+        held = []
+
+        async def run():
+            async def allocate():
+                await asyncio.sleep(0.05)
+                held.extend(bytearray(1024) for _ in range(2000))
+
+            task = asyncio.create_task(allocate())
+            result = await profiling.capture_memory_diff(0.2, top=5)
+            await task
+            return result
+
+        result = asyncio.run(run())
+        assert result["top"][0]["size_diff_bytes"] >= 1024 * 2000
+        assert "test_profiling.py" in result["top"][0]["location"][0]
+
+    def test_one_capture_at_a_time(self):
+        async def run():
+            first = asyncio.create_task(profiling.capture_memory_diff(0.1))
+            await asyncio.sleep(0.01)
+            try:
+                await profiling.capture_cpu_profile(0.1, 5)
+            except profiling.ProfilerBusyError:
+                return await first
+            raise AssertionError("second capture should be rejected")
+
+        assert "top" in asyncio.run(run())
+
+
+def test_admin_endpoints_require_token(setup_db):
+    with _client(setup_db) as client:
+        assert client.get("/api/v1/admin/profile/slow").status_code == 404
+
+    with _client(setup_db, admin_token="secret") as client:
+        assert client.get("/api/v1/admin/profile/slow").status_code == 403
+        assert client.get("/api/v1/admin/profile/slow", headers={"X-Admin-Token": "nope"}).status_code == 403
+
+        headers = {"X-Admin-Token": "secret"}
+        cpu = client.get("/api/v1/admin/profile/cpu?seconds=0.1&interval_ms=2", headers=headers)
+        assert cpu.status_code == 200 and cpu.headers["content-type"].startswith("text/plain")
+        memory = client.get("/api/v1/admin/profile/memory?seconds=0.05&top=3", headers=headers)
+        assert memory.status_code == 200 and len(memory.json()["top"]) <= 3
+        assert client.get("/api/v1/admin/profile/cpu?seconds=600", headers=headers).status_code == 400
+
+
+def test_slow_requests_are_profiled(setup_db):
+    env = {"admin_token": "secret", "profile_slow_requests": "true", "profile_sample_interval_ms": 1}
+    with _client(setup_db, profile_slow_ms=0, **env) as client:
+        client.post("/api/v1/documents", data={"project_id": "p", "source_text": "배포는 세 단계로 진행됩니다."})
+        answered = client.post("/api/v1/queries", json={"project_id": "p", "question": "배포 단계는?"}).json()
+        detail = client.get(f"/api/v1/queries/{answered['id']}").json()
+        assert isinstance(detail["profile"], list)
+
+        slow = client.get("/api/v1/admin/profile/slow", headers={"X-Admin-Token": "secret"}).json()
+        assert {"/api/v1/documents", "/api/v1/queries"} <= {item["path"] for item in slow}
+        assert all(item["elapsed_ms"] >= 0 for item in slow)
+
+    with _client(setup_db, profile_slow_ms=60000, **env) as client:
+        answered = client.post("/api/v1/queries", json={"project_id": "p", "question": "배포 단계는?"}).json()
+        assert client.get(f"/api/v1/queries/{answered['id']}").json()["profile"] is None
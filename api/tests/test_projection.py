@@ -0,0 +1,161 @@
+from __future__ import annotations
+
+import asyncio
+import importlib
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+API_ROOT = Path(__file__).resolve().parents[1]
+sys.path.append(str(API_ROOT))
+
+from src import db
+from src.services import index, projection, query
+from src.services.rag import _local_embed, local_embedding_model
+from src.services.vectorstore import VectorRecord, get_vector_store
+
+
+def _seed(vectors: np.ndarray, model: str = "m", project_id: str = "p") -> list[str]:
+    document_id = db.create_document(project_id=project_id, filename="doc.txt", source_type="text").id
+    return get_vector_store().add(
+        project_id,
+        [
+            VectorRecord(document_id=document_id, chunk_index=i, text=f"chunk {i}", embedding=vector, embedding_model=model)
+            for i, vector in enumerate(vectors.tolist())
+        ],
+    )
+
+
+class TestFit:
+    def test_pca_recovers_a_low_rank_space(self):
+        rng = np.random.default_rng(1)
+        vectors = rng.standard_normal((300, 8)) @ rng.standard_normal((8, 64))
+        components, explained = projection.fit_pca(vectors, 8)
+        assert components.shape == (8, 64)
+        assert explained == pytest.approx(1.0, abs=1e-5)
+        assert projection.fit_pca(vectors, 4)[1] < 1.0
+
+    def test_truncation_keeps_leading_dimensions(self, setup_db):
+        setup_db()
+        vectors = np.zeros((20, 16))
+        vectors[:, :4] = np.random.default_rng(2).standard_normal((20, 4))
+        vectors[:, 4:] = 0.01
+        _seed(vectors)
+        fitted = projection.fit_projection("p", "truncate", 4, "m")
+        assert (fitted.method, fitted.source_dim, fitted.target_dim) == ("truncate", 16, 4)
+        assert fitted.explained_variance > 0.99
+        assert fitted.apply(vectors[:1]).shape == (1, 4)
+
+    def test_rejects_bad_requests(self, setup_db):
+        setup_db()
+        with pytest.raises(KeyError):
+            projection.fit_projection("p", "pca", 4, "m")
+        _seed(np.random.default_rng(3).standard_normal((3, 16)))
+        with pytest.raises(ValueError):
+            projection.fit_projection("p", "pca", 16, "m")
+        with pytest.raises(ValueError):
+            projection.fit_projection("p", "pca", 8, "m")
+        with pytest.raises(ValueError):
+            projection.fit_projection("p", "random", 4, "m")
+
+
+class TestLifecycle:
+    def test_reduced_vectors_follow_fit_refit_and_drop(self, setup_db):
+        setup_db()
+        rng = np.random.default_rng(4)
+        basis = rng.standard_normal((6, 32))
+        _seed(rng.standard_normal((60, 6)) @ basis)
+        _seed(rng.standard_normal((5, 32)), model="other")
+
+        first = projection.fit_projection("p", "pca", 6, "m")
+        version, rows = projection.projected_rows(first)
+        assert version.endswith(first.version) and len(rows) == 60
+        assert all(vector.shape == (6,) for _, _, vector in rows)
+        assert db.get_chunks_to_reproject("p", "m", 32, first.version, "", 100) == []
+        assert projection.get_projection("p", "other", 32) is None
+        assert projection.get_projection("p", "m", 16) is None
+
+        added = _seed(rng.standard_normal((3, 6)) @ basis)
+        assert db.get_chunks_to_reproject("p", "m", 32, first.version, "", 100) == []
+        memory_index = index.get_project_index("p", "m", 32, first)
+        assert memory_index.matrix.shape == (63, 6)
+        assert set(added) <= set(memory_index.chunk_ids.tolist())
+
+        second = projection.fit_projection("p", "pca", 3, "m")
+        assert second.version != first.version
+        assert index.get_project_index("p", "m", 32, second).matrix.shape == (63, 3)
+
+        assert projection.drop_projection("p")
+        assert projection.current_projection("p") is None
+        assert not projection.drop_projection("p")
+        assert index.get_project_index("p", "m", 32).matrix.shape == (63, 32)
+
+    def test_evaluation_reports_recall_latency_and_memory(self, setup_db):
+        setup_db()
+        rng = np.random.default_rng(6)
+        _seed(rng.standard_normal((400, 12)) @ rng.standard_normal((12, 128)) + 0.01 * rng.standard_normal((400, 128)))
+        fitted = projection.fit_projection("p", "pca", 12, "m")
+        report = projection.evaluate_projection(fitted, queries=50, k=10)
+        assert (report["queries"], report["k"], report["full_dim"], report["reduced_dim"]) == (50, 10, 128, 12)
+        assert report["recall_at_k"] >= 0.9
+        assert report["reduced_bytes"] * 128 == report["full_bytes"] * 12
+        assert report["full_latency_ms"] > 0 and report["reduced_latency_ms"] > 0
+
+    def test_answer_query_searches_reduced_space(self, setup_db, monkeypatch):
+        setup_db()
+        texts = ["kubernetes rollout waves", "sourdough starter proof", "tax filing deadline", "rollback image tag"]
+        document_id = db.create_document(project_id="p", filename="doc.txt", source_type="text").id
+        get_vector_store().add(
+            "p",
+            [
+                VectorRecord(document_id, i, text, _local_embed(text), embedding_model=local_embedding_model())
+                for i, text in enumerate(texts)
+            ],
+        )
+        full = asyncio.run(query.answer_query("p", "kubernetes rollout", top_k=1))
+        fitted = projection.fit_projection("p", "pca", 4, local_embedding_model())
+        searched = []
+        original = get_vector_store().__class__.search
+
+        def recording(self, project_id, query_vec, k, embedding_model=None, document_ids=None, projection=None):
+            searched.append((len(query_vec), projection))
+            return original(self, project_id, query_vec, k, embedding_model, document_ids, projection)
+
+        monkeypatch.setattr(get_vector_store().__class__, "search", recording)
+        reduced = asyncio.run(query.answer_query("p", "kubernetes rollout", top_k=1))
+        assert searched == [(4, fitted)]
+        assert reduced["citations"][0]["chunk_id"] == full["citations"][0]["chunk_id"]
+
+
+def test_projection_endpoints(setup_db):
+    setup_db()
+    import src.main as main
+
+    importlib.reload(main)
+    with TestClient(main.app) as client:
+        url = "/api/v1/projects/p/projection"
+        assert client.post(url, json={"method": "pca", "dim": 4}).status_code == 404
+        for i in range(8):
+            client.post("/api/v1/documents", data={"project_id": "p", "source_text": f"문서 {i} 배포 단계 {i * 7}"})
+
+        assert client.get(url).status_code == 404
+        assert client.post(url, json={"method": "pca", "dim": 100000}).status_code == 400
+        assert client.post(url, json={"method": "svd", "dim": 4}).status_code == 422
+
+        fitted = client.post(url, json={"method": "pca", "dim": 4})
+        assert fitted.status_code == 200
+        body = fitted.json()
+        assert (body["target_dim"], body["embedding_model"]) == (4, local_embedding_model())
+        assert body["evaluation"]["reduced_dim"] == 4
+        assert body["evaluation"]["reduced_bytes"] < body["evaluation"]["full_bytes"]
+
+        assert client.get(url).json()["evaluation"] is None
+        assert client.get(f"{url}?evaluate=true").json()["evaluation"]["queries"] == 8
+        answered = client.post("/api/v1/queries", json={"project_id": "p", "question": "배포 단계"})
+        assert answered.status_code == 200 and answered.json()["citations"]
+
+        assert client.delete(url).json() == {"ok": True}
+        assert client.delete(url).status_code == 404
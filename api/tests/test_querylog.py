@@ -0,0 +1,105 @@
+from __future__ import annotations
+
+import asyncio
+import sys
+from pathlib import Path
+
+API_ROOT = Path(__file__).resolve().parents[1]
+sys.path.append(str(API_ROOT))
+
+from src import db
+from src.services.querylog import QueryLogWriter
+
+
+def _query(query_id: str) -> db.QueryRecord:
+    return db.QueryRecord(
+        id=query_id,
+        project_id="p",
+        question="질문",
+        answer="답변",
+        citations=[],
+        latency_ms=10,
+        tokens_used=3,
+        model="local-fallback",
+        related_documents=[],
+        created_at="2026-01-01T00:00:00+00:00",
+    )
+
+
+class TestQueryLogWriter:
+    def test_batches_and_flushes_on_stop(self, setup_db, monkeypatch):
+        setup_db()
+        batches = []
+        original = db.write_log_batch
+        monkeypatch.setattr(db, "write_log_batch", lambda q, f: (batches.append(len(q) + len(f)), original(q, f)))
+
+        async def run() -> dict[str, int]:
+            writer = QueryLogWriter(batch_size=10, interval_seconds=60, buffer_size=100)
+            writer.start()
+            for i in range(25):
+                await writer.submit(_query(f"q{i}"))
+            await writer.submit(db.new_feedback_record("q24", 5, None))
+            await writer.stop()
+            return writer.snapshot()
+
+        stats = asyncio.run(run())
+        assert batches == [10, 10, 6]
+        assert stats["flushed"] == 26 and stats["queue_depth"] == 0
+        assert db.get_query("q24") is not None
+        assert db.metric_snapshot("p")["feedback_count"] == 1
+
+    def test_pending_query_is_readable_before_flush(self, setup_db):
+        setup_db()
+
+        async def run() -> tuple[bool, bool]:
+            writer = QueryLogWriter(batch_size=100, interval_seconds=60, buffer_size=100)
+            writer.start()
+            await writer.submit(_query("q1"))
+            visible = writer.pending_query("q1") is not None and db.get_query("q1") is None
+            await writer.stop()
+            return visible, writer.pending_query("q1") is None
+
+        visible, released = asyncio.run(run())
+        assert visible and released
+        assert db.get_query("q1") is not None
+
+    def test_full_buffer_delays_then_drops(self, setup_db):
+        setup_db()
+
+        async def run() -> dict[str, int]:
+            # not started, so nothing drains the buffer
+            writer = QueryLogWriter(batch_size=10, interval_seconds=60, buffer_size=1, enqueue_timeout=0.01)
+            assert await writer.submit(_query("q1"))
+            assert not await writer.submit(_query("q2"))
+            assert writer.pending_query("q2") is None
+            return writer.snapshot()
+
+        stats = asyncio.run(run())
+        assert stats["delayed"] == 1 and stats["dropped"] == 1 and stats["queue_depth"] == 1
+
+    def test_failed_flush_is_retried_with_the_next_batch(self, setup_db, monkeypatch):
+        setup_db()
+        original = db.write_log_batch
+        failures = []
+
+        def flaky(queries, feedback):
+            if len(failures) < 2:
+                failures.append(len(queries))
+                raise RuntimeError("database is locked")
+            original(queries, feedback)
+
+        monkeypatch.setattr(db, "write_log_batch", flaky)
+
+        async def run() -> dict[str, int]:
+            writer = QueryLogWriter(batch_size=10, interval_seconds=60, buffer_size=10)
+            await writer.submit(_query("q1"))
+            await writer._flush(writer._drain(10))
+            assert writer.pending_query("q1") is not None
+            await writer.submit(_query("q2"))
+            await writer._flush(writer._drain(10))
+            return writer.snapshot()
+
+        stats = asyncio.run(run())
+        assert failures == [1, 1]
+        assert stats["flushed"] == 2 and stats["dropped"] == 0
+        assert db.get_query("q1") is not None and db.get_query("q2") is not None
@@ -8,7 +8,7 @@ import pytest
 API_ROOT = Path(__file__).resolve().parents[1]
 sys.path.append(str(API_ROOT))
 
-from src.services.rag import chunk_text, _local_embed, similarity, build_prompt, _normalize_vector
+from src.services.rag import chunk_text, iter_chunk_spans, _local_embed, similarity, build_prompt, _normalize_vector
 from src.config import load_settings
 import numpy as np
 
@@ -48,6 +48,53 @@ class TestChunkText:
         assert reconstructed == set(words)
 
 
+class TestIterChunkSpans:
+    def test_is_generator(self):
+        spans = iter_chunk_spans("one. two.")
+        assert iter(spans) is spans
+
+    def test_offsets_preserve_original_whitespace(self):
+        text = "  first line\nsecond line  "
+        (start, end), = iter_chunk_spans(text)
+        assert text[start:end] == "first line\nsecond line"
+
+    def test_empty(self):
+        assert list(iter_chunk_spans("   ")) == []
+
+    def test_invalid_max_tokens(self):
+        with pytest.raises(ValueError):
+            list(iter_chunk_spans("hello", max_tokens=0))
+
+    def test_splits_on_sentence_boundaries(self):
+        text = "Alpha beta gamma. Delta epsilon zeta. Eta theta iota."
+        chunks = [text[s:e] for s, e in iter_chunk_spans(text, max_tokens=6, overlap=0)]
+        assert chunks == ["Alpha beta gamma. Delta epsilon zeta.", "Eta theta iota."]
+
+    def test_overlap_repeats_whole_sentences(self):
+        text = "One two three. Four five six. Seven eight nine."
+        chunks = [text[s:e] for s, e in iter_chunk_spans(text, max_tokens=6, overlap=3)]
+        assert chunks == ["One two three. Four five six.", "Four five six. Seven eight nine."]
+
+    def test_long_sentence_is_split_on_tokens(self):
+        text = " ".join(f"w{i}" for i in range(25))
+        spans = list(iter_chunk_spans(text, max_tokens=10, overlap=0))
+        assert [len(text[s:e].split()) for s, e in spans] == [10, 10, 5]
+
+    def test_markdown_headings_start_new_chunks(self):
+        text = "# Intro\nShort intro.\n\n## Usage\nRun the tool."
+        chunks = [text[s:e] for s, e in iter_chunk_spans(text, max_tokens=100, source_type="markdown")]
+        assert chunks == ["# Intro\nShort intro.", "## Usage\nRun the tool."]
+        assert len(list(iter_chunk_spans(text, max_tokens=100, source_type="text"))) == 1
+
+    def test_covers_all_tokens(self):
+        words = [f"w{i}." for i in range(50)]
+        text = " ".join(words)
+        covered = set()
+        for start, end in iter_chunk_spans(text, max_tokens=20, overlap=5):
+            covered.update(text[start:end].split())
+        assert covered == set(words)
+
+
 class TestLocalEmbed:
     def test_returns_correct_dimension(self):
         vec = _local_embed("hello world")
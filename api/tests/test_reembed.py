@@ -0,0 +1,105 @@
+from __future__ import annotations
+
+import asyncio
+import sys
+from pathlib import Path
+
+API_ROOT = Path(__file__).resolve().parents[1]
+sys.path.append(str(API_ROOT))
+
+from src import db
+from src.services import reembed
+from src.services.rag import local_embedding_model
+
+
+DB_ENV = {"reembed_batch_size": 2, "reembed_batch_delay_seconds": 0}
+
+
+def _seed(chunks: int = 5) -> str:
+    document = db.create_document("p", "doc.txt", "text")
+    for idx in range(chunks):
+        db.create_chunk(document.id, "p", idx, f"chunk {idx}", [1.0, 0.0, 0.0], {}, embedding_model="old-model")
+    db.set_document_centroid(document.id, [1.0, 0.0, 0.0])
+    db.set_document_status(document.id, "ready", chunk_count=chunks)
+    return document.id
+
+
+def test_reembeds_and_switches_project(setup_db):
+    setup_db()
+    doc_id = _seed()
+    job = db.start_reembed_job("p", local_embedding_model())
+    assert job.total == 5
+
+    asyncio.run(reembed.run_reembed_job("p"))
+
+    job = db.get_reembed_job("p")
+    assert job.status == "completed"
+    assert job.processed == 5
+    assert db.get_embedding_models("p") == {local_embedding_model(): 5}
+    chunks = db.get_chunks_for_document(doc_id, fields=["embedding", "embedding_dim"])
+    assert all(len(chunk["embedding"]) == chunk["embedding_dim"] == 256 for chunk in chunks)
+    assert len(dict(db.get_document_centroids("p"))[doc_id]) == 256
+
+
+def test_shadow_vectors_stay_hidden_until_switch_and_job_resumes(setup_db, monkeypatch):
+    setup_db()
+    _seed()
+    db.start_reembed_job("p", local_embedding_model())
+    original = reembed.embed_texts
+    calls = 0
+
+    async def flaky(texts, model=None):
+        nonlocal calls
+        calls += 1
+        if calls == 2:
+            return [([0.0], "unavailable") for _ in texts]
+        return await original(texts, model)
+
+    monkeypatch.setattr(reembed, "embed_texts", flaky)
+    asyncio.run(reembed.run_reembed_job("p"))
+
+    job = db.get_reembed_job("p")
+    assert job.status == "paused"
+    assert job.processed == 2
+    assert db.get_embedding_models("p") == {"old-model": 5}
+
+    async def resume():
+        await reembed.start_reembed("p")
+        await asyncio.gather(*reembed._running.values())
+
+    asyncio.run(resume())
+    job = db.get_reembed_job("p")
+    assert job.status == "completed"
+    assert job.processed == 5
+    assert db.get_embedding_models("p") == {local_embedding_model(): 5}
+
+
+def test_retargeting_cancels_the_running_job(setup_db, monkeypatch):
+    setup_db()
+    _seed()
+    original = reembed.embed_texts
+
+    async def run():
+        stalled = asyncio.Event()
+
+        async def slow(texts, model=None):
+            if model == "stale-model":
+                stalled.set()
+                await asyncio.sleep(3600)
+            return await original(texts, model)
+
+        monkeypatch.setattr(reembed, "embed_texts", slow)
+        monkeypatch.setattr(reembed, "target_embedding_model", lambda: "stale-model")
+        await reembed.start_reembed("p")
+        stale = reembed._running["p"]
+        await stalled.wait()
+
+        monkeypatch.setattr(reembed, "target_embedding_model", local_embedding_model)
+        await reembed.start_reembed("p")
+        assert stale.cancelled()
+        await asyncio.gather(*reembed._running.values())
+
+    asyncio.run(run())
+    job = db.get_reembed_job("p")
+    assert (job.status, job.target_model, job.processed) == ("completed", local_embedding_model(), 5)
+    assert db.get_embedding_models("p") == {local_embedding_model(): 5}
@@ -0,0 +1,80 @@
+from __future__ import annotations
+
+import sys
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+API_ROOT = Path(__file__).resolve().parents[1]
+sys.path.append(str(API_ROOT))
+
+from src import db
+from src.services.retention import apply_retention
+
+NOW = datetime(2026, 3, 1, 12, 0, tzinfo=timezone.utc)
+
+
+DB_ENV = {"query_retention_days": 7, "retention_batch_size": 2}
+
+
+def _query(query_id: str, created_at: datetime, latency_ms: int, model: str = "local-fallback") -> None:
+    db.create_query(
+        db.QueryRecord(
+            id=query_id,
+            project_id="p",
+            question="질문",
+            answer="답변",
+            citations=[{"chunk_id": "c", "document_id": "d", "score": 0.5, "text": "긴 인용문"}],
+            latency_ms=latency_ms,
+            tokens_used=10,
+            model=model,
+            related_documents=[],
+            created_at=created_at.isoformat(),
+        )
+    )
+
+
+def _seed() -> None:
+    old = NOW - timedelta(days=10)
+    _query("old1", old.replace(minute=5), 80)
+    _query("old2", old.replace(minute=40), 300, model="gemini")
+    _query("old3", old + timedelta(hours=1), 20000)
+    _query("new1", NOW - timedelta(hours=1), 120)
+    db.write_log_batch([], [db.new_feedback_record("old1", 4, None), db.new_feedback_record("new1", 2, None)])
+
+
+class TestRetention:
+    def test_rolls_up_and_prunes_old_rows(self, setup_db):
+        setup_db()
+        _seed()
+        before = db.metric_snapshot("p")
+
+        assert apply_retention(NOW) == 3
+        assert db.get_query("old1") is None
+        assert db.get_query("new1") is not None
+        assert db.metric_snapshot("p") == before
+        assert apply_retention(NOW) == 0
+        assert db.metric_snapshot("p") == before
+
+    def test_timeseries_combines_rollups_and_live_rows(self, setup_db):
+        setup_db()
+        _seed()
+        apply_retention(NOW)
+
+        hourly = db.query_timeseries("hour", NOW - timedelta(days=11), NOW, "p")
+        assert [bucket["queries"] for bucket in hourly] == [2, 1, 1]
+        first = hourly[0]
+        assert first["models"] == {"local-fallback": 1, "gemini": 1}
+        assert first["latency_histogram"]["100"] == 1 and first["latency_histogram"]["500"] == 1
+        assert first["feedback_count"] == 1 and first["avg_feedback_rating"] == 4.0
+        assert hourly[1]["latency_histogram"]["inf"] == 1
+        assert hourly[2]["bucket_start"] == (NOW - timedelta(hours=1)).isoformat()
+
+        daily = db.query_timeseries("day", NOW - timedelta(days=11), NOW, "p")
+        assert [bucket["queries"] for bucket in daily] == [3, 1]
+        assert db.query_timeseries("day", NOW - timedelta(days=11), NOW, "other") == []
+
+    def test_disabled_when_retention_is_zero(self, setup_db):
+        setup_db(query_retention_days=0)
+        _seed()
+        assert apply_retention(NOW) == 0
+        assert db.get_query("old1") is not None
@@ -0,0 +1,159 @@
+from __future__ import annotations
+
+import sys
+import threading
+from pathlib import Path
+
+import numpy as np
+
+API_ROOT = Path(__file__).resolve().parents[1]
+sys.path.append(str(API_ROOT))
+
+from src import db
+from src.services import index, segments, warmup
+from src.services.vectorstore import SQLiteVectorStore, VectorRecord, get_vector_store
+
+
+DB_ENV = {
+    "vector_store": "segmented",
+    "segment_head_rows": 10,
+    "segment_max_count": 3,
+    "segment_merge_factor": 2,
+}
+
+
+def _add(vectors: np.ndarray, project_id: str = "p") -> tuple[str, list[str]]:
+    document_id = db.create_document(project_id=project_id, filename="doc.txt", source_type="text").id
+    ids = get_vector_store().add(
+        project_id,
+        [
+            VectorRecord(document_id=document_id, chunk_index=i, text="", embedding=vector, embedding_model="m")
+            for i, vector in enumerate(vectors.tolist())
+        ],
+    )
+    return document_id, ids
+
+
+def _matches_reference(queries: np.ndarray, k: int = 5) -> bool:
+    store, reference = get_vector_store(), SQLiteVectorStore()
+    return all(
+        [hit.chunk_id for hit in store.search("p", query, k, "m")]
+        == [hit.chunk_id for hit in reference.search("p", query, k, "m")]
+        for query in queries.tolist()
+    )
+
+
+def _set() -> segments.SegmentSet:
+    return segments.get_segment_set("p", "m", 8)
+
+
+class TestSegments:
+    def test_merges_keep_segment_count_bounded(self, setup_db):
+        setup_db()
+        rng = np.random.default_rng(1)
+        queries = rng.standard_normal((10, 8))
+        _add(rng.standard_normal((4, 8)))
+        get_vector_store().search("p", queries[0].tolist(), 1, "m")
+        for _ in range(12):
+            _add(rng.standard_normal((10, 8)))
+            assert _matches_reference(queries)
+        segments.wait_for_merges()
+
+        summary = _set().summary()
+        assert summary["segments"] <= 3 and summary["merges"] > 0
+        assert summary["sealed_rows"] + summary["head_rows"] == summary["live_rows"] == 124
+        on_disk = {path.name.split(".")[0] for path in _set().directory.glob("*.npy")}
+        assert on_disk == {segment.id for segment in _set().state.sealed}
+        assert _matches_reference(queries)
+
+    def test_deletes_are_tombstoned_then_compacted(self, setup_db):
+        setup_db(segment_head_rows=5)
+        rng = np.random.default_rng(2)
+        queries = rng.standard_normal((10, 8))
+        doomed, _ = _add(rng.standard_normal((20, 8)))
+        _, kept = _add(rng.standard_normal((20, 8)))
+        get_vector_store().search("p", queries[0].tolist(), 1, "m")
+
+        get_vector_store().delete("p", chunk_ids=kept[:1])
+        assert _set().summary()["tombstones"] == 1
+        assert _matches_reference(queries)
+
+        # a segment that lost most of its rows is rewritten without them
+        get_vector_store().delete("p", document_id=doomed)
+        segments.wait_for_merges()
+        summary = _set().summary()
+        assert summary["live_rows"] == 19 and summary["tombstones"] == 0
+        assert _matches_reference(queries)
+
+    def test_writes_that_bypass_the_store_are_picked_up(self, setup_db):
+        setup_db()
+        rng = np.random.default_rng(3)
+        queries = rng.standard_normal((10, 8))
+        _, ids = _add(rng.standard_normal((30, 8)))
+        get_vector_store().search("p", queries[0].tolist(), 1, "m")
+
+        document_id = db.create_document(project_id="p", filename="bulk.txt", source_type="text").id
+        db.create_chunks(
+            "p",
+            [
+                {"document_id": document_id, "chunk_index": i, "text": "", "embedding": vector, "embedding_model": "m"}
+                for i, vector in enumerate(rng.standard_normal((5, 8)).tolist())
+            ],
+        )
+        assert _matches_reference(queries)
+        assert _set().stats["rebuilds"] == 0
+
+        db.delete_chunks("p", ids[:3])
+        assert _matches_reference(queries)
+        assert _set().stats["rebuilds"] == 1 and _set().summary()["live_rows"] == 32
+
+    def test_restart_reopens_sealed_segments(self, setup_db):
+        setup_db()
+        rng = np.random.default_rng(4)
+        queries = rng.standard_normal((10, 8))
+        _add(rng.standard_normal((25, 8)))
+        get_vector_store().search("p", queries[0].tolist(), 1, "m")
+        _, ids = _add(rng.standard_normal((13, 8)))
+        get_vector_store().delete("p", chunk_ids=ids[:2])
+        segments.wait_for_merges()
+        sealed = {segment.id for segment in _set().state.sealed}
+
+        segments.clear_segments()
+        assert get_vector_store().warm("p", "m", 8) == "snapshot"
+        reopened = _set()
+        assert {segment.id for segment in reopened.state.sealed} == sealed
+        assert isinstance(reopened.state.sealed[0].matrix, np.memmap)
+        assert reopened.summary()["live_rows"] == 36 and reopened.stats["rebuilds"] == 0
+        assert _matches_reference(queries)
+
+    def test_readers_do_not_wait_for_writers(self, setup_db):
+        setup_db()
+        rng = np.random.default_rng(5)
+        document_id, _ = _add(rng.standard_normal((12, 8)))
+        query = rng.standard_normal(8).tolist()
+        assert len(get_vector_store().search("p", query, 50, "m")) == 12
+
+        segment_set = _set()
+        with segment_set._lock:
+            # rows written while a writer holds the set are served once it publishes
+            db.create_chunks(
+                "p",
+                [
+                    {"document_id": document_id, "chunk_index": 12, "text": "", "embedding": query, "embedding_model": "m"},
+                ],
+            )
+            results = []
+            reader = threading.Thread(target=lambda: results.append(get_vector_store().search("p", query, 50, "m")))
+            reader.start()
+            reader.join(timeout=5)
+            assert not reader.is_alive() and len(results[0]) == 12
+        assert len(get_vector_store().search("p", query, 50, "m")) == 13
+
+
+def test_warmup_loads_segments(setup_db, monkeypatch):
+    setup_db()
+    _add(np.random.default_rng(6).standard_normal((15, 8)))
+    monkeypatch.setattr(warmup, "active_embedding_model", lambda project_id: "m")
+    assert warmup.warm_project("p") == "rebuilt"
+    assert _set().summary()["live_rows"] == 15
+    assert not index.index_cache()
@@ -0,0 +1,57 @@
+from __future__ import annotations
+
+import importlib
+import sys
+from pathlib import Path
+
+import numpy as np
+from fastapi.testclient import TestClient
+
+API_ROOT = Path(__file__).resolve().parents[1]
+sys.path.append(str(API_ROOT))
+
+from src import db
+from src.schemas import DocumentItem, QueryDetail, QueryResponse
+
+
+class TestJsonCodec:
+    def test_round_trip(self):
+        value = {"text": "한국어 문장", "nested": [1, 2.5, None, {"k": True}]}
+        encoded = db._serialize_json(value)
+        assert isinstance(encoded, str) and "한국어" in encoded
+        assert db._deserialize_json(encoded) == value
+        assert db._deserialize_json(encoded.encode("utf-8")) == value
+        assert db._deserialize_json(None) is None
+
+    def test_numpy_vectors(self):
+        vector = np.array([0.5, -1.0], dtype=np.float32)
+        assert db._deserialize_json(db._serialize_json(vector)) == [0.5, -1.0]
+
+
+def test_trusted_responses_match_models(setup_db):
+    setup_db()
+    import src.main as main
+
+    importlib.reload(main)
+    with TestClient(main.app) as client:
+        created = client.post("/api/v1/documents", data={"project_id": "p", "source_text": "배포는 세 단계로 진행됩니다."})
+        document_id = created.json()["id"]
+
+        answered = client.post("/api/v1/queries", json={"project_id": "p", "question": "배포 단계는?"})
+        assert answered.headers["content-type"] == "application/json"
+        QueryResponse.model_validate(answered.json())
+
+        detail = client.get(f"/api/v1/queries/{answered.json()['id']}").json()
+        assert QueryDetail.model_validate(detail).model_dump() == detail
+
+        listed = client.get("/api/v1/documents?project_id=p&limit=1")
+        assert listed.headers["X-Total-Count"] == "1"
+        assert [DocumentItem.model_validate(item).model_dump() for item in listed.json()] == listed.json()
+
+        document = client.get(f"/api/v1/documents/{document_id}").json()
+        assert DocumentItem.model_validate(document["document"]).model_dump() == document["document"]
+        assert document["chunks"][0]["text"] == "배포는 세 단계로 진행됩니다."
+
+        exported = client.get(f"/api/v1/documents/{document_id}/export").json()
+        assert exported["document"] == document["document"]
+        assert exported["chunks"][0]["text"] == "배포는 세 단계로 진행됩니다."
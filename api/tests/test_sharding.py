@@ -0,0 +1,133 @@
+from __future__ import annotations
+
+import asyncio
+import sqlite3
+import sys
+from pathlib import Path
+
+API_ROOT = Path(__file__).resolve().parents[1]
+sys.path.append(str(API_ROOT))
+
+from src import db
+from src.services import ingest
+from src.services.query import answer_query
+
+
+DB_ENV = {"shard_by_project": "true"}
+
+
+def _ingest(project_id: str, text: str) -> str:
+    document = db.create_document(project_id=project_id, filename="doc.txt", source_type="text")
+    asyncio.run(ingest.process_document(document.id, project_id, text))
+    return document.id
+
+
+def _query(query_id: str, project_id: str) -> db.QueryRecord:
+    return db.QueryRecord(
+        id=query_id,
+        project_id=project_id,
+        question="질문",
+        answer="답변",
+        citations=[],
+        latency_ms=100,
+        tokens_used=1,
+        model="local-fallback",
+        related_documents=[],
+        created_at="2026-01-01T00:00:00+00:00",
+    )
+
+
+def _count(path: Path, table: str) -> int:
+    conn = sqlite3.connect(path)
+    try:
+        return conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+    finally:
+        conn.close()
+
+
+class TestShardRouting:
+    def test_projects_get_their_own_files(self, setup_db, tmp_path):
+        setup_db()
+        doc_a = _ingest("alpha", "alpha project document")
+        _ingest("beta", "beta project document")
+        router = db.shard_router()
+
+        assert _count(router.path_for("alpha"), "documents") == 1
+        assert _count(router.path_for("beta"), "documents") == 1
+        assert _count(tmp_path / "kc.db", "documents") == 0
+        assert db.get_document(doc_a).project_id == "alpha"
+        assert db.get_chunks_for_document(doc_a)[0]["text"] == "alpha project document"
+        assert db.partitions() == [None, "alpha", "beta"]
+
+        result = asyncio.run(answer_query("alpha", "alpha project", top_k=3))
+        assert result["related_documents"] == [doc_a]
+
+    def test_reads_do_not_create_shards(self, setup_db):
+        setup_db()
+        assert db.list_documents("ghost") == []
+        assert db.get_document("missing") is None
+        assert not db.shard_router().path_for("ghost").exists()
+        assert db.partitions() == [None]
+
+    def test_query_log_routed_and_aggregated(self, setup_db):
+        setup_db()
+        _ingest("alpha", "alpha project document")
+        db.write_log_batch([_query("qa", "alpha"), _query("qb", "beta")], [db.new_feedback_record("qa", 5, None)])
+        db.write_log_batch([], [db.new_feedback_record("qb", 3, None)])
+
+        assert db.get_query("qb").project_id == "beta"
+        assert db.query_exists("qa") and not db.query_exists("nope")
+        assert _count(db.shard_router().path_for("beta"), "feedback") == 1
+
+        totals = db.metric_snapshot()
+        assert (totals["documents"], totals["queries"], totals["feedback_count"]) == (1, 2, 2)
+        assert totals["avg_feedback_rating"] == 4.0
+        assert db.metric_snapshot("beta")["queries"] == 1
+
+    def test_lru_closes_idle_handles(self, setup_db):
+        setup_db(shard_max_open=1)
+        doc_a = _ingest("alpha", "alpha project document")
+        doc_b = _ingest("beta", "beta project document")
+        router = db.shard_router()
+        assert router.open_count() == 1
+
+        assert db.get_document(doc_a).project_id == "alpha"
+        assert db.get_document(doc_b).project_id == "beta"
+        assert router.open_count() == 1
+        assert router.stats["closed"] >= 2
+
+    def test_hot_paths_skip_the_main_file(self, setup_db, tmp_path):
+        setup_db()
+        doc = _ingest("alpha", "alpha project document")
+        query_id = db.new_record_id("alpha")
+        db.write_log_batch([_query(query_id, "alpha")], [])
+        db.write_log_batch([], [db.new_feedback_record(query_id, 4, None)])
+
+        assert _count(tmp_path / "kc.db", "document_routes") == 0
+        assert _count(tmp_path / "kc.db", "query_routes") == 0
+        assert db.get_document(doc).project_id == "alpha"
+        assert db.get_query(query_id).project_id == "alpha"
+        assert _count(db.shard_router().path_for("alpha"), "feedback") == 1
+
+
+def test_enabling_sharding_migrates_existing_rows(setup_db, tmp_path):
+    setup_db(shard_by_project="false")
+    doc = _ingest("alpha", "alpha project document before sharding")
+    db.write_log_batch([_query("legacy-query", "alpha")], [db.new_feedback_record("legacy-query", 5, None)])
+    db.roll_up_queries("2100-01-01T00:00:00+00:00")
+    db.write_log_batch([_query("recent-query", "alpha")], [])
+
+    setup_db()
+    router = db.shard_router()
+    assert _count(tmp_path / "kc.db", "documents") == 0
+    assert _count(tmp_path / "kc.db", "chunks") == 0
+    assert _count(router.path_for("alpha"), "chunks") == 1
+    assert db.get_document(doc).project_id == "alpha"
+    assert db.get_query("recent-query").project_id == "alpha"
+    assert db.metric_snapshot("alpha")["queries"] == 2
+
+    # new rows land next to the migrated ones and both stay searchable
+    new_doc = _ingest("alpha", "alpha project document after sharding")
+    result = asyncio.run(answer_query("alpha", "alpha project document", top_k=5))
+    assert set(result["related_documents"]) == {doc, new_doc}
+    assert db.migrate_to_shards() == 0
@@ -0,0 +1,95 @@
+from __future__ import annotations
+
+import asyncio
+import sys
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+API_ROOT = Path(__file__).resolve().parents[1]
+sys.path.append(str(API_ROOT))
+
+from src import db
+from src.services import summarize
+from src.services.retention import apply_retention
+from src.services.summarize import pack_batches, summarize_documents
+
+
+def _seed_document(project_id: str, texts: list[str]) -> str:
+    document = db.create_document(project_id=project_id, filename="doc.txt", source_type="text")
+    for idx, text in enumerate(texts):
+        db.create_chunk(document.id, project_id, idx, text, [0.0], {"index": idx})
+    return document.id
+
+
+class TestPackBatches:
+    def test_respects_budget(self):
+        texts = ["a b c", "d e f", "g h i", "j k"]
+        batches = pack_batches(texts, token_budget=6)
+        assert batches == [["a b c", "d e f"], ["g h i", "j k"]]
+
+    def test_oversized_item_gets_own_batch(self):
+        batches = pack_batches(["one two three four", "five"], token_budget=2)
+        assert batches == [["one two three four"], ["five"]]
+
+    def test_min_items_forces_progress(self):
+        texts = ["a b c d", "e f g h", "i j k l"]
+        batches = pack_batches(texts, token_budget=2, min_items=2)
+        assert len(batches) < len(texts)
+
+
+class TestSummarizeDocuments:
+    def test_map_reduce_and_cache(self, setup_db, monkeypatch):
+        setup_db(summary_batch_tokens=8)
+
+        calls: list[str] = []
+
+        async def fake_summarize(text, instruction, model=None):
+            calls.append(text)
+            return f"S{len(calls)}", 3, "fake"
+
+        monkeypatch.setattr(summarize, "summarize_text", fake_summarize)
+        doc_a = _seed_document("p", ["alpha " * 5, "beta " * 5, "gamma " * 5])
+        doc_b = _seed_document("p", ["delta " * 3])
+
+        result = asyncio.run(summarize_documents([doc_a, doc_b], "요약"))
+        assert result["summary"]
+        assert result["documents"] == [doc_a, doc_b]
+        first_round = len(calls)
+        assert first_round >= 4
+
+        asyncio.run(summarize_documents([doc_a, doc_b], "요약"))
+        # per-document summaries are cached, only the cross-document reduce reruns
+        assert len(calls) == first_round + 1
+
+    def test_unknown_documents(self, setup_db):
+        setup_db()
+        result = asyncio.run(summarize_documents(["missing"], "요약"))
+        assert result["summary"] == ""
+
+    def test_cache_is_shared_by_identical_documents(self, setup_db, monkeypatch):
+        setup_db()
+        calls: list[str] = []
+
+        async def fake_summarize(text, instruction, model=None):
+            calls.append(text)
+            return "같은 요약", 3, "fake"
+
+        monkeypatch.setattr(summarize, "summarize_text", fake_summarize)
+        original = _seed_document("p", ["shared body text"])
+        copy = _seed_document("other", ["shared body text"])
+
+        assert asyncio.run(summarize_documents([original], "요약"))["summary"] == "같은 요약"
+        assert asyncio.run(summarize_documents([copy], "요약"))["summary"] == "같은 요약"
+        assert len(calls) == 1
+
+    def test_retention_prunes_old_cache_entries(self, setup_db):
+        setup_db(summary_cache_days=7, retention_batch_size=1)
+        for key in ("old", "older", "fresh"):
+            db.put_cached_summary(key, f"{key} 요약", "fake")
+        stale = (datetime.now(timezone.utc) - timedelta(days=8)).isoformat()
+        with db.db_transaction() as conn:
+            conn.execute("UPDATE summary_cache SET created_at = ? WHERE content_hash != 'fresh'", (stale,))
+
+        apply_retention()
+        assert db.get_cached_summary("old") is None and db.get_cached_summary("older") is None
+        assert db.get_cached_summary("fresh") == "fresh 요약"
@@ -0,0 +1,168 @@
+from __future__ import annotations
+
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+API_ROOT = Path(__file__).resolve().parents[1]
+sys.path.append(str(API_ROOT))
+
+from src import db
+from src.services import projection, vectorstore
+from src.services.vectorstore import VectorRecord
+
+
+def _records(document_id: str, vectors: list[list[float]], model: str | None = "m") -> list[VectorRecord]:
+    return [
+        VectorRecord(document_id=document_id, chunk_index=i, text=f"chunk {i}", embedding=vector, embedding_model=model)
+        for i, vector in enumerate(vectors)
+    ]
+
+
+class VectorStoreConformance:
+    # every backend registered in VECTOR_STORES gets a subclass of this suite
+    backend = ""
+    env: dict[str, int] = {}
+
+    def _store(self, setup_db) -> vectorstore.VectorStore:
+        setup_db(vector_store=self.backend, **self.env)
+        store = vectorstore.get_vector_store()
+        assert store.name == self.backend
+        return store
+
+    def _document(self, project_id: str = "p") -> str:
+        return db.create_document(project_id=project_id, filename="doc.txt", source_type="text").id
+
+    def test_search_ranks_by_cosine(self, setup_db):
+        store = self._store(setup_db)
+        doc = self._document()
+        ids = store.add("p", _records(doc, [[1.0, 0.0, 0.0], [0.6, 0.8, 0.0], [0.0, 0.0, 2.0], [-1.0, 0.0, 0.0]]))
+        assert len(ids) == 4
+
+        hits = store.search("p", [2.0, 0.0, 0.0], 3, embedding_model="m")
+        assert [hit.chunk_id for hit in hits] == [ids[0], ids[1], ids[2]]
+        assert [round(hit.score, 5) for hit in hits] == [1.0, 0.6, 0.0]
+        assert all(hit.document_id == doc for hit in hits)
+        assert np.allclose(hits[1].embedding / np.linalg.norm(hits[1].embedding), [0.6, 0.8, 0.0])
+        assert store.search("p", [1.0, 0.0, 0.0], 0) == []
+
+    def test_document_filter(self, setup_db):
+        store = self._store(setup_db)
+        first, second = self._document(), self._document()
+        store.add("p", _records(first, [[1.0, 0.0]]))
+        store.add("p", _records(second, [[0.9, 0.1], [0.0, 1.0]]))
+
+        assert {hit.document_id for hit in store.search("p", [1.0, 0.0], 10, "m", [second])} == {second}
+        assert store.search("p", [1.0, 0.0], 10, "m", []) == []
+        assert len(store.search("p", [1.0, 0.0], 10, "m")) == 3
+
+    def test_model_and_dimension_filters(self, setup_db):
+        store = self._store(setup_db)
+        doc = self._document()
+        store.add("p", _records(doc, [[1.0, 0.0]], model="m"))
+        store.add("p", _records(doc, [[1.0, 0.0]], model="other"))
+        store.add("p", _records(doc, [[1.0, 0.0, 0.0]], model="m"))
+        store.add("p", _records(doc, [[1.0, 0.0]], model=None))
+
+        assert len(store.search("p", [1.0, 0.0], 10, "m")) == 2
+        assert len(store.search("p", [1.0, 0.0], 10, "other")) == 2
+        assert len(store.search("p", [1.0, 0.0], 10)) == 3
+        assert store.search("other-project", [1.0, 0.0], 10) == []
+
+    def test_delete_is_visible_to_search(self, setup_db):
+        store = self._store(setup_db)
+        keep, drop = self._document(), self._document()
+        kept = store.add("p", _records(keep, [[1.0, 0.0], [0.0, 1.0]]))
+        store.add("p", _records(drop, [[1.0, 0.1]]))
+        assert len(store.search("p", [1.0, 0.0], 10, "m")) == 3
+
+        assert store.delete("p", document_id=drop) == 1
+        assert store.delete("p", chunk_ids=[kept[1]]) == 1
+        assert [hit.chunk_id for hit in store.search("p", [1.0, 0.0], 10, "m")] == [kept[0]]
+
+    def test_stats(self, setup_db):
+        store = self._store(setup_db)
+        store.add("p", _records(self._document(), [[1.0, 0.0]] * 5))
+        store.search("p", [1.0, 0.0], 1, "m")
+        stats = store.stats("p")
+        assert stats["backend"] == self.backend and stats["vectors"] == 5
+        assert store.stats("empty")["vectors"] == 0
+
+    def test_matches_reference_at_scale(self, setup_db):
+        store = self._store(setup_db)
+        rng = np.random.default_rng(3)
+        for _ in range(4):
+            store.add("p", _records(self._document(), rng.standard_normal((500, 64)).tolist()))
+        queries = rng.standard_normal((20, 64)).tolist()
+        reference = vectorstore.SQLiteVectorStore()
+
+        started = time.perf_counter()
+        results = [store.search("p", query, 10, "m") for query in queries]
+        per_query = (time.perf_counter() - started) / len(queries)
+
+        for query, hits in zip(queries, results):
+            expected = reference.search("p", query, 10, "m")
+            assert [hit.chunk_id for hit in hits] == [hit.chunk_id for hit in expected]
+            assert np.allclose([hit.score for hit in hits], [hit.score for hit in expected], atol=1e-5)
+        # generous ceiling: 2k vectors must stay interactive on any backend
+        assert per_query < 0.25
+
+    def test_projected_search(self, setup_db):
+        store = self._store(setup_db)
+        rng = np.random.default_rng(5)
+        basis = rng.standard_normal((6, 48))
+        before = store.add("p", _records(self._document(), (rng.standard_normal((150, 6)) @ basis).tolist()))
+        fitted = projection.fit_projection("p", "pca", 6, "m")
+        # chunks written after the fit are reduced on the way in
+        after = store.add("p", _records(self._document(), (rng.standard_normal((50, 6)) @ basis).tolist()))
+
+        query = (rng.standard_normal(6) @ basis).tolist()
+        exact = store.search("p", query, 5, "m")
+        reduced = store.search("p", fitted.apply(query)[0].tolist(), 5, "m", projection=fitted)
+        assert [hit.chunk_id for hit in reduced] == [hit.chunk_id for hit in exact]
+        assert np.allclose([hit.score for hit in reduced], [hit.score for hit in exact], atol=1e-4)
+        assert all(hit.embedding.shape == (6,) for hit in reduced)
+        assert {hit.chunk_id for hit in reduced} <= set(before + after)
+
+
+class TestSQLiteVectorStore(VectorStoreConformance):
+    backend = "sqlite"
+
+
+class TestMemoryIndexStore(VectorStoreConformance):
+    backend = "memory"
+
+
+class TestSegmentedIndexStore(VectorStoreConformance):
+    # tiny segments so every test seals, merges and searches across several
+    backend = "segmented"
+    env = {"segment_head_rows": 2, "segment_max_count": 3}
+
+
+def test_every_backend_runs_the_conformance_suite():
+    covered = {cls.backend for cls in VectorStoreConformance.__subclasses__()}
+    assert covered == set(vectorstore.VECTOR_STORES)
+
+
+def test_unknown_backend_is_rejected(monkeypatch):
+    monkeypatch.setenv("KNOWLEDGE_COPILOT_VECTOR_STORE", "faiss")
+    try:
+        vectorstore.get_vector_store()
+    except ValueError as exc:
+        assert "faiss" in str(exc)
+    else:
+        raise AssertionError("expected ValueError")
+
+
+def test_backends_must_implement_search():
+    class Incomplete(vectorstore.VectorStore):
+        name = "incomplete"
+
+    try:
+        Incomplete()
+    except TypeError as exc:
+        assert "search" in str(exc)
+    else:
+        raise AssertionError("expected TypeError")